@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.models.signals import post_migrate
+        from .cache import start_cache_sweeper
+        from . import changes, search, summary, versioning
+        # ثبت taskهای صف کارها برای enqueue و ورکر run_jobs
+        from . import onboarding  # noqa: F401
+        request_started.connect(start_cache_sweeper, dispatch_uid='api.cache_sweeper')
+        post_migrate.connect(summary.ensure_triggers, sender=self, dispatch_uid='api.summary_triggers')
+        post_migrate.connect(versioning.ensure_triggers, sender=self, dispatch_uid='api.version_triggers')
+        post_migrate.connect(search.ensure_triggers, sender=self, dispatch_uid='api.search_triggers')
+        post_migrate.connect(changes.ensure_triggers, sender=self, dispatch_uid='api.change_triggers')
@@ -0,0 +1,151 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import serializers
+from rest_framework.request import Request
+
+from .conditional import conditional_etag, not_modified, not_modified_response
+from .fastpath import UnsupportedSerializer, compile_serializer
+from .metrics import timed
+from .renderers import FastJSONRenderer
+from .routers import read_only
+from .versioning import atable_version
+
+JSON = 'application/json'
+
+
+def async_eligible(request, viewset_class):
+    """
+    فقط خواندن JSON با سریالایزر کامپایل شده async سرو می‌شود؛ export استریم، API
+    قابل مرور (text/html یا ?format=) و سریالایزر پشتیبانی نشده به ویوست sync می‌روند
+    """
+    if request.method not in ('GET', 'HEAD') or not settings.API_FAST_SERIALIZATION:
+        return False
+    if 'export' in request.GET or 'format' in request.GET or 'text/html' in request.headers.get('Accept', ''):
+        return False
+    try:
+        compile_serializer(viewset_class.serializer_class)
+    except UnsupportedSerializer:
+        return False
+    return True
+
+
+def split_by_method(viewset_class, sync_view):
+    """
+    view async برای یک مسیر ویوست: list/retrieve واجد شرایط با AsyncProfileReadView و بقیه
+    (نوشتن‌ها، export، API قابل مرور) با همان ویوست sync از طریق sync_to_async اجرا می‌شوند
+    """
+    async_view = AsyncProfileReadView.as_view(viewset_class=viewset_class)
+    sync_view_async = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if async_eligible(request, viewset_class):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view_async(request, *args, **kwargs)
+
+    markcoroutinefunction(view)
+    # ویوست‌های DRF خودشان csrf_exempt هستند
+    view.csrf_exempt = True
+    return view
+
+
+class AsyncProfileReadView(View):
+    """
+    list/retrieve پروفایل‌ها با ORM async برای ASGI. بدنه، ETag، 304 و کش پاسخ همان مسیر
+    sync ویوست (ConditionalCacheMixin + FastReadMixin) است و کلیدهای کش بین دو مسیر مشترک است.
+    """
+    viewset_class = None
+
+    async def get(self, request, pk=None):
+        with read_only():
+            if pk is None:
+                return await self._list(request)
+            return await self._retrieve(request, pk)
+
+    async def _list(self, request):
+        viewset = self.viewset_class
+        table = viewset.queryset.model._meta.db_table
+        version = await atable_version(table, using=viewset.queryset.db)
+
+        async def render():
+            drf_request = Request(request)
+            try:
+                queryset = _filtered(drf_request, viewset)
+            except serializers.ValidationError as exc:
+                return _json(exc.detail, status=400), False
+            compiled = compile_serializer(viewset.serializer_class)
+            paginator = viewset.pagination_class()
+            page = await paginator.apaginate_queryset(compiled.values(queryset), drf_request, viewset)
+            with timed('serialize'):
+                data = [compiled.build(row) for row in page]
+            return _json(paginator.get_paginated_data(data)), True
+
+        return await self._conditional(request, f'{table}-{version}', render)
+
+    async def _retrieve(self, request, pk):
+        viewset = self.viewset_class
+        model = viewset.queryset.model
+        try:
+            version = await model.objects.filter(pk=pk).values_list('version', flat=True).afirst()
+        except (TypeError, ValueError):
+            # مثل get_object_or_404 در DRF
+            return _json({'detail': 'Not found.'}, status=404)
+        if version is None:
+            return _not_found(model)
+
+        async def render():
+            try:
+                queryset = _filtered(Request(request), viewset)
+            except serializers.ValidationError as exc:
+                return _json(exc.detail, status=400), False
+            compiled = compile_serializer(viewset.serializer_class)
+            row = await compiled.values(queryset.filter(pk=pk)).afirst()
+            if row is None:
+                return _not_found(model), False
+            with timed('serialize'):
+                data = compiled.build(row)
+            return _json(data), True
+
+        return await self._conditional(request, f'{model._meta.db_table}-{pk}-{version}', render)
+
+    async def _conditional(self, request, tag, render):
+        etag, key = conditional_etag(tag, JSON, request.build_absolute_uri())
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response, cacheable = await render()
+            if not cacheable:
+                return response
+            cache.set(key, (response.content, response['Content-Type']), settings.RESPONSE_CACHE_TIMEOUT)
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def _filtered(drf_request, viewset):
+    # همان filter_backends ویوست sync، هم برای list و هم برای retrieve
+    queryset = viewset.queryset
+    for backend in viewset.filter_backends:
+        queryset = backend().filter_queryset(drf_request, queryset, viewset)
+    return queryset
+
+
+def _json(data, status=200):
+    response = HttpResponse(FastJSONRenderer().render(data), content_type=JSON, status=status)
+    # مثل DRF، پاسخ به هدر Accept بستگی دارد
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def _not_found(model):
+    # همان پیامی که get_object_or_404 در مسیر sync می‌دهد
+    return _json({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
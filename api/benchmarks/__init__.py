@@ -0,0 +1,7 @@
+"""
+بنچمارک‌های اپ api. هر ماژول یک تابع run(options) دارد و با
+
+    python manage.py bench <name> [--rows N]
+
+روی یک دیتابیس تست جداگانه (نه db.sqlite3) اجرا می‌شود.
+"""
@@ -0,0 +1,151 @@
+"""
+WSGI در برابر ASGI زیر کلاینت‌های همزمان، با تأخیر شبیه‌سازی شده سرور OAuth (StubTokenServer).
+
+- wsgi: viewهای sync، THREADS ورکر thread (مثل gunicorn --threads)
+- asgi-sync: همان viewهای sync زیر هندلر ASGI؛ هر درخواست از sync_to_async رد می‌شود
+- asgi-async: API_ASYNC_VIEWS (OAuth و list/retrieve async)، CONCURRENCY کوروتین همزمان
+
+هندلرها در همین پروسه با Client/AsyncClient جنگو اجرا می‌شوند (بدون سرور شبکه)، پس عدد
+مطلق با gunicorn/uvicorn فرق دارد ولی مدل همزمانی هر مسیر همان است.
+repeat تعداد درخواست (یا ورود) در هر اجراست.
+
+هر پرش sync_to_async (ORM async، سیگنال‌های درخواست، middleware بر پایه MiddlewareMixin) روی
+یک thread مشترک صف می‌کشد؛ برای همین middlewareهای پرکاربرد از api.middleware هستند و خواندن
+async فقط کوئری‌های خودش را پرش می‌کند.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+
+from ..models import SellerProfile
+from ..oauth_stub import StubTokenServer
+from ..urls import api_urlpatterns
+from .base import seed_sellers
+
+THREADS = 8
+CONCURRENCY = 64
+UPSTREAM_DELAY = 0.1
+
+
+class _URLConf:
+    def __init__(self, async_views):
+        self.urlpatterns = [path('api/', include(api_urlpatterns(async_views)))]
+
+
+def _state(body):
+    return parse_qs(urlsplit(body['auth_url']).query)['state'][0]
+
+
+def _check(response):
+    assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+
+
+def _sync_tasks(ids, prefix):
+    def read(client, i):
+        _check(client.get(f'/api/sellers/{ids[i]}/', HTTP_ACCEPT='application/json'))
+
+    def login(client, i):
+        response = client.get('/api/oauth/redirect/', HTTP_ACCEPT='application/json')
+        _check(client.get('/api/oauth/callback/', {'code': f'{prefix}-{i}', 'state': _state(response.json())}))
+    return {'read': read, 'login': login}
+
+
+def _async_tasks(ids, prefix):
+    async def read(client, i):
+        _check(await client.get(f'/api/sellers/{ids[i]}/', headers={'Accept': 'application/json'}))
+
+    async def login(client, i):
+        response = await client.get('/api/oauth/redirect/', headers={'Accept': 'application/json'})
+        _check(await client.get('/api/oauth/callback/', {'code': f'{prefix}-{i}', 'state': _state(response.json())}))
+    return {'read': read, 'login': login}
+
+
+def _run_threads(task, n):
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        start = time.perf_counter()
+        task(local.client, i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        latencies = list(pool.map(one, range(n)))
+    return time.perf_counter() - start, latencies
+
+
+def _run_coroutines(task, n):
+    async def main():
+        pending = iter(range(n))
+        latencies = []
+
+        async def worker():
+            client = AsyncClient()
+            for i in pending:
+                start = time.perf_counter()
+                await task(client, i)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        return time.perf_counter() - start, latencies
+
+    # thread_sensitive کدهای sync روی همین thread (و اتصال دیتابیس تست آن) اجرا می‌شوند
+    return async_to_sync(main)()
+
+
+def _stats(wall, latencies):
+    latencies = sorted(ms * 1000 for ms in latencies)
+    return {
+        'throughput_per_s': round(len(latencies) / wall, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+    }
+
+
+def run(options, out):
+    rows = options['rows']
+    n = options['repeat']
+    seed_sellers(rows)
+    all_ids = list(SellerProfile.objects.order_by('id').values_list('id', flat=True))
+    step = max(1, len(all_ids) // (n * 3))
+
+    configs = [
+        ('wsgi', False, _sync_tasks, _run_threads),
+        ('asgi-sync', False, _async_tasks, _run_coroutines),
+        ('asgi-async', True, _async_tasks, _run_coroutines),
+    ]
+    results = {}
+    with StubTokenServer(delay=UPSTREAM_DELAY) as stub, override_settings(
+        OAUTH2_TOKEN_URL=stub.token_url,
+        OAUTH2_THROTTLE_RATES={},
+        # استخر اتصال نباید همزمانی async را محدود کند (مسیر sync را THREADS محدود می‌کند)
+        OAUTH2_POOL_MAXSIZE=CONCURRENCY,
+    ):
+        for index, (name, async_views, make_tasks, runner) in enumerate(configs):
+            # هر پیکربندی ردیف‌های خودش را می‌خواند تا کش پاسخ روی نتیجه اثر نگذارد
+            ids = all_ids[index::3][::step]
+            assert len(ids) >= n, 'not enough rows for --repeat, increase --rows'
+            with override_settings(ROOT_URLCONF=_URLConf(async_views)):
+                caches['default'].clear()
+                for workload, task in make_tasks(ids, name).items():
+                    # اجرای گرم کردن (ساخت User کالبک، اتصال‌ها) با شناسه‌های جدا
+                    runner(task if workload == 'read' else make_tasks(ids, f'{name}-warmup')[workload], 1)
+                    stats = _stats(*runner(task, n))
+                    results[f'{name}.{workload}'] = stats
+                    out(f"{name:10} {workload:6} {stats['throughput_per_s']:8.1f}/s "
+                        f"p50={stats['p50_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms")
+    return {
+        'rows': rows, 'requests': n, 'threads': THREADS, 'concurrency': CONCURRENCY,
+        'upstream_delay_ms': UPSTREAM_DELAY * 1000, 'results': results,
+    }
@@ -0,0 +1,125 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.utils import timezone
+
+from ..querybudget import count_queries
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    دیتابیس تست (برای SQLite در حافظه) را می‌سازد، migrate می‌کند و در پایان پاک می‌کند.
+    کش sessions هم (که throttle، idempotency و کدهای کالبک را نگه می‌دارد) در حافظه و جدا از
+    کش فایلی سرور است تا اجراهای پشت سر هم روی هم اثر نگذارند.
+    """
+    caches = {**settings.CACHES, 'sessions': {**settings.CACHES['sessions'],
+                                             'BACKEND': 'api.cache.SweepingLocMemCache', 'LOCATION': 'bench-sessions'}}
+    with override_settings(CACHES=caches):
+        old_config = setup_databases(verbosity=verbosity, interactive=False)
+        try:
+            yield connection
+        finally:
+            teardown_databases(old_config, verbosity=verbosity)
+
+
+def seed_sellers(rows, batch=20000):
+    """
+    rows فروشنده با پخش یکنواخت روزها/شرایط را با SQL خام درج می‌کند؛
+    ORM برای میلیون ردیف بیش از حد کند است
+    """
+    now = timezone.now().isoformat()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, batch):
+            stop = min(start + batch, rows)
+            cursor.executemany(
+                'INSERT INTO api_user (id, username, user_type, created_at) VALUES (%s, %s, %s, %s)',
+                [(i + 1, f'seller{i}', 'seller', now) for i in range(start, stop)],
+            )
+            cursor.executemany(
+                'INSERT INTO api_sellerprofile (id, user_id, terms_accepted, payment_status, address, selected_day, version) '
+                'VALUES (%s, %s, %s, %s, %s, %s, 1)',
+                [
+                    # پیمانه‌های متفاوت تا ستون‌ها به هم وابسته نباشند
+                    (i + 1, i + 1, i % 3 != 0, i % 10 != 0, f'address {i}', DAYS[i % 7] if i % 11 else None)
+                    for i in range(start, stop)
+                ],
+            )
+        cursor.execute('ANALYZE')
+
+
+def seed_buyers(rows, offset=0, batch=20000):
+    now = timezone.now().isoformat()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, batch):
+            stop = min(start + batch, rows)
+            cursor.executemany(
+                'INSERT INTO api_user (id, username, user_type, created_at) VALUES (%s, %s, %s, %s)',
+                [(offset + i + 1, f'buyer{i}', 'buyer', now) for i in range(start, stop)],
+            )
+            cursor.executemany(
+                'INSERT INTO api_buyerprofile (id, user_id, terms_accepted, payment_status, version) VALUES (%s, %s, %s, %s, 1)',
+                [(i + 1, offset + i + 1, i % 2 == 0, True) for i in range(start, stop)],
+            )
+        cursor.execute('ANALYZE')
+
+
+def timeit(fn, repeat=200, warmup=10):
+    """
+    fn را repeat بار اجرا می‌کند و آمار زمان (میلی‌ثانیه) برمی‌گرداند
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 4),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 4),
+        'max_ms': round(samples[-1], 4),
+    }
+
+
+def profile(fn, repeat=200, warmup=10, requests=1, memory_repeat=20):
+    """
+    آمار زمان fn به علاوه میانگین کوئری در هر درخواست و بیشترین اوج حافظه یک اجرا (KiB).
+    حافظه در یک دور جداگانه با tracemalloc اندازه‌گیری می‌شود تا روی زمان‌ها اثر نگذارد.
+    requests تعداد درخواست‌های HTTP در هر بار اجرای fn است.
+    """
+    stats = timeit(fn, repeat=repeat, warmup=warmup)
+    with count_queries() as counter:
+        for _ in range(memory_repeat):
+            fn()
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(memory_repeat):
+            # زباله‌های چرخه‌ای اجرای قبلی نباید در اوج این اجرا حساب شوند
+            gc.collect()
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    stats['requests'] = requests
+    stats['queries_per_request'] = round(counter.count / (memory_repeat * requests), 2)
+    stats['peak_kib'] = round(peak / 1024, 1)
+    return stats
+
+
+def explain(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,75 @@
+"""
+پیدا کردن تغییرات selected_day با تعداد فروشنده‌های رو به رشد (rows/100، rows/10 و rows)؛
+بعد از هر دور CHANGES تغییر روی فروشنده‌های پراکنده:
+- feed: GET /api/sellers/changes/?since=<آخرین شماره دیده شده>
+- poll: خواندن کل /api/sellers/ صفحه به صفحه (کاری که سرویس زمان‌بندی می‌کرد)؛ بعد از هر
+  نوشتن نسخه جدول عوض شده، پس کش پاسخ کمکی نمی‌کند
+
+هر دو زمان (و شمار کوئری‌ها) شامل نوشتن همان CHANGES تغییر با یک executemany است.
+feed باید با رشد جدول تقریباً ثابت بماند و poll خطی رشد کند.
+"""
+import itertools
+
+from django.db import connection
+from django.test import Client
+
+from ..changes import last_seq
+from ..models import SellerProfile
+from .base import DAYS, profile, seed_sellers
+
+CHANGES = 20
+
+
+def _clear():
+    with connection.cursor() as cursor:
+        for table in ('api_sellerprofile', 'api_user', 'api_profilechange'):
+            cursor.execute(f'DELETE FROM {table}')
+
+
+def run(options, out):
+    rows = options['rows']
+    repeat = options['repeat']
+    client = Client()
+    results = {'rows': rows, 'changes_per_poll': CHANGES, 'sizes': []}
+    for size in sorted({max(100, rows // 100), max(100, rows // 10), rows}):
+        _clear()
+        seed_sellers(size)
+        step = max(1, size // CHANGES)
+        rounds = itertools.count()
+        position = {'since': last_seq('seller')}
+
+        def write_changes():
+            # آدرس هر دور تازه است (نوشتن بدون تغییر در لاگ ثبت نمی‌شود)
+            n = next(rounds)
+            with connection.cursor() as cursor:
+                cursor.executemany('UPDATE api_sellerprofile SET selected_day = %s, address = %s WHERE id = %s',
+                                   [(DAYS[n % 7], f'moved {n}', pk) for pk in range(1, size + 1, step)][:CHANGES])
+
+        def feed():
+            write_changes()
+            response = client.get('/api/sellers/changes/', {'since': position['since'], 'limit': 1000},
+                                  HTTP_ACCEPT='application/json')
+            body = response.json()
+            assert response.status_code == 200 and len(body['results']) == CHANGES, response.content[:200]
+            position['since'] = body['last_seq']
+
+        def poll():
+            write_changes()
+            url = '/api/sellers/?page_size=1000'
+            seen = 0
+            while url:
+                body = client.get(url, HTTP_ACCEPT='application/json').json()
+                seen += len(body['results'])
+                url = body['next']
+            assert seen == size, seen
+
+        stats = {
+            'sellers': size,
+            'feed': profile(feed, repeat=repeat, memory_repeat=5),
+            'poll': profile(poll, repeat=max(3, min(repeat, 2_000_000 // size)), warmup=1, memory_repeat=2),
+        }
+        results['sizes'].append(stats)
+        out(f"{size:9} sellers: feed p50={stats['feed']['p50_ms']:8.3f}ms queries={stats['feed']['queries_per_request']} "
+            f"| poll p50={stats['poll']['p50_ms']:10.3f}ms queries={stats['poll']['queries_per_request']}")
+    assert SellerProfile.objects.count() == rows
+    return results
@@ -0,0 +1,124 @@
+"""
+بنچمارک انتها به انتهای endpointها با Client تست جنگو: لیست و جزئیات، accept_terms،
+select_day و جریان ورود OAuth (redirect + callback) در برابر StubTokenServer.
+
+برای هر سناریو p50/p99، میانگین کوئری در هر درخواست و اوج حافظه گزارش می‌شود.
+خروجی را می‌توان با baseline مقایسه کرد:
+
+    python manage.py bench endpoints --rows 10000 --baseline api/benchmarks/baselines/endpoints.json
+
+تعداد کوئری‌ها باید دقیقاً برابر یا کمتر باشد. زمان و حافظه مطلق به ماشین بستگی دارد، پس
+مقایسه روی نسبت p50 و حافظه هر سناریو به سناریوی calibration (ریشه API بدون کوئری) در
+همان اجراست و این نسبت‌ها تا tolerance مجازند.
+"""
+import itertools
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import caches
+from django.test import Client, override_settings
+
+from ..models import BuyerProfile, SellerProfile
+from ..oauth_stub import StubTokenServer
+from .base import DAYS, profile, seed_buyers, seed_sellers
+
+# شناسه‌ها روی کل جدول پخش می‌شوند تا همیشه یک ردیف داغ خوانده نشود
+SAMPLE_IDS = 512
+# سناریوی مرجع نسبت‌ها
+CALIBRATION = 'calibration'
+RATIOS = {'p50_ms': 'p50_ratio', 'peak_kib': 'peak_ratio'}
+
+
+def _ids(model):
+    count = model.objects.count()
+    step = max(1, count // SAMPLE_IDS)
+    return itertools.cycle(range(1, count + 1, step))
+
+
+def _get(client, path, cold=False, **extra):
+    def request():
+        if cold:
+            caches['default'].clear()
+        response = client.get(path() if callable(path) else path, HTTP_ACCEPT='application/json', **extra)
+        assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+    return request
+
+
+def _post(client, path, payload):
+    def request():
+        response = client.post(path(), payload(), content_type='application/json')
+        assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+    return request
+
+
+def _oauth_login(client):
+    codes = itertools.count()
+
+    def request():
+        response = client.get('/api/oauth/redirect/', HTTP_ACCEPT='application/json')
+        state = parse_qs(urlsplit(response.json()['auth_url']).query)['state'][0]
+        response = client.get('/api/oauth/callback/', {'code': f'bench-{next(codes)}', 'state': state})
+        assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+    return request
+
+
+def _scenarios(client):
+    sellers, buyers = _ids(SellerProfile), _ids(BuyerProfile)
+    days, flags = itertools.cycle(DAYS), itertools.cycle([True, False])
+    return [
+        (CALIBRATION, _get(client, '/api/'), 1),
+        ('sellers.list', _get(client, '/api/sellers/', cold=True), 1),
+        ('sellers.list.cached', _get(client, '/api/sellers/'), 1),
+        ('sellers.list.filtered', _get(client, '/api/sellers/?selected_day=saturday&terms_accepted=true', cold=True), 1),
+        ('sellers.retrieve', _get(client, lambda: f'/api/sellers/{next(sellers)}/', cold=True), 1),
+        ('sellers.day_counts', _get(client, '/api/sellers/day-counts/'), 1),
+        ('sellers.accept_terms', _post(client, lambda: f'/api/sellers/{next(sellers)}/accept_terms/',
+                                       lambda: {'terms_accepted': next(flags)}), 1),
+        ('sellers.select_day', _post(client, lambda: f'/api/sellers/{next(sellers)}/select_day/',
+                                     lambda: {'selected_day': next(days)}), 1),
+        ('buyers.list', _get(client, '/api/buyers/', cold=True), 1),
+        ('buyers.retrieve', _get(client, lambda: f'/api/buyers/{next(buyers)}/', cold=True), 1),
+        ('buyers.accept_terms', _post(client, lambda: f'/api/buyers/{next(buyers)}/accept_terms/',
+                                      lambda: {'terms_accepted': next(flags)}), 1),
+        ('oauth.redirect', _get(client, '/api/oauth/redirect/'), 1),
+        ('oauth.login', _oauth_login(client), 2),
+    ]
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    seed_buyers(rows, offset=rows)
+
+    results = {}
+    # throttle همه درخواست‌های Client (یک آی‌پی) را بعد از چند تا 429 می‌کند
+    with StubTokenServer() as stub, override_settings(OAUTH2_TOKEN_URL=stub.token_url, OAUTH2_THROTTLE_RATES={}):
+        for name, request, requests in _scenarios(Client()):
+            stats = profile(request, repeat=options['repeat'], requests=requests)
+            for metric, ratio in RATIOS.items():
+                stats[ratio] = round(stats[metric] / results.get(CALIBRATION, stats)[metric], 2)
+            results[name] = stats
+            out(f"{name:24} p50={stats['p50_ms']:8.3f}ms ({stats['p50_ratio']:6.2f}x) p99={stats['p99_ms']:8.3f}ms "
+                f"queries={stats['queries_per_request']:5} peak={stats['peak_kib']:9.1f}KiB ({stats['peak_ratio']:5.2f}x)")
+    return {'rows': rows, 'scenarios': results}
+
+
+def compare(result, baseline, tolerance):
+    """
+    لیست رگرسیون‌ها نسبت به baseline (خالی یعنی قبول)
+    """
+    regressions = []
+    if result['rows'] != baseline['rows']:
+        regressions.append(f"rows {result['rows']} != baseline rows {baseline['rows']}")
+    for name, expected in baseline['scenarios'].items():
+        actual = result['scenarios'].get(name)
+        if actual is None:
+            regressions.append(f'{name}: missing')
+            continue
+        if actual['queries_per_request'] > expected['queries_per_request']:
+            regressions.append(f"{name}: {actual['queries_per_request']} queries per request, "
+                               f"baseline {expected['queries_per_request']}")
+        for ratio in RATIOS.values():
+            if actual[ratio] > expected[ratio] * (1 + tolerance):
+                regressions.append(f'{name}: {ratio} {actual[ratio]} > baseline {expected[ratio]} '
+                                   f'(+{tolerance:.0%})')
+    return regressions
@@ -0,0 +1,48 @@
+"""
+Idempotency-Key روی select_day:
+- plain: بدون هدر (رفتار قبلی)
+- first: هر درخواست یک کلید تازه (هزینه اضافه رزرو و ذخیره پاسخ)
+- replay: تکرار یک کلید ثابت، مثل retry کلاینت موبایل (پاسخ از کش، بدون کوئری)
+"""
+import itertools
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client
+
+from ..models import SellerProfile
+from .base import DAYS, profile, seed_sellers
+
+
+def _select_day(client, ids, keys=None, replay=False):
+    days = itertools.cycle(DAYS)
+
+    def request():
+        extra = {'HTTP_IDEMPOTENCY_KEY': next(keys)} if keys else {}
+        # در replay بدنه و مسیر باید با درخواست اول یکی باشد
+        pk, day = (ids[0], DAYS[0]) if replay else (next(ids), next(days))
+        response = client.post(f'/api/sellers/{pk}/select_day/', {'selected_day': day},
+                               content_type='application/json', **extra)
+        assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+    return request
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    ids = list(SellerProfile.objects.order_by('id').values_list('id', flat=True))
+    client = Client()
+    caches[settings.IDEMPOTENCY_CACHE_ALIAS].clear()
+
+    scenarios = {
+        'plain': _select_day(client, itertools.cycle(ids)),
+        'first': _select_day(client, itertools.cycle(ids), map(str, itertools.count())),
+        'replay': _select_day(client, ids, itertools.repeat('retry'), replay=True),
+    }
+    results = {}
+    for name, fn in scenarios.items():
+        stats = profile(fn, repeat=options['repeat'])
+        results[name] = stats
+        out(f"select_day {name:6} p50={stats['p50_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms "
+            f"queries={stats['queries_per_request']}")
+    return results
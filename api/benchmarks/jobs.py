@@ -0,0 +1,67 @@
+"""
+صف کارهای پس‌زمینه:
+- select_day با یک کار جانبی کند (SIDE_EFFECT_DELAY برای هر فراخوانی، مثل یک رفت و برگشت
+  HTTP): queued فقط job را در صف می‌گذارد، inline همان job را داخل درخواست اجرا می‌کند
+  (رفتار قبل از صف)
+- تخلیه صف: jobs/s ورکر با batch_size=1 و JOB_BATCH_SIZE؛ در حالت دسته‌ای هزینه هر فراخوانی
+  کار جانبی بین همه jobهای دسته تقسیم می‌شود
+"""
+import itertools
+import time
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+from ..jobs import run_pending
+from ..models import Job, SellerProfile
+from ..onboarding import enqueue_completed
+from .base import DAYS, profile, seed_sellers
+
+SIDE_EFFECT_DELAY = 0.005
+
+
+def slow_side_effect(profile_type, profiles):
+    time.sleep(SIDE_EFFECT_DELAY)
+
+
+def _select_day(client, ids, inline):
+    days = itertools.cycle(DAYS)
+
+    def request():
+        response = client.post(f'/api/sellers/{next(ids)}/select_day/', {'selected_day': next(days)},
+                               content_type='application/json')
+        assert response.status_code == 200, f'{response.status_code}: {response.content[:200]}'
+        if inline:
+            run_pending()
+    return request
+
+
+def _drain(ids, batch_size):
+    Job.objects.all().delete()
+    enqueue_completed('seller', ids)
+    start = time.perf_counter()
+    processed = run_pending(batch_size=batch_size)
+    assert processed == len(ids), processed
+    return round(processed / (time.perf_counter() - start), 1)
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    ids = list(SellerProfile.objects.order_by('id').values_list('id', flat=True))
+    client = Client()
+
+    results = {'side_effect_delay_ms': SIDE_EFFECT_DELAY * 1000, 'requests': {}, 'drain_jobs_per_s': {}}
+    with override_settings(ONBOARDING_SIDE_EFFECTS=[f'{__name__}.slow_side_effect']):
+        for name, inline in (('inline', True), ('queued', False)):
+            stats = profile(_select_day(client, itertools.cycle(ids), inline), repeat=options['repeat'])
+            results['requests'][name] = stats
+            out(f"select_day {name:7} p50={stats['p50_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms "
+                f"queries={stats['queries_per_request']}")
+
+        jobs = ids[:min(len(ids), options['repeat'] * 10)]
+        for batch_size in (1, settings.JOB_BATCH_SIZE):
+            rate = _drain(jobs, batch_size)
+            results['drain_jobs_per_s'][batch_size] = rate
+            out(f'drain {len(jobs)} jobs batch_size={batch_size:<4} {rate:10.1f} jobs/s')
+    return results
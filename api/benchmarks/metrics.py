@@ -0,0 +1,78 @@
+"""
+سربار PerformanceMiddleware به دو روش:
+- intrinsic: زمان خود middleware دور یک view خالی (میکروثانیه در هر درخواست)
+- http: همان درخواست‌ها با دو Client، یکی با middleware فعال و یکی بدون آن، درخواست به
+  درخواست یک در میان؛ روی Client تست نویز حدود ±۲۰ میکروثانیه است.
+
+wrapperهای serialize (timed_calls) موقع import انتخاب می‌شوند؛ برای حساب کردن هزینه آن‌ها در
+حالت فعال بنچمارک را با PERF_METRICS_ENABLED=True اجرا کنید.
+"""
+import statistics
+import time
+import timeit
+
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+
+from ..metrics import PerformanceMiddleware
+from ..models import SellerProfile
+from .base import seed_buyers, seed_sellers
+
+PATHS = ['/api/sellers/', '/api/sellers/?selected_day=saturday', '/api/buyers/', '/api/oauth/redirect/']
+
+
+def _client(enabled):
+    # زنجیره middleware در اولین درخواست هر Client ساخته می‌شود
+    client = Client()
+    with override_settings(PERF_METRICS_ENABLED=enabled):
+        response = client.get(PATHS[0], HTTP_ACCEPT='application/json')
+    assert ('Server-Timing' in response) == enabled
+    return client
+
+
+def _sample(client, path):
+    start = time.perf_counter()
+    client.get(path, HTTP_ACCEPT='application/json')
+    return (time.perf_counter() - start) * 1000
+
+
+def _intrinsic_us(number=20000):
+    def view(request):
+        return HttpResponse()
+    with override_settings(PERF_METRICS_ENABLED=True):
+        middleware = PerformanceMiddleware(view)
+    request = RequestFactory().get('/api/sellers/')
+    bare = min(timeit.repeat(lambda: view(request), number=number, repeat=5))
+    wrapped = min(timeit.repeat(lambda: middleware(request), number=number, repeat=5))
+    return (wrapped - bare) / number * 1e6
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    seed_buyers(rows, offset=rows)
+    detail = f'/api/sellers/{SellerProfile.objects.order_by("id").values_list("id", flat=True)[rows // 2]}/'
+    off, on = _client(False), _client(True)
+    intrinsic = _intrinsic_us()
+    # throttle نباید درخواست‌های تکراری redirect را 429 کند
+    throttling = override_settings(OAUTH2_THROTTLE_RATES={})
+    throttling.enable()
+    out(f'intrinsic middleware cost: {intrinsic:.1f}us per request')
+
+    results = {'intrinsic_us': round(intrinsic, 2), 'paths': {}}
+    for path in PATHS + [detail]:
+        samples = {'off': [], 'on': []}
+        for i in range(options['repeat']):
+            # ترتیب هم یک در میان عوض می‌شود
+            for name, client in (('off', off), ('on', on)) if i % 2 else (('on', on), ('off', off)):
+                samples[name].append(_sample(client, path))
+        base, instrumented = statistics.median(samples['off']), statistics.median(samples['on'])
+        overhead = instrumented / base - 1
+        results['paths'][path] = {
+            'off_ms': round(base, 4), 'on_ms': round(instrumented, 4),
+            'http_overhead': round(overhead, 4), 'intrinsic_overhead': round(intrinsic / 1000 / base, 4),
+        }
+        out(f'{path:40} off={base:.3f}ms on={instrumented:.3f}ms http={overhead:+.2%} '
+            f'intrinsic={intrinsic / 1000 / base:.2%}')
+    throttling.disable()
+    return results
@@ -0,0 +1,183 @@
+"""
+گارد plan کوئری‌ها: هر action ویوست‌های buyers/sellers با Client تست روی دیتابیس seed شده
+(با ANALYZE) اجرا می‌شود، SQL هر کوئری روی همه aliasهای دیتابیس گرفته و EXPLAIN QUERY PLAN آن
+روی همان alias ثبت می‌شود (کوئری‌هایی که روتر به replica می‌فرستد هم بررسی می‌شوند).
+
+SCAN کامل یک جدول یا USE TEMP B-TREE (مرتب‌سازی/گروه‌بندی بدون ایندکس) خطاست، مگر برای همان
+سناریو در allow آمده باشد (فقط جدول کوچک شمارنده روزها). صفحه اول لیست و export هم جست‌وجوی
+بازه روی کلید اصلی‌اند و استثنا ندارند. خروجی JSON گزارش plan همه کوئری‌هاست و بین نسخه‌ها
+diff می‌شود:
+
+    python manage.py bench plans --json plans.json
+    python manage.py bench plans --baseline api/benchmarks/baselines/plans.json
+
+با baseline هر plan یا کوئری که عوض شده باشد هم گزارش می‌شود؛ تغییر عمدی (مثلاً ایندکس تازه)
+یعنی به‌روز کردن فایل baseline در همان تغییر.
+"""
+import itertools
+from contextlib import ExitStack
+
+from django.core.cache import caches
+from django.db import connections
+from django.test import Client
+
+from ..models import BuyerProfile, SellerProfile
+from .base import seed_buyers, seed_sellers
+
+TEMP_B_TREE = 'temp-b-tree'
+# دستورهای تراکنش و PRAGMA plan ندارند
+_SKIP = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA')
+
+
+class _Capture:
+    """
+    execute_wrapper که کوئری‌های همه aliasها را به صورت (alias, sql) -> params به ترتیب و
+    بدون تکرار نگه می‌دارد
+    """
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (context['connection'].alias, sql)
+        if not sql.lstrip().upper().startswith(_SKIP) and key not in self.queries:
+            # برای executemany plan با اولین ردیف پارامترها گرفته می‌شود
+            self.queries[key] = next(iter(params), ()) if many else params
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for conn in connections.all():
+            self._stack.enter_context(conn.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._stack.__exit__(*exc_info)
+
+
+def _explain(alias, sql, params):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _problems(plan, allow):
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail and 'CONSTANT ROW' not in detail:
+            table = detail.split()[1]
+            if table not in allow:
+                problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE') and TEMP_B_TREE not in allow:
+            problems.append(detail)
+    return problems
+
+
+def _scenarios(client):
+    seller = SellerProfile.objects.order_by('id').values_list('id', flat=True)[50]
+    buyer = BuyerProfile.objects.order_by('id').values_list('id', flat=True)[50]
+    sellers = list(SellerProfile.objects.order_by('id').values_list('id', flat=True)[100:110])
+    buyers = list(BuyerProfile.objects.order_by('id').values_list('id', flat=True)[100:110])
+    names = itertools.count()
+
+    def get(path):
+        return lambda: client.get(path, HTTP_ACCEPT='application/json')
+
+    def post(path, payload):
+        return lambda: client.post(path, payload() if callable(payload) else payload, content_type='application/json')
+
+    def next_page(path):
+        # لینک صفحه دوم همین حالا (بیرون از ضبط کوئری‌ها) گرفته می‌شود
+        return client.get(path, HTTP_ACCEPT='application/json').json()['next']
+
+    # (نام، درخواست، جدول‌هایی که SCAN آن‌ها مجاز است)
+    return [
+        ('sellers.list', get('/api/sellers/'), set()),
+        ('sellers.list.next_page', get(next_page('/api/sellers/')), set()),
+        ('sellers.list.day_terms', get('/api/sellers/?selected_day=saturday&terms_accepted=true'), set()),
+        ('sellers.list.terms_payment', get('/api/sellers/?terms_accepted=true&payment_status=false'), set()),
+        ('sellers.export', get('/api/sellers/?export=ndjson'), set()),
+        ('sellers.retrieve', get(f'/api/sellers/{seller}/'), set()),
+        ('sellers.accept_terms', post(f'/api/sellers/{seller}/accept_terms/', {'terms_accepted': True}), set()),
+        ('sellers.select_day', post(f'/api/sellers/{seller}/select_day/', {'selected_day': 'friday'}), set()),
+        # جدول شمارنده حداکثر ۱۶ ردیف دارد
+        ('sellers.day_counts', get('/api/sellers/day-counts/'), {'api_sellerdaycount'}),
+        ('sellers.search', get('/api/sellers/search/?q=seller12'), set()),
+        ('sellers.changes', get('/api/sellers/changes/?since=1'), set()),
+        ('sellers.bulk_accept_terms', post('/api/sellers/bulk_accept_terms/',
+                                           [{'id': pk, 'terms_accepted': True} for pk in sellers]), set()),
+        ('sellers.bulk_select_day', post('/api/sellers/bulk_select_day/',
+                                         [{'id': pk, 'selected_day': 'monday'} for pk in sellers]), set()),
+        ('sellers.bulk_create', post('/api/sellers/bulk_create/',
+                                     lambda: [{'username': f'plan-seller{next(names)}', 'address': 'a'}]), set()),
+        ('buyers.list', get('/api/buyers/'), set()),
+        ('buyers.list.next_page', get(next_page('/api/buyers/')), set()),
+        ('buyers.export', get('/api/buyers/?export=ndjson'), set()),
+        ('buyers.retrieve', get(f'/api/buyers/{buyer}/'), set()),
+        ('buyers.accept_terms', post(f'/api/buyers/{buyer}/accept_terms/', {'terms_accepted': True}), set()),
+        ('buyers.changes', get('/api/buyers/changes/?since=1'), set()),
+        ('buyers.bulk_accept_terms', post('/api/buyers/bulk_accept_terms/',
+                                          [{'id': pk, 'terms_accepted': False} for pk in buyers]), set()),
+        ('buyers.bulk_create', post('/api/buyers/bulk_create/',
+                                    lambda: [{'username': f'plan-buyer{next(names)}'}]), set()),
+    ]
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    seed_buyers(rows, offset=rows)
+    client = Client()
+
+    report = {}
+    violations = []
+    for name, request, allow in _scenarios(client):
+        # پاسخ‌های کش شده کوئری داده ندارند
+        caches['default'].clear()
+        capture = _Capture()
+        with capture:
+            response = request()
+        assert response.status_code == 200, f'{name}: {response.status_code} {response.content[:200]}'
+        if hasattr(response, 'streaming_content'):
+            with capture:
+                b''.join(response.streaming_content)
+
+        queries = []
+        for (alias, sql), params in capture.queries.items():
+            plan = _explain(alias, sql, params)
+            if not plan:
+                continue
+            problems = _problems(plan, allow)
+            queries.append({'alias': alias, 'sql': sql, 'plan': plan})
+            violations.extend(f'{name} [{alias}]: {problem}\n    {sql}' for problem in problems)
+        report[name] = queries
+        out(f"{name:28} {len(queries):2} queries" + ''.join(
+            f"\n    {' | '.join(query['plan'])}" for query in queries
+        ))
+    for violation in violations:
+        out(f'VIOLATION {violation}')
+    return {'rows': rows, 'violations': violations, 'scenarios': report}
+
+
+def compare(result, baseline, tolerance):
+    """
+    تخلف‌های plan به علاوه هر سناریو، کوئری یا plan که نسبت به baseline عوض شده است
+    """
+    regressions = list(result['violations'])
+    if result['rows'] != baseline['rows']:
+        regressions.append(f"rows {result['rows']} != baseline rows {baseline['rows']}")
+    for name, expected in baseline['scenarios'].items():
+        actual = result['scenarios'].get(name)
+        if actual is None:
+            regressions.append(f'{name}: missing')
+            continue
+        expected_plans = {(query['alias'], query['sql']): query['plan'] for query in expected}
+        for query in actual:
+            key = (query['alias'], query['sql'])
+            if key not in expected_plans:
+                regressions.append(f"{name} [{query['alias']}]: new query {query['sql']}\n"
+                                   f"    {' | '.join(query['plan'])}")
+            elif query['plan'] != expected_plans[key]:
+                regressions.append(f"{name} [{query['alias']}]: plan changed for {query['sql']}\n"
+                                   f"    baseline: {' | '.join(expected_plans[key])}\n"
+                                   f"    now:      {' | '.join(query['plan'])}")
+    return regressions
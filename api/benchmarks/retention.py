@@ -0,0 +1,75 @@
+"""
+آرشیو و فشرده‌سازی: rows کاربر (نیمی فروشنده، نیمی خریدار) که همه قدیمی‌تر از
+RETENTION_ABANDONED_DAYS هستند؛ کاربرهای رها شده (حدود نیمی) آرشیو و حذف می‌شوند.
+- archive: رکورد در ثانیه و طولانی‌ترین تکه (مدت نگه داشتن قفل نوشتن)
+- compact.incremental و compact.full: زمان و تعداد صفحه‌های دیتابیس قبل و بعد؛ incremental فقط
+  صفحه‌های کاملاً خالی را برمی‌گرداند و چون ردیف‌های رها شده بین ردیف‌های زنده پخش هستند
+  کوچک‌شدن واقعی (و فشرده شدن ایندکس‌ها) با VACUUM کامل است
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from ..retention import abandoned_users, archive_users, compact, enable_incremental_vacuum
+from .base import seed_buyers, seed_sellers
+
+
+def _seed(rows):
+    with connection.cursor() as cursor:
+        for table in ('api_sellerprofile', 'api_buyerprofile', 'api_user'):
+            cursor.execute(f'DELETE FROM {table}')
+    seed_sellers(rows // 2)
+    seed_buyers(rows - rows // 2, offset=rows // 2)
+    old = timezone.now() - timedelta(days=settings.RETENTION_ABANDONED_DAYS + 1)
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE api_user SET created_at = %s', [old.isoformat()])
+
+
+def _archive(path):
+    chunks = []
+    last = time.perf_counter()
+
+    def progress(count):
+        nonlocal last
+        now = time.perf_counter()
+        chunks.append(now - last)
+        last = now
+
+    start = time.perf_counter()
+    archived = archive_users(abandoned_users(), path, progress=progress)
+    elapsed = time.perf_counter() - start
+    return {
+        'archived': archived,
+        'records_per_s': round(archived / elapsed),
+        'max_chunk_ms': round(max(chunks) * 1000, 2),
+        'archive_kib': round(os.path.getsize(path) / 1024, 1),
+    }
+
+
+def _compact(full):
+    start = time.perf_counter()
+    before, after = compact(full=full)
+    return {'seconds': round(time.perf_counter() - start, 3), 'pages_before': before, 'pages_after': after}
+
+
+def run(options, out):
+    rows = options['rows']
+    results = {'rows': rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('full', 'incremental'):
+            _seed(rows)
+            if mode == 'incremental':
+                enable_incremental_vacuum()
+            stats = _archive(os.path.join(tmp, f'{mode}.ndjson.gz'))
+            results[f'archive.{mode}'] = stats
+            out(f"archive.{mode:11} {stats['archived']:8} users {stats['records_per_s']:8}/s "
+                f"max_chunk={stats['max_chunk_ms']:7.2f}ms archive={stats['archive_kib']:9.1f}KiB")
+            stats = _compact(full=mode == 'full')
+            results[f'compact.{mode}'] = stats
+            out(f"compact.{mode:11} {stats['seconds']:8.3f}s pages {stats['pages_before']} -> {stats['pages_after']}")
+    return results
@@ -0,0 +1,62 @@
+"""
+جستجوی فروشنده با تعداد فروشنده‌های رو به رشد (rows/100، rows/10 و rows):
+- endpoint: GET /api/sellers/search/?q=<username> بدون کش پاسخ (هر بار ایندکس FTS5 خوانده می‌شود)
+- fts: فقط کوئری MATCH (search_seller_ids)
+- scan: همان جستجو با icontains روی username و address (کاری که کلاینت با گرفتن همه لیست می‌کرد)
+
+usernameها از دهک آخر هر اندازه انتخاب می‌شوند تا پیشوند (sellerN*) فقط یک ردیف داشته باشد و
+تعداد ردیف‌های منطبق با رشد جدول ثابت بماند؛ fts و endpoint باید تقریباً ثابت بمانند و scan خطی رشد کند.
+"""
+import itertools
+import random
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+
+from ..models import SellerProfile
+from ..search import search_seller_ids
+from .base import profile, seed_sellers, timeit
+
+SAMPLE_NAMES = 512
+
+
+def _clear():
+    with connection.cursor() as cursor:
+        for table in ('api_sellerprofile', 'api_user'):
+            cursor.execute(f'DELETE FROM {table}')
+
+
+def run(options, out):
+    rows = options['rows']
+    repeat = options['repeat']
+    client = Client()
+    results = {'rows': rows, 'sizes': []}
+    for size in sorted({max(100, rows // 100), max(100, rows // 10), rows}):
+        _clear()
+        seed_sellers(size)
+        rng = random.Random(size)
+        names = itertools.cycle([f'seller{rng.randrange(size // 10, size)}' for _ in range(SAMPLE_NAMES)])
+
+        def endpoint():
+            caches['default'].clear()
+            response = client.get('/api/sellers/search/', {'q': next(names)}, HTTP_ACCEPT='application/json')
+            assert response.status_code == 200 and len(response.json()['results']) == 1, response.content[:200]
+
+        def scan():
+            q = next(names)
+            list(SellerProfile.objects.filter(Q(user__username__icontains=q) | Q(address__icontains=q))
+                 .values_list('id', flat=True)[:20])
+
+        stats = {
+            'sellers': size,
+            'endpoint': profile(endpoint, repeat=repeat),
+            'fts': timeit(lambda: search_seller_ids(next(names), 21), repeat=repeat),
+            'scan': timeit(scan, repeat=min(repeat, 50), warmup=2),
+        }
+        results['sizes'].append(stats)
+        out(f"{size:9} sellers: endpoint p50={stats['endpoint']['p50_ms']:8.3f}ms "
+            f"queries={stats['endpoint']['queries_per_request']} | fts p50={stats['fts']['p50_ms']:8.3f}ms | "
+            f"scan p50={stats['scan']['p50_ms']:9.3f}ms")
+    return results
@@ -0,0 +1,47 @@
+"""
+زمان صفحه اول /api/sellers/ با فیلترهای selected_day / terms_accepted / payment_status.
+sql زمان اجرای خود کوئری در SQLite است و orm زمان ساخت مدل‌ها هم را شامل می‌شود.
+"""
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from ..filters import ProfileFilterBackend
+from ..models import SellerProfile
+from ..views import SellerViewSet
+from .base import explain, seed_sellers, timeit
+
+CASES = [
+    {'selected_day': 'saturday', 'terms_accepted': 'true'},
+    {'selected_day': 'saturday', 'terms_accepted': 'true', 'payment_status': 'true'},
+    {'terms_accepted': 'true', 'payment_status': 'false'},
+    {'selected_day': 'monday'},
+]
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    page_size = SellerViewSet.pagination_class.page_size
+    results = []
+    view = SellerViewSet()
+    for filters in CASES:
+        # کوئری دقیقاً از همان مسیر فیلتر ویوست ساخته می‌شود
+        request = Request(RequestFactory().get('/api/sellers/', filters))
+        queryset = ProfileFilterBackend().filter_queryset(request, SellerViewSet.queryset, view)
+        queryset = queryset.order_by('id')[:page_size + 1]
+        sql, params = queryset.query.sql_with_params()
+
+        def run_sql():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                cursor.fetchall()
+
+        sql_stats = timeit(run_sql, repeat=options['repeat'])
+        orm_stats = timeit(lambda: list(queryset._chain()), repeat=options['repeat'])
+        plan = explain(sql, params)
+        results.append({'filters': filters, 'sql': sql_stats, 'orm': orm_stats, 'plan': plan})
+        out(f"{filters}: sql p50={sql_stats['p50_ms']}ms p99={sql_stats['p99_ms']}ms | "
+            f"orm p50={orm_stats['p50_ms']}ms | {plan}")
+    assert SellerProfile.objects.count() == rows
+    return {'rows': rows, 'cases': results}
@@ -0,0 +1,85 @@
+"""
+مقایسه مسیر سریع (CompiledSerializer + FastJSONRenderer) با ModelSerializer + JSONRenderer:
+اول خروجی هر دو بایت به بایت مقایسه می‌شود، بعد ردیف در ثانیه اندازه‌گیری می‌شود.
+"""
+import time
+
+from django.core.cache import caches
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from ..fastpath import compile_serializer
+from ..models import BuyerProfile, SellerProfile, User
+from ..renderers import FastJSONRenderer
+from ..serializers import BuyerProfileSerializer, SellerProfileSerializer
+from ..views import BuyerViewSet, SellerViewSet
+from .base import seed_buyers, seed_sellers
+
+TRICKY_ADDRESSES = ['تهران، خیابان آزادی', 'line\nbreak "quoted" \\ slash', '  ', '😀', '']
+
+
+def _seed_tricky():
+    for i, address in enumerate(TRICKY_ADDRESSES):
+        user = User.objects.create(username=f'tricky-{i}-نام', user_type='seller')
+        SellerProfile.objects.create(user=user, address=address, selected_day=None if i % 2 else 'friday')
+
+
+def _rows_per_second(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def _check_identical_http(out):
+    client = Client()
+    paths = ['/api/sellers/', '/api/sellers/?page_size=7', '/api/buyers/', '/api/sellers/?selected_day=friday',
+             f'/api/sellers/{SellerProfile.objects.order_by("-id").values_list("id", flat=True).first()}/',
+             f'/api/buyers/{BuyerProfile.objects.values_list("id", flat=True).first()}/', '/api/sellers/999999999/']
+    for path in paths:
+        bodies = []
+        for fast in (False, True):
+            caches['default'].clear()
+            with override_settings(API_FAST_SERIALIZATION=fast):
+                response = client.get(path, HTTP_ACCEPT='application/json')
+            bodies.append((response.status_code, response.content))
+        assert bodies[0] == bodies[1], f'{path}: fast path output differs\n{bodies[0]}\n{bodies[1]}'
+    out(f'byte-identical HTTP responses for {len(paths)} paths')
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows)
+    seed_buyers(min(rows, 1000), offset=rows)
+    _seed_tricky()
+    _check_identical_http(out)
+
+    results = {}
+    for name, viewset, serializer_class in [
+        ('sellers', SellerViewSet, SellerProfileSerializer),
+        ('buyers', BuyerViewSet, BuyerProfileSerializer),
+    ]:
+        queryset = viewset.queryset.order_by('id')
+        compiled = compile_serializer(serializer_class)
+        count = queryset.count()
+
+        def slow():
+            return JSONRenderer().render(serializer_class(queryset._chain(), many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render([compiled.build(row) for row in compiled.values(queryset._chain())])
+
+        assert slow() == fast(), f'{name}: fast path output differs'
+        slow_rps = _rows_per_second(slow, count, 3)
+        fast_rps = _rows_per_second(fast, count, 3)
+        results[name] = {
+            'rows': count,
+            'modelserializer_rows_per_s': round(slow_rps),
+            'fastpath_rows_per_s': round(fast_rps),
+            'speedup': round(fast_rps / slow_rps, 2),
+        }
+        out(f"{name}: {count} rows identical; ModelSerializer {slow_rps:,.0f} rows/s, "
+            f"fast path {fast_rps:,.0f} rows/s ({fast_rps / slow_rps:.1f}x)")
+    return results
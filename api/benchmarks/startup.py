@@ -0,0 +1,63 @@
+"""
+شروع سرد ورکر: در یک پروسه پایتون تازه، زمان import expertise.wsgi (setup جنگو، middlewareها
+و warm_up) و بعد اولین درخواست GET /api/oauth/redirect/ که مستقیماً به application داده
+می‌شود (بدون سرور و بدون دیتابیس). تنظیمات کامل با API_ONLY=True مقایسه می‌شود.
+
+repeat تعداد پروسه‌ها برای هر حالت است (میانه گزارش می‌شود).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+
+_CHILD = r"""
+import io, json, sys, time
+start = time.perf_counter()
+from expertise.wsgi import application
+ready = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/oauth/redirect/', 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '8000', 'REMOTE_ADDR': '127.0.0.1',
+    'HTTP_ACCEPT': 'application/json', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+}
+status = []
+body = b''.join(application(environ, lambda s, h, *a: status.append(s)))
+done = time.perf_counter()
+assert status[0].startswith('200'), (status, body[:200])
+print(json.dumps({'import_ms': (ready - start) * 1000, 'first_response_ms': (done - ready) * 1000,
+                  'modules': len(sys.modules)}))
+"""
+
+PROFILES = {
+    'full': {},
+    'api-only': {'API_ONLY': 'True'},
+}
+
+
+def _sample(env):
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD], env=env, cwd=settings.BASE_DIR,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(options, out):
+    repeat = min(options['repeat'], 30)
+    results = {}
+    for name, extra in PROFILES.items():
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'expertise.settings', 'API_ONLY': '', **extra}
+        _sample(env)  # گرم شدن کش فایل‌ها و .pyc
+        samples = [_sample(env) for _ in range(repeat)]
+        stats = {
+            key: round(statistics.median(sample[key] for sample in samples), 2)
+            for key in ('import_ms', 'first_response_ms', 'modules')
+        }
+        stats['total_ms'] = round(statistics.median(s['import_ms'] + s['first_response_ms'] for s in samples), 2)
+        results[name] = stats
+        out(f"{name:9} import={stats['import_ms']:7.1f}ms first_response={stats['first_response_ms']:6.1f}ms "
+            f"total={stats['total_ms']:7.1f}ms modules={stats['modules']:.0f}")
+    return results
@@ -0,0 +1,62 @@
+"""
+export_profiles و import_profiles روی rows کاربر (نیمی فروشنده، نیمی خریدار):
+- export به CSV
+- import همان فایل در جدول‌های خالی (همه created)
+- import دوباره همان فایل (همه unchanged، مثل ادامه دادن بعد از خطا)
+
+برای هر مرحله رکورد در ثانیه و اوج حافظه پایتون (tracemalloc، در یک اجرای جدا) گزارش می‌شود.
+"""
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management import call_command
+from django.db import connection
+
+from .base import seed_buyers, seed_sellers
+
+
+def _clear():
+    with connection.cursor() as cursor:
+        for table in ('api_sellerprofile', 'api_buyerprofile', 'api_user'):
+            cursor.execute(f'DELETE FROM {table}')
+
+
+def _measure(fn, rows, before=None):
+    if before:
+        before()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    if before:
+        before()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(elapsed, 2), 'records_per_s': round(rows / elapsed), 'peak_kib': round(peak / 1024, 1)}
+
+
+def run(options, out):
+    rows = options['rows']
+    seed_sellers(rows // 2)
+    seed_buyers(rows - rows // 2, offset=rows // 2)
+
+    results = {'rows': rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'profiles.csv')
+        quiet = {'stdout': io.StringIO(), 'stderr': io.StringIO()}
+        steps = [
+            ('export', lambda: call_command('export_profiles', path, **quiet), None),
+            ('import.created', lambda: call_command('import_profiles', path, **quiet), _clear),
+            ('import.unchanged', lambda: call_command('import_profiles', path, **quiet), None),
+        ]
+        for name, fn, before in steps:
+            stats = _measure(fn, rows, before)
+            results[name] = stats
+            out(f"{name:17} {stats['seconds']:8.2f}s {stats['records_per_s']:8}/s peak={stats['peak_kib']:9.1f}KiB")
+    return results
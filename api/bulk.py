@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import User
+
+# تعداد پارامترها در هر کوئری IN (محدودیت متغیرهای SQLite)
+CHUNK_SIZE = 900
+
+
+class BulkError(Exception):
+    status_code = 400
+
+
+class BulkConflict(BulkError):
+    """
+    درج همزمان usernameی که هنوز در بررسی قبلی آزاد بود؛ تکرار درخواست آن را exists گزارش می‌کند
+    """
+    status_code = 409
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _check_items(items):
+    if not isinstance(items, list) or not items:
+        raise BulkError('a non-empty list of items is required')
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise BulkError(f'at most {settings.BULK_MAX_ITEMS} items per request')
+
+
+def _existing_ids(model, ids):
+    found = set()
+    for chunk in _chunks(ids):
+        found.update(model.objects.filter(id__in=chunk).values_list('id', flat=True))
+    return found
+
+
+def bulk_set_field(model, field, items, validate):
+    """
+    items: لیست {'id': ..., field: ...}
+    validate(value) مقدار تمیز شده را برمی‌گرداند یا ValueError می‌دهد. id تکراری در یک
+    درخواست (مقدار برنده نامعلوم می‌شد) مثل username تکراری bulk_create_profiles رد می‌شود.
+
+    مقادیر بر اساس value گروه‌بندی می‌شوند و برای هر گروه یک UPDATE ... WHERE id IN (...)
+    اجرا می‌شود، پس تعداد کوئری‌ها به تعداد مقادیر متمایز بستگی دارد نه تعداد آیتم‌ها.
+    نتیجه برای هر آیتم به همان ترتیب ورودی برگردانده می‌شود.
+    """
+    _check_items(items)
+    results = [None] * len(items)
+    by_value = {}
+    seen = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'status': 'invalid', 'error': 'item must be an object'}
+            continue
+        pk = item.get('id')
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            results[index] = {'id': pk, 'status': 'invalid', 'error': 'id is required'}
+            continue
+        if pk in seen:
+            results[index] = {'id': pk, 'status': 'invalid', 'error': 'duplicate id in batch'}
+            continue
+        seen.add(pk)
+        if item.get(field) is None:
+            results[index] = {'id': pk, 'status': 'invalid', 'error': f'{field} is required'}
+            continue
+        try:
+            value = validate(item[field])
+        except ValueError as exc:
+            results[index] = {'id': pk, 'status': 'invalid', 'error': str(exc)}
+            continue
+        by_value.setdefault(value, []).append((index, pk))
+
+    with transaction.atomic():
+        existing = _existing_ids(model, [pk for group in by_value.values() for _, pk in group])
+        for value, group in by_value.items():
+            ids = sorted({pk for _, pk in group if pk in existing})
+            for chunk in _chunks(ids):
+                model.objects.filter(id__in=chunk).update(**{field: value})
+            for index, pk in group:
+                if pk in existing:
+                    results[index] = {'id': pk, 'status': 'updated', field: value}
+                else:
+                    results[index] = {'id': pk, 'status': 'not_found'}
+    return results
+
+
+def bulk_create_profiles(profile_model, user_type, items, profile_fields=()):
+    """
+    items: لیست {'username': ..., <profile_fields>}
+    User و پروفایل هر آیتم با دو bulk_create ساخته می‌شوند؛ usernameهای تکراری
+    به صورت exists گزارش می‌شوند. اگر درخواست دیگری همزمان یکی از usernameها را بسازد
+    BulkConflict (409) و کل دسته برگشت داده می‌شود.
+    """
+    _check_items(items)
+    results = [None] * len(items)
+    values = {}
+    pending = {}
+    for index, item in enumerate(items):
+        username = item.get('username') if isinstance(item, dict) else None
+        if not isinstance(username, str) or not username or len(username) > 100:
+            results[index] = {'username': username, 'status': 'invalid', 'error': 'username is required'}
+        elif username in pending:
+            results[index] = {'username': username, 'status': 'invalid', 'error': 'duplicate username in batch'}
+        else:
+            try:
+                values[index] = {
+                    f: profile_model._meta.get_field(f).clean(item[f], None)
+                    for f in profile_fields if f in item
+                }
+            except ValidationError as exc:
+                results[index] = {'username': username, 'status': 'invalid', 'error': ' '.join(exc.messages)}
+                continue
+            pending[username] = index
+
+    try:
+        with transaction.atomic():
+            taken = set()
+            usernames = list(pending)
+            for chunk in _chunks(usernames):
+                taken.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+            for username in taken:
+                results[pending.pop(username)] = {'username': username, 'status': 'exists'}
+
+            users = User.objects.bulk_create(
+                [User(username=username, user_type=user_type) for username in pending],
+                batch_size=CHUNK_SIZE,
+            )
+            profiles = profile_model.objects.bulk_create(
+                [profile_model(user=user, **values[pending[user.username]]) for user in users],
+                batch_size=CHUNK_SIZE,
+            )
+    except IntegrityError:
+        raise BulkConflict('a username in this batch was created concurrently; retry the request')
+    for user, profile in zip(users, profiles):
+        results[pending[user.username]] = {
+            'id': profile.id, 'username': user.username, 'status': 'created',
+        }
+    return results
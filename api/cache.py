@@ -0,0 +1,208 @@
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files import locks
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class SweepingLocMemCache(LocMemCache):
+    """
+    LocMemCache که کلیدهای منقضی را با sweep_expired() پاک می‌کند؛
+    برای استقرار تک‌پروسه‌ای. update و delete_if مثل SweepingFileBasedCache اتمیک هستند.
+    """
+    def update(self, key, function, default=None, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        مقدار function(مقدار فعلی یا default) را به صورت اتمیک ذخیره و برمی‌گرداند
+        """
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            current = default if self._has_expired(key) else pickle.loads(self._cache[key])
+            value = function(current)
+            self._set(key, pickle.dumps(value, self.pickle_protocol), timeout)
+        return value
+
+    def delete_if(self, key, predicate, version=None):
+        """
+        کلید را فقط اگر predicate(مقدار فعلی) درست باشد پاک می‌کند (بررسی و حذف اتمیک)
+        """
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key) or not predicate(pickle.loads(self._cache[key])):
+                return False
+            return self._delete(key)
+
+    def sweep_expired(self):
+        with self._lock:
+            expired = [key for key in self._expire_info if self._has_expired(key)]
+            for key in expired:
+                self._delete(key)
+        return len(expired)
+
+
+class SweepingFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache که فایل‌های منقضی را با sweep_expired() پاک می‌کند؛
+    برای چند ورکر. با LOCATION روی /dev/shm عملاً حافظه مشترک است.
+
+    add در FileBasedCache جنگو has_key و بعد set است و بین پروسه‌ها اتمیک نیست (دو ورکر هر دو
+    True می‌گیرند). اینجا هر نوشتن روی یک کلید زیر قفل فایل (flock) یکی از LOCK_SHARDS فایل قفل
+    انجام می‌شود، پس add، update (خواندن-تغییر-نوشتن) و delete_if بین پروسه‌ها اتمیک‌اند و هر کدام
+    O(1) هستند: برخلاف set هیچ‌کدام _cull (glob کل پوشه) را اجرا نمی‌کنند و کلیدهای منقضی آن‌ها
+    را sweeper پاک می‌کند.
+    """
+    LOCK_SHARDS = 64
+
+    @contextmanager
+    def _key_lock(self, fname):
+        self._createdir()
+        # نام فایل md5 کلید است؛ فایل‌های قفل با الگوی *.djcache (clear و _cull) جور نیستند
+        shard = int(os.path.basename(fname)[:8], 16) % self.LOCK_SHARDS
+        with open(os.path.join(self._dir, f'.lock-{shard:02x}'), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def _read(self, fname):
+        # مقدار کلید یا _MISSING؛ فایل منقضی را پاک نمی‌کند (زیر قفل صدا زده می‌شود)
+        try:
+            with open(fname, 'rb') as f:
+                expiry = pickle.load(f)
+                if expiry is not None and expiry < time.time():
+                    return _MISSING
+                return pickle.loads(zlib.decompress(f.read()))
+        except (FileNotFoundError, EOFError):
+            return _MISSING
+
+    def _write(self, fname, value, timeout):
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            os.replace(tmp_path, fname)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        self._cull()
+        with self._key_lock(fname):
+            self._write(fname, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        with self._key_lock(fname):
+            if self._read(fname) is not _MISSING:
+                return False
+            self._write(fname, value, timeout)
+        return True
+
+    def update(self, key, function, default=None, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        مقدار function(مقدار فعلی یا default) را به صورت اتمیک ذخیره و برمی‌گرداند
+        """
+        fname = self._key_to_file(key, version)
+        with self._key_lock(fname):
+            current = self._read(fname)
+            value = function(default if current is _MISSING else current)
+            self._write(fname, value, timeout)
+        return value
+
+    def delete_if(self, key, predicate, version=None):
+        """
+        کلید را فقط اگر predicate(مقدار فعلی) درست باشد پاک می‌کند (بررسی و حذف اتمیک)
+        """
+        fname = self._key_to_file(key, version)
+        with self._key_lock(fname):
+            current = self._read(fname)
+            if current is _MISSING or not predicate(current):
+                return False
+            return self._delete(fname)
+
+    def _is_expired(self, f):
+        # get/has_key/sweeper فایل منقضی را پاک می‌کنند؛ اگر بین خواندن و حذف add/update همزمان
+        # مقدار تازه‌ای جایش گذاشته باشد همان پاک می‌شد. حذف زیر قفل و فقط برای همان فایل است
+        try:
+            expiry = pickle.load(f)
+        except EOFError:
+            expiry = 0
+        if expiry is None or expiry >= time.time():
+            return False
+        inode = os.fstat(f.fileno()).st_ino
+        f.close()
+        with self._key_lock(f.name):
+            try:
+                if os.stat(f.name).st_ino == inode:
+                    os.remove(f.name)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def sweep_expired(self):
+        removed = 0
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, 'rb') as f:
+                    removed += self._is_expired(f)
+            except FileNotFoundError:
+                # ورکر دیگری زودتر پاکش کرده است
+                pass
+        return removed
+
+
+def sweep_expired_caches():
+    removed = 0
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if hasattr(cache, 'sweep_expired'):
+            removed += cache.sweep_expired()
+    return removed
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_cache_sweeper(**kwargs):
+    """
+    یک thread پس‌زمینه که هر CACHE_SWEEP_INTERVAL ثانیه کلیدهای منقضی
+    (از جمله sessionهای state OAuth) را پاک می‌کند. به request_started وصل است
+    تا فقط در پروسه‌هایی که درخواست سرو می‌کنند اجرا شود.
+    """
+    global _sweeper
+    interval = getattr(settings, 'CACHE_SWEEP_INTERVAL', 0)
+    if _sweeper is not None or not interval:
+        return
+    with _sweeper_lock:
+        if _sweeper is not None:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    removed = sweep_expired_caches()
+                    if removed:
+                        logger.debug(f"{removed} کلید منقضی از کش پاک شد")
+                except Exception:
+                    logger.exception("خطا در پاک‌سازی کش")
+
+        _sweeper = threading.Thread(target=run, name='cache-sweeper', daemon=True)
+        _sweeper.stop = stop
+        _sweeper.start()
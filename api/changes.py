@@ -0,0 +1,358 @@
+"""
+خوراک تغییرات پروفایل‌ها: triggerها کنار هر نوشتن روی api_buyerprofile/api_sellerprofile یک ردیف
+در api_profilechange می‌گذارند و مصرف‌کننده از آخرین شماره‌ای که دیده ادامه می‌دهد:
+
+- GET /api/sellers/changes/?since=<seq> (و buyers): صفحه‌بندی keyset روی شماره ترتیب
+- GET /api/sellers/changes/stream/ فقط روی ASGI: server-sent events با Last-Event-ID
+
+هزینه هر مصرف‌کننده به تعداد تغییرات بستگی دارد، نه به اندازه جدول. data هر تغییر وضعیت
+فعلی پروفایل است (برای حذف یا پروفایلی که بعداً حذف شده null).
+"""
+import asyncio
+import logging
+import weakref
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .fastpath import UnsupportedSerializer, compile_serializer
+from .models import ProfileChange
+from .routers import read_only
+
+logger = logging.getLogger(__name__)
+
+# ستون‌هایی که در پاسخ پروفایل هستند؛ نوشتنی که هیچ‌کدام را عوض نکند (مثل بالا رفتن version) ثبت نمی‌شود
+PROFILE_COLUMNS = {
+    'buyer': ('api_buyerprofile', ['user_id', 'terms_accepted', 'payment_status']),
+    'seller': ('api_sellerprofile', ['user_id', 'terms_accepted', 'payment_status', 'address', 'selected_day']),
+}
+
+# همان قالبی که جنگو برای DateTimeField در SQLite می‌نویسد (UTC)
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_LOG = "INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('{type}', {row}.id, '{op}', " + _NOW + ");"
+
+
+def _profile_triggers(profile_type, table, columns):
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN "
+        + _LOG.format(type=profile_type, row='NEW', op=ProfileChange.INSERT) + " END;",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN "
+        + _LOG.format(type=profile_type, row='OLD', op=ProfileChange.DELETE) + " END;",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE OF {', '.join(columns)} ON {table} "
+        f"WHEN {changed} BEGIN "
+        + _LOG.format(type=profile_type, row='NEW', op=ProfileChange.UPDATE) + " END;",
+    ]
+
+
+CREATE_TRIGGERS = [
+    sql for profile_type, (table, columns) in PROFILE_COLUMNS.items()
+    for sql in _profile_triggers(profile_type, table, columns)
+] + [
+    # username در پاسخ پروفایل‌هاست (مثل versioning.api_user_version_update)
+    "CREATE TRIGGER IF NOT EXISTS api_user_change_update AFTER UPDATE OF username ON api_user "
+    "WHEN OLD.username IS NOT NEW.username BEGIN "
+    + " ".join(
+        f"INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) "
+        f"SELECT '{profile_type}', id, '{ProfileChange.UPDATE}', {_NOW} FROM {table} WHERE user_id = NEW.id;"
+        for profile_type, (table, _) in PROFILE_COLUMNS.items()
+    )
+    + " END;",
+]
+DROP_TRIGGERS = [
+    f"DROP TRIGGER IF EXISTS {table}_change_{kind};"
+    for table, _ in PROFILE_COLUMNS.values() for kind in ('insert', 'delete', 'update')
+] + ["DROP TRIGGER IF EXISTS api_user_change_update;"]
+
+
+def ensure_triggers(using=None, **kwargs):
+    """
+    مثل summary.ensure_triggers؛ بعد از هر migrate triggerهای لاگ تغییرات را دوباره می‌سازد
+    """
+    conn = connections[using] if using else connection
+    if conn.vendor != 'sqlite':
+        return
+    tables = conn.introspection.table_names()
+    if not all(name in tables for name in ('api_profilechange', 'api_buyerprofile', 'api_sellerprofile', 'api_user')):
+        return
+    with conn.cursor() as cursor:
+        for sql in CREATE_TRIGGERS:
+            cursor.execute(sql)
+
+
+class ChangeLogExpired(Exception):
+    """
+    تغییرات بعد از since (بخشی از آن) با CHANGES_RETENTION پاک شده‌اند؛ مصرف‌کننده باید از
+    لیست کامل دوباره همگام شود
+    """
+
+
+def load_changes(viewset_class, since, limit, using=None):
+    """
+    حداکثر limit تغییر بعد از since برای نوع پروفایل ویوست، با data فعلی هر پروفایل.
+    دو کوئری (ایندکس (profile_type, id) و id__in)، به علاوه MIN(id) وقتی since عقب است
+    """
+    queryset = viewset_class.queryset.using(using) if using else viewset_class.queryset
+    changes = list(
+        ProfileChange.objects.using(queryset.db)
+        .filter(profile_type=viewset_class.change_type, id__gt=since).order_by('id')
+        .values('id', 'op', 'profile_id', 'created_at')[:limit]
+    )
+    if since and (not changes or changes[0]['id'] > since + 1):
+        # شکاف بین since و اولین تغییر یا تغییرات نوع دیگر است یا پاک شدن لاگ
+        oldest = ProfileChange.objects.using(queryset.db).aggregate(oldest=Min('id'))['oldest']
+        if oldest is not None and oldest > since + 1:
+            raise ChangeLogExpired()
+    if not changes:
+        return []
+
+    ids = {change['profile_id'] for change in changes}
+    try:
+        compiled = compile_serializer(viewset_class.serializer_class)
+    except UnsupportedSerializer:
+        compiled = None
+    if compiled is None:
+        profiles = queryset.in_bulk(ids)
+        serializer = viewset_class.serializer_class()
+        data = {pk: serializer.to_representation(profile) for pk, profile in profiles.items()}
+    else:
+        data = {row['id']: compiled.build(row) for row in compiled.values(queryset.filter(id__in=ids))}
+    return [
+        {
+            'seq': change['id'],
+            'op': change['op'],
+            'id': change['profile_id'],
+            'changed_at': change['created_at'],
+            'data': None if change['op'] == ProfileChange.DELETE else data.get(change['profile_id']),
+        }
+        for change in changes
+    ]
+
+
+def last_seq(profile_type, using=None):
+    return ProfileChange.objects.using(using).filter(profile_type=profile_type).aggregate(seq=Max('id'))['seq'] or 0
+
+
+def purge_changes(older_than=None, chunk_size=None):
+    """
+    تغییرات قدیمی‌تر از CHANGES_RETENTION ثانیه را تکه تکه پاک می‌کند (از قدیمی‌ترین، پس
+    شماره‌های باقی‌مانده پیوسته می‌مانند)
+    """
+    older_than = settings.CHANGES_RETENTION if older_than is None else older_than
+    chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+    expired = ProfileChange.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=older_than))
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += ProfileChange.objects.filter(id__in=ids).delete()[0]
+
+
+def _since(value):
+    """
+    شماره since از query string یا هدر Last-Event-ID؛ ValueError اگر عدد نامنفی نباشد
+    """
+    since = int(value or 0)
+    if since < 0:
+        raise ValueError(value)
+    return since
+
+
+EXPIRED_MESSAGE = 'since is older than the retained change log; resync from the full list'
+
+
+class ChangeFeedMixin:
+    """
+    action changes برای ویوست‌های پروفایل (change_type: 'buyer' یا 'seller')
+    """
+    change_type = None
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            since = _since(request.query_params.get('since'))
+            limit = int(request.query_params.get('limit') or settings.CHANGES_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'since and limit must be non-negative integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.CHANGES_MAX_PAGE_SIZE))
+        try:
+            entries = load_changes(type(self), since, limit, using=self.queryset.db)
+        except ChangeLogExpired:
+            return Response({'error': EXPIRED_MESSAGE}, status=status.HTTP_410_GONE)
+
+        last = entries[-1]['seq'] if entries else since
+        next_url = None
+        if len(entries) == limit:
+            next_url = replace_query_param(request.build_absolute_uri(), 'since', last)
+        return Response({'last_seq': last, 'next': next_url, 'results': entries})
+
+
+class _Subscription:
+    def __init__(self):
+        self.entries = []
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, entries):
+        if len(self.entries) + len(entries) > settings.CHANGES_STREAM_BUFFER:
+            # مصرف‌کننده کند: استریم بسته می‌شود و کلاینت با Last-Event-ID دوباره وصل می‌شود
+            self.close()
+        else:
+            self.entries.extend(entries)
+            self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    def take(self):
+        entries, self.entries = self.entries, []
+        self.ready.clear()
+        return entries
+
+
+class ChangeBroadcaster:
+    """
+    یک poller برای همه استریم‌های یک نوع پروفایل در event loop: هر CHANGES_POLL_INTERVAL ثانیه
+    تغییرات بعد از آخرین شماره یک‌بار خوانده و به همه اشتراک‌ها داده می‌شود، پس تعداد کلاینت‌ها
+    تعداد کوئری‌ها را زیاد نمی‌کند
+    """
+    def __init__(self, viewset_class):
+        self.viewset_class = viewset_class
+        self.subscriptions = set()
+        self.position = 0
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self):
+        """
+        بعد از برگشتن این تابع هر تغییری با شماره بزرگ‌تر از آخرین تغییر موجود به اشتراک می‌رسد
+        """
+        subscription = _Subscription()
+        self.subscriptions.add(subscription)
+        async with self.lock:
+            if self.task is None or self.task.done():
+                # poller فقط وقتی مشترکی هست اجرا می‌شود و با شروع دوباره از انتهای لاگ ادامه می‌دهد
+                self.position = await sync_to_async(last_seq)(self.viewset_class.change_type)
+                self.task = asyncio.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+
+    async def _poll(self):
+        load = sync_to_async(load_changes)
+        while self.subscriptions:
+            await asyncio.sleep(settings.CHANGES_POLL_INTERVAL)
+            while self.subscriptions:
+                try:
+                    with read_only():
+                        entries = await load(self.viewset_class, self.position, settings.CHANGES_MAX_PAGE_SIZE)
+                except ChangeLogExpired:
+                    # poller از پاک‌سازی لاگ عقب مانده؛ استریم‌ها بسته می‌شوند و کلاینت‌ها با
+                    # Last-Event-ID دوباره وصل می‌شوند (و 410 می‌گیرند)
+                    logger.error(f'{self.viewset_class.change_type} change poller fell behind the log; closing streams')
+                    self._close_all()
+                    return
+                except Exception:
+                    # خطای گذرا (مثلاً database is locked): poller نمی‌میرد و دور بعد دوباره می‌خواند
+                    logger.exception(f'{self.viewset_class.change_type} change poller failed; retrying')
+                    break
+                if not entries:
+                    break
+                self.position = entries[-1]['seq']
+                for subscription in list(self.subscriptions):
+                    subscription.push(entries)
+
+    def _close_all(self):
+        for subscription in list(self.subscriptions):
+            subscription.close()
+        self.subscriptions.clear()
+
+
+# یک broadcaster برای هر (event loop، ویوست)
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster(viewset_class):
+    per_loop = _broadcasters.setdefault(asyncio.get_running_loop(), {})
+    if viewset_class not in per_loop:
+        per_loop[viewset_class] = ChangeBroadcaster(viewset_class)
+    return per_loop[viewset_class]
+
+
+def _event(entry, encoder):
+    return f"id: {entry['seq']}\nevent: {entry['op']}\ndata: {encoder.encode(entry)}\n\n"
+
+
+class ChangeStreamView(View):
+    """
+    server-sent events تغییرات یک نوع پروفایل برای ASGI. از ?since یا Last-Event-ID (اتصال
+    دوباره EventSource) شروع می‌کند، تا رسیدن به انتها تغییرات گذشته را صفحه به صفحه می‌فرستد و
+    بعد از ChangeBroadcaster مشترک می‌گیرد.
+    """
+    viewset_class = None
+
+    async def get(self, request):
+        try:
+            since = _since(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+        except ValueError:
+            return JsonResponse({'error': 'since must be a non-negative integer'}, status=400)
+        # عقب بودن since همین حالا (قبل از شروع استریم) با 410 گزارش می‌شود
+        try:
+            with read_only():
+                first = await sync_to_async(load_changes)(self.viewset_class, since, settings.CHANGES_MAX_PAGE_SIZE)
+        except ChangeLogExpired:
+            return JsonResponse({'error': EXPIRED_MESSAGE}, status=410)
+        response = StreamingHttpResponse(self._events(since, first), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # پراکسی nginx بافر نکند
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _events(self, since, first):
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        broadcaster = get_broadcaster(self.viewset_class)
+        subscription = await broadcaster.subscribe()
+        try:
+            yield f"retry: {settings.CHANGES_STREAM_RETRY_MS}\n\n"
+            last = since
+            entries = first
+            load = sync_to_async(load_changes)
+            # گذشته تا انتها؛ حداقل یک خواندن بعد از اشتراک تا تغییری بین دو مرحله گم نشود
+            # (تکراری‌های اشتراک با شماره کنار گذاشته می‌شوند)
+            while True:
+                for entry in entries:
+                    yield _event(entry, encoder)
+                if entries:
+                    last = entries[-1]['seq']
+                with read_only():
+                    entries = await load(self.viewset_class, last, settings.CHANGES_MAX_PAGE_SIZE)
+                if not entries:
+                    break
+
+            while not subscription.closed:
+                try:
+                    await asyncio.wait_for(subscription.ready.wait(), settings.CHANGES_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                for entry in subscription.take():
+                    if entry['seq'] > last:
+                        yield _event(entry, encoder)
+                        last = entry['seq']
+        finally:
+            broadcaster.unsubscribe(subscription)
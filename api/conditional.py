@@ -0,0 +1,86 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .versioning import table_version
+
+
+def conditional_etag(tag, media_type, uri):
+    """
+    (ETag، کلید کش پاسخ) برای نسخه tag؛ بدنه به host، آدرس کامل (cursor، فیلترها)
+    و رندرر مذاکره شده بستگی دارد. مسیر async (AsyncProfileReadView) هم از همین استفاده
+    می‌کند تا کش بین دو مسیر مشترک باشد.
+    """
+    digest = hashlib.blake2b(f'{media_type}|{uri}'.encode(), digest_size=8).hexdigest()
+    return f'"{tag}-{digest}"', f'response:{tag}:{digest}'
+
+
+def not_modified(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def not_modified_response(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+class ConditionalCacheMixin:
+    """
+    ETag قوی و پاسخ 304 برای list/retrieve، به علاوه کش بدنه JSON رندر شده.
+
+    ETag از نسخه ردیف (retrieve) یا نسخه جدول (list) ساخته می‌شود که triggerها در هر
+    نوشتن زیاد می‌کنند؛ کلید کش هم شامل همین نسخه است، پس هر نوشتن (accept_terms،
+    select_day، bulk، حذف، تغییر User) همه پاسخ‌های قبلی آن ردیف/جدول را باطل می‌کند.
+    """
+    def retrieve(self, request, *args, **kwargs):
+        model = self.queryset.model
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        try:
+            version = model.objects.filter(pk=pk).values_list('version', flat=True).first()
+        except (TypeError, ValueError):
+            version = None
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+        tag = f'{model._meta.db_table}-{pk}-{version}'
+        return self._conditional(request, tag, lambda: super(ConditionalCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('export'):
+            # استریم NDJSON کش نمی‌شود
+            return super().list(request, *args, **kwargs)
+        table = self.queryset.model._meta.db_table
+        version = table_version(table, using=self.queryset.db)
+        tag = f'{table}-{version}'
+        return self._conditional(request, tag, lambda: super(ConditionalCacheMixin, self).list(request, *args, **kwargs))
+
+    def _conditional(self, request, tag, render):
+        etag, key = conditional_etag(tag, request.accepted_media_type, request.build_absolute_uri())
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+
+        cacheable = getattr(request.accepted_renderer, 'format', None) == 'json'
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        if cacheable:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['ETag'] = etag
+                return response
+
+        response = render()
+        if response.status_code != 200:
+            return response
+        response['ETag'] = etag
+        if cacheable:
+            # همان کاری که finalize_response انجام می‌دهد، تا بدنه همین حالا رندر و ذخیره شود
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), settings.RESPONSE_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,127 @@
+from operator import itemgetter
+
+from django.conf import settings
+from django.http import Http404
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .metrics import timed
+from .pagination import keyset_chunks
+
+# فیلدهایی که to_representation آن‌ها برای مقدار خوانده شده از دیتابیس تغییری نمی‌دهد
+_PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.ReadOnlyField,
+)
+_SAFE_METHODS = {cls.to_representation for cls in _PASSTHROUGH_FIELDS}
+
+
+class UnsupportedSerializer(Exception):
+    pass
+
+
+class CompiledSerializer:
+    """
+    نسخه فقط‌خواندنی یک ModelSerializer ساده: ستون‌های لازم با values() خوانده می‌شوند
+    و دیکشنری خروجی (با همان ترتیب کلیدها و همان مقادیر) مستقیماً ساخته می‌شود.
+    """
+    def __init__(self, serializer_class):
+        self.columns = []
+        self.build = self._compile(serializer_class(), '')
+
+    def _compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        names, getters = [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if not source or source == '*' or '.' in source:
+                raise UnsupportedSerializer(f'{name}: unsupported source {source!r}')
+            if isinstance(field, serializers.BaseSerializer):
+                if isinstance(field, serializers.ListSerializer) or model._meta.get_field(source).null:
+                    raise UnsupportedSerializer(f'{name}: only required to-one nesting is supported')
+                getters.append(self._compile(field, prefix + source + '__'))
+            elif isinstance(field, _PASSTHROUGH_FIELDS) and type(field).to_representation in _SAFE_METHODS:
+                path = prefix + source
+                self.columns.append(path)
+                getters.append(itemgetter(path))
+            else:
+                raise UnsupportedSerializer(f'{name}: {type(field).__name__} is not supported')
+            names.append(name)
+        fields = list(zip(names, getters))
+        return lambda row: {name: get(row) for name, get in fields}
+
+    def values(self, queryset):
+        # id همیشه لازم است (صفحه‌بندی cursor روی آن است)
+        columns = self.columns if 'id' in self.columns else self.columns + ['id']
+        return queryset.values(*columns)
+
+
+_compiled = {}
+
+
+def compile_serializer(serializer_class):
+    if serializer_class not in _compiled:
+        _compiled[serializer_class] = CompiledSerializer(serializer_class)
+    return _compiled[serializer_class]
+
+
+class FastReadMixin:
+    """
+    list/retrieve (و استریم NDJSON) را با CompiledSerializer سرو می‌کند.
+    با API_FAST_SERIALIZATION=False یا سریالایزر پشتیبانی نشده، مسیر معمول DRF اجرا می‌شود.
+    """
+    def _compiled_serializer(self):
+        if not settings.API_FAST_SERIALIZATION:
+            return None
+        try:
+            return compile_serializer(self.get_serializer_class())
+        except UnsupportedSerializer:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self._compiled_serializer()
+        if compiled is None or request.query_params.get('export'):
+            # استریم NDJSON هم از _representations همین کلاس استفاده می‌کند
+            return super().list(request, *args, **kwargs)
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with timed('serialize'):
+                data = [compiled.build(row) for row in page]
+            return self.get_paginated_response(data)
+        rows = list(queryset)
+        with timed('serialize'):
+            data = [compiled.build(row) for row in rows]
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        compiled = self._compiled_serializer()
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if compiled is None or lookup not in kwargs:
+            return super().retrieve(request, *args, **kwargs)
+        # مثل get_object فیلترهای query string روی retrieve هم اعمال می‌شوند
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            row = compiled.values(queryset.filter(**{self.lookup_field: kwargs[lookup]})).first()
+        except (TypeError, ValueError):
+            # get_object_or_404 در DRF هم برای lookup نامعتبر پیام ندارد
+            raise Http404
+        if row is None:
+            # همان پیامی که get_object_or_404 می‌دهد
+            raise Http404(f'No {self.get_queryset().model._meta.object_name} matches the given query.')
+        with timed('serialize'):
+            data = compiled.build(row)
+        return Response(data)
+
+    def _representations(self, queryset):
+        compiled = self._compiled_serializer()
+        if compiled is None:
+            yield from super()._representations(queryset)
+            return
+        for row in keyset_chunks(compiled.values(queryset), self.export_chunk_size):
+            yield compiled.build(row)
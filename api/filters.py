@@ -0,0 +1,36 @@
+from django.db.models import Value
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+class ProfileFilterBackend(BaseFilterBackend):
+    """
+    فیلتر برابری روی فیلدهایی که ویوست در filter_fields اعلام کرده است، مثلاً
+
+        /api/sellers/?selected_day=saturday&terms_accepted=true
+
+    مقدار none برای فیلدهای nullable یعنی IS NULL.
+    """
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        for name in getattr(view, 'filter_fields', ()):
+            raw = request.query_params.get(name)
+            if raw is None or raw == '':
+                continue
+            filters[name] = self._clean(queryset.model._meta.get_field(name), name, raw)
+        return queryset.filter(**filters) if filters else queryset
+
+    def _clean(self, field, name, raw):
+        if field.get_internal_type() == 'BooleanField':
+            try:
+                value = serializers.BooleanField().to_internal_value(raw)
+            except serializers.ValidationError:
+                raise serializers.ValidationError({name: 'must be true or false'})
+            # جنگو terms_accepted=True را به صورت WHERE "terms_accepted" می‌نویسد که SQLite
+            # نمی‌تواند با ایندکس ترکیبی جست‌وجو کند؛ با Value شرط "= 1" ساخته می‌شود
+            return Value(value)
+        if field.null and raw == 'none':
+            return None
+        if field.choices and raw not in [choice[0] for choice in field.choices]:
+            raise serializers.ValidationError({name: f'invalid value {raw!r}'})
+        return raw
@@ -0,0 +1,94 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+MAX_KEY_LENGTH = 255
+
+_PENDING = 'pending'
+# هدرهایی از پاسخ اصلی که همراه بدنه ذخیره و در تکرار برگردانده می‌شوند
+_STORED_HEADERS = ('Location', 'ETag')
+
+
+def _error(message, status, **headers):
+    response = JsonResponse({'error': message}, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _storable(response):
+    # خطای سرور و 429 موقتی هستند و تکرار درخواست باید دوباره اجرا شود
+    return response.status_code < 500 and response.status_code != 429 and not response.streaming
+
+
+class IdempotencyMixin:
+    """
+    نوشتن‌های ویوست (POST/PUT/PATCH/DELETE) با هدر Idempotency-Key فقط یک‌بار اجرا می‌شوند:
+    پاسخ رندر شده در کش IDEMPOTENCY_CACHE_ALIAS (محدود به MAX_ENTRIES و با عمر IDEMPOTENCY_TTL)
+    ذخیره و برای تکرار همان کلید بدون هیچ کوئری برگردانده می‌شود.
+
+    اولین درخواست کلید را با cache.add (مثل claim_code) رزرو می‌کند؛ تکرار همزمان بدون انتظار
+    409 با Retry-After می‌گیرد و ورکر را نگه نمی‌دارد. این بین ورکرها فقط با کش‌های api/cache.py
+    درست است که add آن‌ها (برخلاف FileBasedCache جنگو) بین پروسه‌ها اتمیک است. رزرو شناسه یکتای
+    همین درخواست را دارد و اگر پاسخ ذخیره نشود فقط با delete_if و فقط وقتی هنوز رزرو همین
+    درخواست است آزاد می‌شود؛ رزروی که منقضی شده و درخواست دیگری گرفته پاک نمی‌شود.
+    کلید روی method و مسیر است و استفاده دوباره از آن با بدنه متفاوت 422 می‌دهد.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key or request.method not in WRITE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400)
+
+        cache = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+        cache_key = 'idempotency:' + hashlib.sha256(f'{request.method} {request.path}\n{key}'.encode()).hexdigest()
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        marker = (_PENDING, fingerprint, uuid.uuid4().hex)
+        while not cache.add(cache_key, marker, settings.IDEMPOTENCY_LOCK_TTL):
+            response = self._replay(cache, cache_key, fingerprint)
+            if response is not None:
+                return response
+
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if _storable(response):
+                # همان کاری که ConditionalCacheMixin می‌کند: بدنه همین حالا رندر و ذخیره می‌شود
+                if hasattr(response, 'render'):
+                    response.render()
+                headers = {name: response[name] for name in ('Content-Type',) + _STORED_HEADERS if name in response}
+                cache.set(cache_key, (response.status_code, fingerprint, response.content, headers),
+                          settings.IDEMPOTENCY_TTL)
+                return response
+        except BaseException:
+            cache.delete_if(cache_key, marker.__eq__)
+            raise
+        cache.delete_if(cache_key, marker.__eq__)
+        return response
+
+    def _replay(self, cache, cache_key, fingerprint):
+        """
+        پاسخ ذخیره شده، خطای 409 (درخواست اول هنوز در حال اجراست) یا 422، یا None اگر کلید آزاد شده باشد
+        """
+        entry = cache.get(cache_key)
+        if entry is None:
+            # درخواست اول بدون پاسخ قابل ذخیره تمام شد (و کلید آزاد شد)؛ این درخواست دوباره رزرو می‌کند
+            return None
+        if entry[1] != fingerprint:
+            return _error('Idempotency-Key was already used with a different request body', 422)
+        if entry[0] == _PENDING:
+            return _error('A request with this Idempotency-Key is still in progress', 409, **{'Retry-After': '1'})
+
+        status, _, content, headers = entry
+        response = HttpResponse(content, status=status)
+        for name, value in headers.items():
+            response[name] = value
+        response[REPLAYED_HEADER] = 'true'
+        return response
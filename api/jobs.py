@@ -0,0 +1,196 @@
+import json
+import logging
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bulk import CHUNK_SIZE
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Task:
+    name: str
+    func: object
+    batch: bool = False
+    max_attempts: int | None = None
+
+
+_registry = {}
+
+# ON CONFLICT بدون هدف، تداخل با ایندکس یکتای جزئی key (jobهای queued) را نادیده می‌گیرد
+_INSERT = (
+    f'INSERT INTO {Job._meta.db_table} (name, payload, key, status, attempts, run_at, worker, last_error, created_at) '
+    f"VALUES (%s, %s, %s, '{Job.QUEUED}', 0, %s, '', '', %s) ON CONFLICT DO NOTHING"
+)
+
+
+def task(name, batch=False, max_attempts=None):
+    """
+    ثبت handler یک نوع job:
+
+        @task('onboarding.completed', batch=True)
+        def onboarding_completed(payloads):
+            ...
+
+    handler دسته‌ای لیست payloadهای چند job همنام را یکجا می‌گیرد، بقیه یک payload.
+    اجرا حداقل یک‌بار است (retry، ورکر مرده)، پس handler باید idempotent باشد.
+    """
+    def register(func):
+        _registry[name] = Task(name, func, batch, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, key=None, delay=0):
+    enqueue_many(name, [payload or {}], keys=[key], delay=delay)
+
+
+def enqueue_many(name, payloads, keys=None, delay=0):
+    """
+    همه jobها با یک executemany درج می‌شوند (bulk_create با ۱۱ ستون و سقف ۹۹۹ پارامتر SQLite
+    برای هر ۹۰ ردیف یک کوئری می‌زد)؛ jobی که key آن با یک job منتظر در صف یکی است نادیده
+    گرفته می‌شود و همان job قبلی کار را انجام می‌دهد.
+    داخل تراکنش درخواست صدا زده شود تا job و تغییر داده با هم commit شوند.
+    """
+    if name not in _registry:
+        raise KeyError(f'unknown task {name!r}')
+    if not payloads:
+        return
+    now = timezone.now()
+    run_at = connection.ops.adapt_datetimefield_value(now + timedelta(seconds=delay))
+    created_at = connection.ops.adapt_datetimefield_value(now)
+    keys = keys or [None] * len(payloads)
+    with connection.cursor() as cursor:
+        cursor.executemany(_INSERT, [
+            (name, json.dumps(payload), key, run_at, created_at) for payload, key in zip(payloads, keys)
+        ])
+
+
+def backoff(attempts):
+    """
+    تأخیر retry بعد از attempts تلاش ناموفق: نمایی تا JOB_RETRY_MAX_DELAY، با jitter
+    تا jobهایی که با هم شکست خورده‌اند با هم برنگردند
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+def requeue_stale(now=None):
+    """
+    jobهای running که lease آن‌ها گذشته (ورکر مرده یا کشته شده) دوباره به صف برمی‌گردند
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    for job in stale.only('id', 'attempts', 'name', 'key'):
+        _retry_or_fail(job, 'lease expired', now)
+
+
+def claim(batch_size, now=None):
+    """
+    قدیمی‌ترین job آماده و (برای taskهای دسته‌ای) تا batch_size job همنام دیگر را برمی‌دارد.
+    UPDATE شرطی روی status اتمیک است، پس دو ورکر یک job را با هم برنمی‌دارند.
+    """
+    now = now or timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    name = ready.values_list('name', flat=True).first()
+    if name is None:
+        return []
+    spec = _registry.get(name)
+    limit = batch_size if spec is not None and spec.batch else 1
+    ids = list(ready.filter(name=name).values_list('id', flat=True)[:limit])
+    token = uuid.uuid4().hex
+    Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+        status=Job.RUNNING,
+        worker=token,
+        attempts=F('attempts') + 1,
+        locked_until=now + timedelta(seconds=settings.JOB_LEASE),
+    )
+    return list(Job.objects.filter(id__in=ids, worker=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+def run_jobs(jobs):
+    """
+    jobهای برداشته شده (همنام) را اجرا می‌کند. اگر اجرای دسته‌ای خطا بدهد هر job جداگانه
+    اجرا می‌شود تا یک payload خراب بقیه دسته را retry نکند.
+    """
+    if not jobs:
+        return
+    spec = _registry.get(jobs[0].name)
+    try:
+        if spec is None:
+            raise KeyError(f'unknown task {jobs[0].name!r}')
+        if spec.batch:
+            spec.func([job.payload for job in jobs])
+        else:
+            for job in jobs:
+                spec.func(job.payload)
+    except Exception as exc:
+        if spec is not None and len(jobs) > 1:
+            for job in jobs:
+                run_jobs([job])
+            return
+        logger.warning(f'job {jobs[0].name} #{jobs[0].id} failed (attempt {jobs[0].attempts}): {exc!r}')
+        _retry_or_fail(jobs[0], repr(exc))
+        return
+    Job.objects.filter(id__in=[job.id for job in jobs]).update(
+        status=Job.DONE, finished_at=timezone.now(), locked_until=None,
+    )
+
+
+def _retry_or_fail(job, error, now=None):
+    now = now or timezone.now()
+    spec = _registry.get(job.name)
+    if job.attempts >= ((spec and spec.max_attempts) or settings.JOB_MAX_ATTEMPTS):
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED, last_error=error, finished_at=now, locked_until=None,
+        )
+        logger.error(f'job {job.name} #{job.id} failed permanently after {job.attempts} attempts: {error}')
+        return
+    try:
+        with transaction.atomic():
+            Job.objects.filter(id=job.id).update(
+                status=Job.QUEUED, last_error=error, locked_until=None,
+                run_at=now + timedelta(seconds=backoff(job.attempts)),
+            )
+    except IntegrityError:
+        # job جدیدتری با همین key در صف است و همان کار را انجام می‌دهد
+        Job.objects.filter(id=job.id).update(
+            status=Job.DONE, last_error=error, finished_at=now, locked_until=None,
+        )
+
+
+def purge_finished(older_than=None):
+    """
+    jobهای done قدیمی‌تر از JOB_RETENTION ثانیه را تکه تکه پاک می‌کند؛ failedها برای بررسی می‌مانند
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than or settings.JOB_RETENTION)
+    deleted = 0
+    while True:
+        ids = list(Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).values_list('id', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(id__in=ids).delete()[0]
+
+
+def run_pending(batch_size=None, limit=None):
+    """
+    تا وقتی job آماده هست (یا limit job اجرا شود) اجرا می‌کند؛ تعداد jobهای اجرا شده را برمی‌گرداند
+    """
+    batch_size = batch_size or settings.JOB_BATCH_SIZE
+    processed = 0
+    while limit is None or processed < limit:
+        jobs = claim(batch_size if limit is None else min(batch_size, limit - processed))
+        if not jobs:
+            break
+        run_jobs(jobs)
+        processed += len(jobs)
+    return processed
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.changes import purge_changes
+from api.jobs import purge_finished
+from api.retention import (
+    abandoned_users, archive_path, archive_users, compact, enable_incremental_vacuum, purge_expired_sessions,
+)
+
+
+class Command(BaseCommand):
+    help = "آرشیو و حذف کاربرهای onboarding رها شده، پاک کردن sessionها، jobها و لاگ تغییرات قدیمی و فشرده کردن SQLite"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.RETENTION_ABANDONED_DAYS,
+                            help="کاربرهای قدیمی‌تر از این تعداد روز")
+        parser.add_argument('--chunk-size', type=int, default=settings.RETENTION_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help="مکث بین تکه‌ها (ثانیه)")
+        parser.add_argument('--output', help="فایل آرشیو (پیش‌فرض: RETENTION_ARCHIVE_DIR/users-<زمان>.ndjson.gz)")
+        parser.add_argument('--dry-run', action='store_true', help="فقط شمردن، بدون نوشتن و حذف")
+        parser.add_argument('--vacuum', choices=['incremental', 'full', 'none'], default='incremental',
+                            help="incremental: فقط incremental_vacuum اگر auto_vacuum=INCREMENTAL باشد؛ "
+                                 "full: VACUUM کامل که کل دیتابیس را در این مدت قفل می‌کند")
+        parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                            help="auto_vacuum=INCREMENTAL (یک VACUUM کامل، فقط یک‌بار لازم است)")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        path = options['output'] or archive_path()
+        archived = archive_users(
+            abandoned_users(options['days']), path, chunk_size=options['chunk_size'], pause=options['pause'],
+            dry_run=dry_run, progress=lambda count: self.stdout.write(f"{count} users"),
+        )
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"{archived} users would be archived"))
+            return
+        if archived:
+            self.stdout.write(f"{archived} users archived to {path}")
+        self.stdout.write(f"{purge_expired_sessions(options['chunk_size'])} expired sessions deleted")
+        self.stdout.write(f"{purge_finished()} finished jobs purged")
+        self.stdout.write(f"{purge_changes(chunk_size=options['chunk_size'])} old profile changes purged")
+
+        if options['enable_incremental_vacuum']:
+            enable_incremental_vacuum()
+            self.stdout.write("auto_vacuum set to INCREMENTAL")
+        if options['vacuum'] != 'none':
+            before, after = compact(full=options['vacuum'] == 'full')
+            self.stdout.write(f"pages {before} -> {after}")
+        self.stdout.write(self.style.SUCCESS("done"))
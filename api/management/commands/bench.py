@@ -0,0 +1,48 @@
+import importlib
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "اجرای بنچمارک‌های api روی یک دیتابیس تست جداگانه"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="نام ماژول در api/benchmarks، مثلاً seller_filter")
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--json', dest='json_path', help="ذخیره نتیجه در فایل JSON")
+        parser.add_argument('--baseline', help="مقایسه نتیجه با یک فایل JSON قبلی؛ در صورت رگرسیون خطا می‌دهد")
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="افزایش مجاز زمان/حافظه نسبت به baseline (0.5 یعنی ۵۰٪)")
+
+    def handle(self, *args, **options):
+        from api.benchmarks.base import benchmark_database
+
+        try:
+            module = importlib.import_module(f"api.benchmarks.{options['name']}")
+        except ModuleNotFoundError:
+            raise CommandError(f"benchmark {options['name']!r} not found")
+        if options['baseline'] and not hasattr(module, 'compare'):
+            raise CommandError(f"benchmark {options['name']!r} does not support --baseline")
+
+        with benchmark_database():
+            result = module.run(options, self.stdout.write)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"نتیجه در {options['json_path']} ذخیره شد"))
+
+        # بنچمارک‌هایی که بررسی هم هستند (مثل plans) تخلف‌ها را در violations برمی‌گردانند
+        violations = result.get('violations') if isinstance(result, dict) else None
+        if violations and not options['baseline']:
+            raise CommandError(f'{len(violations)} violations:\n' + '\n'.join(violations))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = module.compare(result, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"بدون رگرسیون نسبت به {options['baseline']}"))
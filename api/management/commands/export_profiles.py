@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from api.transfer import PROFILE_MODELS, detect_format, export_records, open_file, write_records
+
+
+class Command(BaseCommand):
+    help = "خروجی استریم کاربرها و پروفایل‌ها به CSV یا NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="فایل خروجی (با .gz فشرده) یا - برای stdout")
+        parser.add_argument('--format', choices=['csv', 'ndjson'])
+        parser.add_argument('--user-type', choices=list(PROFILE_MODELS))
+        parser.add_argument('--chunk-size', type=int, default=5000, help="ردیف‌های هر کوئری")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = detect_format(path, options['format'] or ('ndjson' if path == '-' else None))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        count = 0
+        start = time.monotonic()
+
+        def progress(records):
+            nonlocal count
+            for count, record in enumerate(records, 1):
+                if count % options['chunk_size'] == 0:
+                    # لاگ کوئری‌های DEBUG مثل پایان هر درخواست خالی می‌شود
+                    reset_queries()
+                if count % 100000 == 0:
+                    # روی stderr تا با خروجی stdout قاطی نشود
+                    self.stderr.write(f"{count} records {count / (time.monotonic() - start):.0f}/s")
+                yield record
+
+        records = progress(export_records(options['chunk_size'], options['user_type']))
+        if path == '-':
+            # داده بدون تغییر (بدون افزودن خط جدید) روی stdout نوشته می‌شود
+            self.stdout.ending = ''
+            write_records(self.stdout, fmt, records)
+            self.stdout.flush()
+        else:
+            with open_file(path, 'w') as stream:
+                write_records(stream, fmt, records)
+        self.stderr.write(self.style.SUCCESS(f"{count} records exported"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.summary import rebuild_seller_day_counts, seller_day_counts
+
+
+class Command(BaseCommand):
+    help = "بازسازی کامل جدول شمارنده روزهای فروشنده‌ها از روی api_sellerprofile"
+
+    def handle(self, *args, **options):
+        rebuild_seller_day_counts()
+        for row in seller_day_counts()['days']:
+            self.stdout.write(f"{row['day']}: {row['sellers']} ({row['terms_accepted']} accepted terms)")
+        self.stdout.write(self.style.SUCCESS("شمارنده‌ها بازسازی شدند"))
@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import purge_finished, requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = "ورکر صف کارهای پس‌زمینه (api_job)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_BATCH_SIZE)
+        parser.add_argument('--once', action='store_true', help="اجرای jobهای آماده و خروج")
+        parser.add_argument('--sleep', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help="فاصله بررسی صف وقتی job آماده‌ای نیست (ثانیه)")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            # SIGTERM/SIGINT: دسته فعلی تمام می‌شود و بعد خارج می‌شویم
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        next_maintenance = 0
+        total = 0
+        while not self.stopping:
+            # ورکر طولانی‌مدت است؛ اتصال خراب یا قدیمی‌تر از CONN_MAX_AGE مثل پایان هر درخواست بسته می‌شود
+            close_old_connections()
+            if time.monotonic() >= next_maintenance:
+                requeue_stale()
+                purged = purge_finished()
+                if purged:
+                    self.stdout.write(f"{purged} finished jobs purged")
+                next_maintenance = time.monotonic() + settings.JOB_LEASE
+            # یک دسته در هر دور تا SIGTERM بین دسته‌ها دیده شود
+            processed = run_pending(batch_size=options['batch_size'], limit=options['batch_size'])
+            total += processed
+            if not processed:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"{total} jobs processed"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
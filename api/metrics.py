@@ -0,0 +1,258 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from rest_framework.throttling import BaseThrottle
+
+# زمان‌بندی درخواست جاری؛ بیرون از PerformanceMiddleware همیشه None است
+_current = ContextVar('request_timings', default=None)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class RequestTimings:
+    """
+    زمان (ثانیه) هر بخش یک درخواست: db، http (تماس‌های خروجی) و serialize
+    """
+    __slots__ = ('db_queries', 'db', 'http', 'serialize', '_active')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db = self.http = self.serialize = 0.0
+        self._active = set()
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.db_queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+
+
+def _install_db_wrapper(sender=None, connection=None, **kwargs):
+    # به جای execute_wrapper در هر درخواست (که هزینه ثابت دارد) یک wrapper دائمی روی هر
+    # اتصال نصب می‌شود که بیرون از درخواست فقط یک ContextVar.get هزینه دارد
+    targets = [connection] if connection is not None else [connections[alias] for alias in connections]
+    for target in targets:
+        if _db_wrapper not in target.execute_wrappers:
+            target.execute_wrappers.insert(0, _db_wrapper)
+
+
+class _Timer:
+    __slots__ = ('timings', 'name', 'start')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        # بلاک‌های تو در تو (مثلاً سریالایزر User داخل پروفایل) فقط یک بار شمرده می‌شوند
+        if self.name in self.timings._active:
+            self.start = None
+        else:
+            self.timings._active.add(self.name)
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.timings._active.discard(self.name)
+            setattr(self.timings, self.name, getattr(self.timings, self.name) + time.perf_counter() - self.start)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_noop = _NoopTimer()
+
+
+def timed(name):
+    """
+    زمان بلاک را به بخش name ('http' یا 'serialize') درخواست جاری اضافه می‌کند:
+
+        with timed('http'):
+            session.post(...)
+
+    وقتی middleware غیرفعال است یک context manager خالی برمی‌گرداند.
+    """
+    timings = _current.get()
+    if timings is None:
+        return _noop
+    return _Timer(timings, name)
+
+
+def timed_calls(name):
+    """
+    دکوراتور متد: هر فراخوانی در timed(name) اجرا می‌شود. با PERF_METRICS_ENABLED=False
+    (که فقط موقع شروع پروسه خوانده می‌شود، مثل خود middleware) همان تابع بدون لایه اضافه
+    برمی‌گردد.
+    """
+    def decorator(func):
+        if not settings.PERF_METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# یک قفل برای همه هیستوگرام‌ها تا هر درخواست فقط یک بار قفل بگیرد
+_lock = threading.Lock()
+
+
+class Histogram:
+    """
+    هیستوگرام درون پروسه‌ای با bucketهای ثابت و برچسب، با خروجی متنی Prometheus.
+    observe باید با _lock گرفته شده صدا زده شود.
+    """
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def clear(self):
+        with _lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with _lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('api_request_duration_seconds', 'Wall time of the request.')
+DB_SECONDS = Histogram('api_db_duration_seconds', 'Time spent in database queries per request.')
+DB_QUERIES = Histogram('api_db_queries', 'Database queries per request.', QUERY_BUCKETS)
+HTTP_SECONDS = Histogram('api_outbound_http_duration_seconds', 'Time spent in outbound HTTP calls per request.')
+SERIALIZE_SECONDS = Histogram('api_serialize_duration_seconds', 'Time spent serializing and rendering per request.')
+HISTOGRAMS = [REQUEST_SECONDS, DB_SECONDS, DB_QUERIES, HTTP_SECONDS, SERIALIZE_SECONDS]
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class PerformanceMiddleware:
+    """
+    برای هر درخواست زمان کل، تعداد و زمان کوئری‌ها، زمان تماس‌های HTTP خروجی و زمان
+    سریالایز را اندازه می‌گیرد؛ نتیجه در هدر Server-Timing و هیستوگرام‌های /api/metrics/.
+    با PERF_METRICS_ENABLED=False اصلاً در زنجیره middleware قرار نمی‌گیرد.
+    زیر ASGI به صورت async اجرا می‌شود تا درخواست‌ها بین thread جابه‌جا نشوند.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self._orm_thread_checked = False
+        _install_db_wrapper()
+        connection_created.connect(_install_db_wrapper, dispatch_uid='api.metrics.install_db_wrapper')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self._orm_thread_checked:
+            # ORM async روی thread دیگری اجرا می‌شود؛ اگر اتصال آن قبل از این middleware باز شده
+            # باشد connection_created دیگر فرستاده نمی‌شود
+            await sync_to_async(_install_db_wrapper)()
+            self._orm_thread_checked = True
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, timings, time.perf_counter() - start)
+
+    def _record(self, request, response, timings, elapsed):
+        labels = (('method', request.method), ('view', _view_name(request)), ('status', str(response.status_code)))
+        with _lock:
+            REQUEST_SECONDS.observe(labels, elapsed)
+            DB_SECONDS.observe(labels, timings.db)
+            DB_QUERIES.observe(labels, timings.db_queries)
+            HTTP_SECONDS.observe(labels, timings.http)
+            SERIALIZE_SECONDS.observe(labels, timings.serialize)
+
+        response['Server-Timing'] = ', '.join([
+            f'app;dur={elapsed * 1000:.2f}',
+            f'db;dur={timings.db * 1000:.2f};desc="{timings.db_queries} queries"',
+            f'http;dur={timings.http * 1000:.2f}',
+            f'serialize;dur={timings.serialize * 1000:.2f}',
+        ])
+        return response
+
+
+def metrics_view(request):
+    """
+    هیستوگرام‌های این پروسه در قالب متنی Prometheus؛ فقط برای آی‌پی‌های PERF_METRICS_ALLOWED_IPS
+    یا کاربر staff (وقتی احراز هویت جنگو فعال است). آی‌پی کلاینت مثل throttleها با NUM_PROXIES از
+    X-Forwarded-For خوانده می‌شود؛ پشت پراکسی محلی REMOTE_ADDR همیشه 127.0.0.1 است
+    """
+    if not settings.PERF_METRICS_ENABLED:
+        raise Http404
+    user = getattr(request, 'user', None)
+    client = BaseThrottle().get_ident(request)
+    if client not in settings.PERF_METRICS_ALLOWED_IPS and not getattr(user, 'is_staff', False):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
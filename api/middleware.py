@@ -0,0 +1,46 @@
+"""
+همان middlewareهای جنگو، ولی زیر ASGI بدون sync_to_async.
+
+MiddlewareMixin در حالت async هر process_request/process_response را با
+sync_to_async(thread_sensitive=True) روی thread مشترک کدهای sync اجرا می‌کند؛ هر پرش حدود
+۰٫۲ms است و پشت کوئری‌های ORM async همان thread صف می‌کشد. Security، Common و XFrameOptions
+هیچ I/O ندارند و مستقیم روی event loop اجرا می‌شوند. Session فقط وقتی session باید ذخیره شود
+(I/O کش یا دیتابیس) به thread می‌رود. زیر WSGI همان کلاس‌های جنگو هستند.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, common, security
+
+
+class InlineAsyncMixin:
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'process_request'):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, 'process_response'):
+            response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(InlineAsyncMixin, security.SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(InlineAsyncMixin, common.CommonMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(InlineAsyncMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class SessionMiddleware(sessions.SessionMiddleware):
+    async def __acall__(self, request):
+        # SessionStore تنبل است؛ ساختنش I/O ندارد
+        self.process_request(request)
+        response = await self.get_response(request)
+        if request.session.modified or settings.SESSION_SAVE_EVERY_REQUEST:
+            return await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+        return self.process_response(request, response)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_remove_sellerprofile_day_sellerprofile_selected_day'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sellerprofile',
+            index=models.Index(fields=['selected_day', 'terms_accepted'], name='seller_day_terms_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sellerprofile',
+            index=models.Index(fields=['terms_accepted', 'payment_status'], name='seller_terms_payment_idx'),
+        ),
+    ]
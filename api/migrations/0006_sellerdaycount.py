@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+# کپی ثابت SQL ماژول api.summary در زمان این migration
+POPULATE = '''
+    INSERT INTO api_sellerdaycount (selected_day, terms_accepted, count)
+    SELECT COALESCE(selected_day, ''), terms_accepted, COUNT(*) FROM api_sellerprofile
+    GROUP BY COALESCE(selected_day, ''), terms_accepted;
+'''
+CREATE_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_insert AFTER INSERT ON api_sellerprofile BEGIN
+    INSERT INTO api_sellerdaycount (selected_day, terms_accepted, count)
+    VALUES (COALESCE(NEW.selected_day, ''), NEW.terms_accepted, 1)
+    ON CONFLICT (selected_day, terms_accepted) DO UPDATE SET count = count + 1;
+END;''',
+    '''CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_delete AFTER DELETE ON api_sellerprofile BEGIN
+    UPDATE api_sellerdaycount SET count = count - 1
+    WHERE selected_day = COALESCE(OLD.selected_day, '') AND terms_accepted = OLD.terms_accepted;
+END;''',
+    '''CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_update AFTER UPDATE OF selected_day, terms_accepted ON api_sellerprofile WHEN OLD.selected_day IS NOT NEW.selected_day OR OLD.terms_accepted IS NOT NEW.terms_accepted BEGIN
+    UPDATE api_sellerdaycount SET count = count - 1
+    WHERE selected_day = COALESCE(OLD.selected_day, '') AND terms_accepted = OLD.terms_accepted;
+
+    INSERT INTO api_sellerdaycount (selected_day, terms_accepted, count)
+    VALUES (COALESCE(NEW.selected_day, ''), NEW.terms_accepted, 1)
+    ON CONFLICT (selected_day, terms_accepted) DO UPDATE SET count = count + 1;
+END;''',
+]
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS api_sellerdaycount_insert;',
+    'DROP TRIGGER IF EXISTS api_sellerdaycount_delete;',
+    'DROP TRIGGER IF EXISTS api_sellerdaycount_update;',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_sellerprofile_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDayCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected_day', models.CharField(blank=True, max_length=10)),
+                ('terms_accepted', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('selected_day', 'terms_accepted'), name='seller_day_count_uniq')],
+            },
+        ),
+        migrations.RunSQL(POPULATE, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+# کپی ثابت SQL ماژول api.versioning در زمان این migration
+POPULATE = [
+    "INSERT OR IGNORE INTO api_tableversion (name, version) VALUES ('api_buyerprofile', 1);",
+    "INSERT OR IGNORE INTO api_tableversion (name, version) VALUES ('api_sellerprofile', 1);",
+]
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_version_insert AFTER INSERT ON api_buyerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_buyerprofile'; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_version_delete AFTER DELETE ON api_buyerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_buyerprofile'; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_version_update AFTER UPDATE ON api_buyerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_buyerprofile'; END;",
+    'CREATE TRIGGER IF NOT EXISTS api_buyerprofile_version_row AFTER UPDATE ON api_buyerprofile WHEN NEW.version = OLD.version BEGIN UPDATE api_buyerprofile SET version = OLD.version + 1 WHERE id = NEW.id; END;',
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_version_insert AFTER INSERT ON api_sellerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_sellerprofile'; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_version_delete AFTER DELETE ON api_sellerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_sellerprofile'; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_version_update AFTER UPDATE ON api_sellerprofile BEGIN UPDATE api_tableversion SET version = version + 1 WHERE name = 'api_sellerprofile'; END;",
+    'CREATE TRIGGER IF NOT EXISTS api_sellerprofile_version_row AFTER UPDATE ON api_sellerprofile WHEN NEW.version = OLD.version BEGIN UPDATE api_sellerprofile SET version = OLD.version + 1 WHERE id = NEW.id; END;',
+    'CREATE TRIGGER IF NOT EXISTS api_user_version_update AFTER UPDATE OF username, user_type ON api_user BEGIN UPDATE api_buyerprofile SET version = version + 1 WHERE user_id = NEW.id; UPDATE api_sellerprofile SET version = version + 1 WHERE user_id = NEW.id; END;',
+]
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS api_buyerprofile_version_insert;',
+    'DROP TRIGGER IF EXISTS api_buyerprofile_version_delete;',
+    'DROP TRIGGER IF EXISTS api_buyerprofile_version_update;',
+    'DROP TRIGGER IF EXISTS api_buyerprofile_version_row;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_version_insert;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_version_delete;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_version_update;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_version_row;',
+    'DROP TRIGGER IF EXISTS api_user_version_update;',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sellerdaycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='buyerprofile',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunSQL(POPULATE, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
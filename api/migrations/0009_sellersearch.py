@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:05
+
+from django.db import migrations
+
+# کپی ثابت SQL ماژول api.search در زمان این migration
+CREATE_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS api_sellersearch USING fts5(username, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4');"
+DROP_TABLE = 'DROP TABLE IF EXISTS api_sellersearch;'
+POPULATE = [
+    'DELETE FROM api_sellersearch;',
+    'INSERT INTO api_sellersearch (rowid, username, address) SELECT p.id, u.username, p.address FROM api_sellerprofile p JOIN api_user u ON u.id = p.user_id;',
+    "INSERT INTO api_sellersearch (api_sellersearch, rank) VALUES ('rank', 'bm25(2.0, 1.0)');",
+]
+CREATE_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS api_sellersearch_insert AFTER INSERT ON api_sellerprofile BEGIN INSERT INTO api_sellersearch (rowid, username, address) SELECT NEW.id, username, NEW.address FROM api_user WHERE id = NEW.user_id; END;',
+    'CREATE TRIGGER IF NOT EXISTS api_sellersearch_delete AFTER DELETE ON api_sellerprofile BEGIN DELETE FROM api_sellersearch WHERE rowid = OLD.id; END;',
+    'CREATE TRIGGER IF NOT EXISTS api_sellersearch_update AFTER UPDATE OF address, user_id ON api_sellerprofile WHEN OLD.address IS NOT NEW.address OR OLD.user_id IS NOT NEW.user_id BEGIN UPDATE api_sellersearch SET address = NEW.address, username = (SELECT username FROM api_user WHERE id = NEW.user_id) WHERE rowid = NEW.id; END;',
+    'CREATE TRIGGER IF NOT EXISTS api_user_search_update AFTER UPDATE OF username ON api_user WHEN OLD.username IS NOT NEW.username BEGIN UPDATE api_sellersearch SET username = NEW.username WHERE rowid IN (SELECT id FROM api_sellerprofile WHERE user_id = NEW.id); END;',
+]
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS api_sellersearch_insert;',
+    'DROP TRIGGER IF EXISTS api_sellersearch_delete;',
+    'DROP TRIGGER IF EXISTS api_sellersearch_update;',
+    'DROP TRIGGER IF EXISTS api_user_search_update;',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_job'),
+    ]
+
+    operations = [
+        migrations.RunSQL([CREATE_TABLE] + POPULATE, reverse_sql=[DROP_TABLE]),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
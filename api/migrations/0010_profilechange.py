@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:36
+
+from django.db import migrations, models
+
+# کپی ثابت SQL ماژول api.changes در زمان این migration
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_change_insert AFTER INSERT ON api_buyerprofile BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('buyer', NEW.id, 'insert', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_change_delete AFTER DELETE ON api_buyerprofile BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('buyer', OLD.id, 'delete', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_buyerprofile_change_update AFTER UPDATE OF user_id, terms_accepted, payment_status ON api_buyerprofile WHEN OLD.user_id IS NOT NEW.user_id OR OLD.terms_accepted IS NOT NEW.terms_accepted OR OLD.payment_status IS NOT NEW.payment_status BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('buyer', NEW.id, 'update', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_change_insert AFTER INSERT ON api_sellerprofile BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('seller', NEW.id, 'insert', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_change_delete AFTER DELETE ON api_sellerprofile BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('seller', OLD.id, 'delete', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerprofile_change_update AFTER UPDATE OF user_id, terms_accepted, payment_status, address, selected_day ON api_sellerprofile WHEN OLD.user_id IS NOT NEW.user_id OR OLD.terms_accepted IS NOT NEW.terms_accepted OR OLD.payment_status IS NOT NEW.payment_status OR OLD.address IS NOT NEW.address OR OLD.selected_day IS NOT NEW.selected_day BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) VALUES ('seller', NEW.id, 'update', strftime('%Y-%m-%d %H:%M:%f', 'now')); END;",
+    "CREATE TRIGGER IF NOT EXISTS api_user_change_update AFTER UPDATE OF username ON api_user WHEN OLD.username IS NOT NEW.username BEGIN INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) SELECT 'buyer', id, 'update', strftime('%Y-%m-%d %H:%M:%f', 'now') FROM api_buyerprofile WHERE user_id = NEW.id; INSERT INTO api_profilechange (profile_type, profile_id, op, created_at) SELECT 'seller', id, 'update', strftime('%Y-%m-%d %H:%M:%f', 'now') FROM api_sellerprofile WHERE user_id = NEW.id; END;",
+]
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS api_buyerprofile_change_insert;',
+    'DROP TRIGGER IF EXISTS api_buyerprofile_change_delete;',
+    'DROP TRIGGER IF EXISTS api_buyerprofile_change_update;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_change_insert;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_change_delete;',
+    'DROP TRIGGER IF EXISTS api_sellerprofile_change_update;',
+    'DROP TRIGGER IF EXISTS api_user_change_update;',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_sellersearch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_type', models.CharField(choices=[('buyer', 'Buyer'), ('seller', 'Seller')], max_length=10)),
+                ('profile_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile_type', 'id'], name='profilechange_type_seq_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+    ]
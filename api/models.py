@@ -18,6 +18,8 @@ class BuyerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'buyer'})
     terms_accepted = models.BooleanField(default=False)
     payment_status = models.BooleanField(default=True)
+    # با trigger در هر تغییر ردیف (یا User آن) یک واحد زیاد می‌شود؛ پایه ETag پاسخ‌ها
+    version = models.PositiveIntegerField(default=1, editable=False)
 
 class SellerProfile(models.Model):
     DAY_CHOICES = [
@@ -33,4 +35,102 @@ class SellerProfile(models.Model):
     terms_accepted = models.BooleanField(default=False)
     payment_status = models.BooleanField(default=True)
     address = models.CharField(max_length=255, blank=True)
-    selected_day = models.CharField(max_length=10, choices=DAY_CHOICES, blank=True, null=True)
\ No newline at end of file
+    selected_day = models.CharField(max_length=10, choices=DAY_CHOICES, blank=True, null=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # فیلترهای لیست فروشنده‌ها: ?selected_day=...&terms_accepted=...&payment_status=...
+            # SQLite در انتهای هر ایندکس rowid را نگه می‌دارد، پس ORDER BY id صفحه‌بندی هم از همین ایندکس می‌آید
+            models.Index(fields=['selected_day', 'terms_accepted'], name='seller_day_terms_idx'),
+            models.Index(fields=['terms_accepted', 'payment_status'], name='seller_terms_payment_idx'),
+        ]
+
+
+class SellerDayCount(models.Model):
+    """
+    تعداد فروشنده‌ها به ازای (روز انتخابی، پذیرش شرایط).
+    با triggerهای SQLite روی api_sellerprofile به‌روز نگه داشته می‌شود (مایگریشن 0006)،
+    پس update()، bulk و حذف cascade هم شمرده می‌شوند.
+    """
+    selected_day = models.CharField(max_length=10, blank=True)  # '' یعنی روزی انتخاب نشده
+    terms_accepted = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['selected_day', 'terms_accepted'], name='seller_day_count_uniq'),
+        ]
+
+
+class TableVersion(models.Model):
+    """
+    نسخه هر جدول پروفایل؛ با هر insert/update/delete (از طریق trigger) زیاد می‌شود
+    و ETag و کلید کش صفحه‌های لیست از آن ساخته می‌شود
+    """
+    name = models.CharField(max_length=64, unique=True)
+    version = models.BigIntegerField(default=0)
+
+
+class Job(models.Model):
+    """
+    صف کارهای پس‌زمینه (api/jobs.py)؛ با دستور run_jobs اجرا می‌شوند
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # کلید idempotency: تا وقتی jobی با همین کلید در صف است، enqueue دوباره job جدید نمی‌سازد
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField()
+    # job در حال اجرا که تا این زمان تمام نشود (ورکر مرده) دوباره برداشته می‌شود
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # برداشتن jobهای آماده: WHERE status = ... AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='queued'), name='job_queued_key_uniq'),
+        ]
+
+
+class ProfileChange(models.Model):
+    """
+    لاگ فقط‌افزودنی تغییرات پروفایل‌ها؛ triggerهای api/changes.py در هر insert/update/delete
+    (و تغییر username) یک ردیف اضافه می‌کنند. id (AUTOINCREMENT، هرگز تکرار نمی‌شود) شماره ترتیب
+    خوراک تغییرات (?since=) است
+    """
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OP_CHOICES = [
+        (INSERT, 'Insert'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+    profile_type = models.CharField(max_length=10, choices=User.USER_TYPE_CHOICES)
+    profile_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # خوراک هر نوع پروفایل: WHERE profile_type = ... AND id > since ORDER BY id
+            models.Index(fields=['profile_type', 'id'], name='profilechange_type_seq_idx'),
+        ]
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import weakref
+
+from django.conf import settings
+
+from .metrics import timed
+
+# requests و httpx (با urllib3، ssl و ...) حدود ۱۵۰ms به import هر ورکر اضافه می‌کنند؛
+# فقط کالبک OAuth به آن‌ها نیاز دارد، پس در اولین تبادل توکن import می‌شوند
+
+
+class OAuthError(Exception):
+    """
+    خطای تبادل توکن با سرور OAuth دیوار
+    """
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload or {}
+
+
+def _timeout():
+    return (settings.OAUTH2_CONNECT_TIMEOUT, settings.OAUTH2_READ_TIMEOUT)
+
+
+# --- کلاینت sync (WSGI) ---
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    یک requests.Session مشترک با pool اتصال keep-alive.
+    فقط خطاهای اتصال retry می‌شوند؛ code یک‌بارمصرف است و نباید بعد از
+    رسیدن درخواست به سرور دوباره ارسال شود.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=settings.OAUTH2_MAX_RETRIES,
+                    connect=settings.OAUTH2_MAX_RETRIES,
+                    read=0,
+                    status=0,
+                    backoff_factor=0.2,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=settings.OAUTH2_POOL_MAXSIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _token_payload(code, redirect_uri):
+    return {
+        "grant_type": "authorization_code",
+        "code": code,
+        "client_id": settings.OAUTH2_CLIENT_ID,
+        "client_secret": settings.OAUTH2_CLIENT_SECRET,
+        "redirect_uri": redirect_uri,
+    }
+
+
+def _parse_token_response(status_code, body):
+    if status_code != 200 or 'access_token' not in body:
+        raise OAuthError('token exchange failed', status_code=status_code, payload=body)
+    return body
+
+
+def _post_token(payload):
+    import requests
+
+    try:
+        with timed('http'):
+            response = get_session().post(settings.OAUTH2_TOKEN_URL, data=payload, timeout=_timeout())
+        body = response.json()
+    except requests.RequestException as exc:
+        raise OAuthError(str(exc)) from exc
+    except ValueError as exc:
+        raise OAuthError('invalid token response', status_code=response.status_code) from exc
+    return _parse_token_response(response.status_code, body)
+
+
+def exchange_code(code, redirect_uri):
+    return _post_token(_token_payload(code, redirect_uri))
+
+
+def refresh_access_token(refresh_token):
+    return _post_token({
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": settings.OAUTH2_CLIENT_ID,
+        "client_secret": settings.OAUTH2_CLIENT_SECRET,
+    })
+
+
+# --- کلاینت async (ASGI) ---
+
+# AsyncClient به event loop خودش وابسته است، پس برای هر loop یک کلاینت نگه می‌داریم
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=settings.OAUTH2_MAX_RETRIES),
+            timeout=httpx.Timeout(settings.OAUTH2_READ_TIMEOUT, connect=settings.OAUTH2_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.OAUTH2_POOL_MAXSIZE,
+                max_keepalive_connections=settings.OAUTH2_POOL_MAXSIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aexchange_code(code, redirect_uri):
+    import httpx
+
+    try:
+        with timed('http'):
+            response = await get_async_client().post(
+                settings.OAUTH2_TOKEN_URL,
+                data=_token_payload(code, redirect_uri),
+            )
+        body = response.json()
+    except httpx.HTTPError as exc:
+        raise OAuthError(str(exc)) from exc
+    except ValueError as exc:
+        raise OAuthError('invalid token response', status_code=response.status_code) from exc
+    return _parse_token_response(response.status_code, body)
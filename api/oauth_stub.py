@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # هدر و بدنه جدا نوشته می‌شوند؛ بدون این، Nagle و delayed ACK هر پاسخ را ~۴۰ms نگه می‌دارند
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        server = self.server
+        with server.lock:
+            server.requests.append(form)
+        if server.delay:
+            time.sleep(server.delay)
+
+        code = form.get('code') or form.get('refresh_token')
+        if not code or code in server.rejected_codes:
+            status, body = 400, {"error": "invalid_grant"}
+        else:
+            with server.lock:
+                server.issued += 1
+                n = server.issued
+            status, body = 200, {
+                "access_token": f"access-{code}-{n}",
+                "refresh_token": f"refresh-{code}-{n}",
+                "token_type": "bearer",
+                "expires_in": server.expires_in,
+                "scope": "offline_access",
+            }
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # پیش‌فرض ۵ است؛ با چند ده اتصال همزمان (بنچمارک async) SYNها دور ریخته می‌شوند و connect timeout می‌خورد
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # کلاینتی که با timeout اتصال را بسته (BrokenPipe) خطای سرور نیست
+        pass
+
+
+class StubTokenServer:
+    """
+    سرور توکن محلی برای تست و بنچمارک جریان OAuth بدون دسترسی به oauth.divar.ir
+
+        with StubTokenServer(delay=0.05) as stub:
+            with override_settings(OAUTH2_TOKEN_URL=stub.token_url):
+                ...
+    """
+    def __init__(self, delay=0.0, expires_in=3600, rejected_codes=()):
+        self.httpd = _Server(('127.0.0.1', 0), _TokenHandler)
+        self.httpd.delay = delay
+        self.httpd.expires_in = expires_in
+        self.httpd.rejected_codes = set(rejected_codes)
+        self.httpd.requests = []
+        self.httpd.issued = 0
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def token_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/oauth2/token'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,54 @@
+"""
+کارهای جانبی بعد از تکمیل onboarding (پذیرش شرایط خریدار، انتخاب روز فروشنده).
+
+endpointها فقط job را در صف می‌گذارند (enqueue_completed) و ورکر run_jobs هر دسته را با
+یک کوئری می‌خواند و به هر کدام از ONBOARDING_SIDE_EFFECTS (بررسی پرداخت، اعلان، geocode
+آدرس و ...) می‌دهد، پس زمان پاسخ به این کارها وابسته نیست.
+"""
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .bulk import _chunks
+from .jobs import enqueue_many, task
+from .models import BuyerProfile, SellerProfile
+
+logger = logging.getLogger(__name__)
+
+ONBOARDING_COMPLETED = 'onboarding.completed'
+
+PROFILE_MODELS = {
+    'buyer': BuyerProfile,
+    'seller': SellerProfile,
+}
+
+
+def enqueue_completed(profile_type, ids):
+    # چند تغییر پشت سر هم یک پروفایل تا وقتی job آن در صف است یکی می‌شوند؛ handler حالت فعلی را می‌خواند
+    enqueue_many(
+        ONBOARDING_COMPLETED,
+        [{'profile': profile_type, 'id': pk} for pk in ids],
+        keys=[f'{ONBOARDING_COMPLETED}:{profile_type}:{pk}' for pk in ids],
+    )
+
+
+@task(ONBOARDING_COMPLETED, batch=True)
+def onboarding_completed(payloads):
+    side_effects = [import_string(path) for path in settings.ONBOARDING_SIDE_EFFECTS]
+    by_type = {}
+    for payload in payloads:
+        by_type.setdefault(payload['profile'], set()).add(payload['id'])
+    for profile_type, ids in by_type.items():
+        model = PROFILE_MODELS[profile_type]
+        profiles = []
+        for chunk in _chunks(sorted(ids)):
+            profiles.extend(model.objects.select_related('user').filter(id__in=chunk))
+        # پروفایل‌هایی که در این فاصله حذف شده‌اند کاری ندارند
+        if profiles:
+            for side_effect in side_effects:
+                side_effect(profile_type, profiles)
+
+
+def log_completed(profile_type, profiles):
+    logger.info(f"onboarding {profile_type}: {', '.join(p.user.username for p in profiles)}")
@@ -0,0 +1,189 @@
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProfileCursorPagination(CursorPagination):
+    """
+    صفحه‌بندی keyset روی id پروفایل؛ هزینه هر صفحه به اندازه جدول بستگی ندارد.
+
+    paginate_queryset همان الگوریتم CursorPagination است که به دو قسمت قبل و بعد از
+    خواندن ردیف‌ها تقسیم شده تا apaginate_queryset همان منطق را با ORM async اجرا کند.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        queryset مرتب و برش خورده صفحه جاری (به علاوه یک ردیف برای تشخیص صفحه بعد)
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self.offset, self.reverse, self.current_position) = (0, False, None)
+        else:
+            (self.offset, self.reverse, self.current_position) = self.cursor
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+            if self.cursor.reverse != is_reversed:
+                kwargs = {order_attr + '__lt': self.current_position}
+            else:
+                kwargs = {order_attr + '__gt': self.current_position}
+            queryset = queryset.filter(**kwargs)
+        elif not self.reverse and self.ordering == ('id',):
+            # صفحه اول هم جست‌وجوی بازه روی کلید است (در plan به جای SCAN جدول، SEARCH با rowid>?)
+            queryset = queryset.filter(id__gt=0)
+
+        return queryset[self.offset:self.offset + self.page_size + 1]
+
+    def set_page(self, results):
+        offset, reverse, current_position = self.offset, self.reverse, self.current_position
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    صفحه‌بندی limit/offset برای نتایج مرتب شده بر اساس rank (که keyset روی id ممکن نیست).
+    count گرفته نمی‌شود؛ یک id اضافه فقط وجود صفحه بعد را نشان می‌دهد
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_ids(self, fetch, request):
+        """
+        fetch(limit, offset) فهرست idهای یک صفحه را برمی‌گرداند
+        """
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        ids = fetch(self.limit + 1, self.offset)
+        self.has_next = len(ids) > self.limit
+        return ids[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+def keyset_chunks(queryset, chunk_size):
+    """
+    ردیف‌های queryset (مدل یا values()) به ترتیب id، هر تکه با یک کوئری
+    «id > آخرین id ORDER BY id LIMIT chunk_size». برخلاف iterator() بین تکه‌ها هیچ cursor و
+    تراکنش خواندنی باز نمی‌ماند (checkpoint فایل WAL پشت یک export طولانی گیر نمی‌کند) و هر تکه
+    یک جست‌وجوی بازه روی کلید اصلی است.
+    """
+    last = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last).order_by('id')[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]['id'] if isinstance(chunk[-1], dict) else chunk[-1].pk
+
+
+class NDJSONExportMixin:
+    """
+    با ?export=ndjson کل لیست به صورت newline-delimited JSON استریم می‌شود.
+    ردیف‌ها با keyset_chunks تکه‌تکه از دیتابیس خوانده می‌شوند، پس حافظه
+    مستقل از اندازه جدول ثابت می‌ماند.
+    """
+    export_param = 'export'
+    export_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.export_param) == 'ndjson':
+            queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+            # استریم بعد از پایان dispatch خوانده می‌شود؛ alias همین حالا از روتر گرفته و ثابت می‌شود
+            queryset = queryset.using(queryset.db)
+            response = StreamingHttpResponse(
+                self._ndjson_rows(queryset),
+                content_type='application/x-ndjson',
+            )
+            response['Cache-Control'] = 'no-store'
+            return response
+        return super().list(request, *args, **kwargs)
+
+    def _ndjson_rows(self, queryset):
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        for data in self._representations(queryset):
+            yield encoder.encode(data) + '\n'
+
+    def _representations(self, queryset):
+        serializer = self.get_serializer()
+        for obj in keyset_chunks(queryset, self.export_chunk_size):
+            yield serializer.to_representation(obj)
@@ -0,0 +1,84 @@
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """
+    execute_wrapper که تعداد و متن کوئری‌های اجرا شده را نگه می‌دارد
+    """
+    def __init__(self):
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """
+    کوئری‌های همه اتصال‌ها (default و replica) را در یک QueryCounter می‌شمارد
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+@contextmanager
+def query_budget(max_queries, label=None):
+    """
+    اگر تعداد کوئری‌های داخل بلاک از max_queries بیشتر شود QueryBudgetExceeded می‌دهد.
+    برای استفاده در تست‌ها:
+
+        with query_budget(1):
+            client.get('/api/sellers/')
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(_budget_message(label, counter, max_queries))
+
+
+def _budget_message(label, counter, max_queries):
+    lines = [f"{label or 'block'} ran {counter.count} queries, budget is {max_queries}"]
+    lines.extend(f"  {i}. {sql}" for i, sql in enumerate(counter.queries, 1))
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    بودجه کوئری برای هر action ویوست.
+
+    query_budgets = {'list': 1, 'retrieve': 1}
+
+    عبور از بودجه یک warning لاگ می‌کند. بودجه بعد از اجرای action بررسی می‌شود (نوشتن آن
+    commit شده)، پس خطا دادن (QUERY_BUDGET_ENFORCE) فقط برای تست‌هاست.
+    """
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        with count_queries() as counter:
+            response = super().dispatch(request, *args, **kwargs)
+
+        action = getattr(self, 'action', None)
+        budget = self.query_budgets.get(action)
+        if budget is not None and counter.count > budget:
+            label = f"{self.__class__.__name__}.{action}"
+            message = _budget_message(label, counter, budget)
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,31 @@
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import timed_calls
+
+try:
+    import orjson
+except ImportError:  # orjson اختیاری است
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    همان خروجی JSONRenderer (بایت به بایت) ولی در حالت فشرده/یونیکد با orjson.
+    برای indent، ensure_ascii یا داده‌ای که orjson نمی‌شناسد به JSONRenderer برمی‌گردد.
+    """
+    @timed_calls('serialize')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # مثل JSONRenderer، \u2028 و \u2029 همیشه escape می‌شوند
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
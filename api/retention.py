@@ -0,0 +1,139 @@
+"""
+نگه‌داری داده: کاربرهای قدیمی که onboarding را رها کرده‌اند به فایل‌های NDJSON فشرده منتقل
+و حذف می‌شوند، sessionهای منقضی (SESSION_STORE=db) پاک می‌شوند و فضای آزاد SQLite
+برگردانده می‌شود (دستور archive_stale).
+
+همه حذف‌ها تکه تکه و هر تکه در یک تراکنش کوتاه است تا قفل نوشتن SQLite مدت زیادی
+گرفته نماند و درخواست‌ها بین تکه‌ها جلو بروند.
+"""
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import User
+from .transfer import _USER_COLUMNS, open_file, to_record
+
+# رها شده: بدون پروفایل، خریداری که شرایط را نپذیرفته، یا فروشنده‌ای که شرایط را نپذیرفته یا روزی انتخاب نکرده.
+# مسیرهای پروفایل LEFT JOIN هستند، پس نبودن پروفایل فروشنده هم در شرط آخر می‌افتد
+ABANDONED = (
+    Q(buyerprofile__isnull=True, sellerprofile__isnull=True)
+    | Q(user_type='buyer', buyerprofile__terms_accepted=False)
+    | Q(user_type='seller') & (Q(sellerprofile__terms_accepted=False) | Q(sellerprofile__selected_day__isnull=True))
+)
+
+
+def abandoned_users(older_than_days=None):
+    days = settings.RETENTION_ABANDONED_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return User.objects.filter(ABANDONED, created_at__lt=cutoff).order_by('id')
+
+
+def archive_path(now=None):
+    now = now or timezone.now()
+    return os.path.join(settings.RETENTION_ARCHIVE_DIR, f"users-{now:%Y%m%dT%H%M%S}.ndjson.gz")
+
+
+def archive_users(queryset, path, chunk_size=None, pause=0, dry_run=False, progress=None):
+    """
+    کاربرهای queryset (و پروفایلشان) را تکه تکه در path می‌نویسد و حذف می‌کند.
+    هر تکه اول روی دیسک نوشته و flush می‌شود و بعد حذف آن commit می‌شود؛ قطع شدن وسط
+    کار در بدترین حالت رکوردی را دوبار در آرشیو می‌گذارد، نه اینکه گم شود.
+    رکوردها همان قالب export_profiles (به علاوه created_at) هستند و با import_profiles برمی‌گردند.
+    """
+    chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+    archived = 0
+    last_id = 0
+    stream = None
+    try:
+        while True:
+            with transaction.atomic():
+                rows = list(queryset.filter(id__gt=last_id).values_list(*_USER_COLUMNS, 'created_at')[:chunk_size])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                if not dry_run:
+                    if stream is None:
+                        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                        stream = open_file(path, 'a')
+                    for values in rows:
+                        record = to_record(values)
+                        record['created_at'] = values[-1].isoformat()
+                        stream.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+                    stream.flush()
+                    # پروفایل‌ها با CASCADE در همان DELETE حذف می‌شوند (triggerهای شمارنده و نسخه اجرا می‌شوند)
+                    User.objects.filter(id__in=[values[0] for values in rows]).delete()
+            archived += len(rows)
+            if progress:
+                progress(archived)
+            if pause:
+                time.sleep(pause)
+    finally:
+        if stream is not None:
+            stream.close()
+    return archived
+
+
+def purge_expired_sessions(chunk_size=None):
+    """
+    sessionهای منقضی جدول django_session (فقط SESSION_STORE=db) را تکه تکه حذف می‌کند؛
+    clearsessions جنگو همه را با یک DELETE بزرگ پاک می‌کند
+    """
+    if not apps.is_installed('django.contrib.sessions'):
+        return 0
+    from django.contrib.sessions.models import Session
+
+    chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    deleted = 0
+    while True:
+        keys = list(expired.values_list('session_key', flat=True)[:chunk_size])
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+
+
+def _pragma(cursor, sql):
+    cursor.execute(sql)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def compact(full=False, step_pages=None):
+    """
+    صفحه‌های آزاد شده را به سیستم عامل برمی‌گرداند. با auto_vacuum=INCREMENTAL این کار با
+    incremental_vacuum در گام‌های step_pages صفحه‌ای (هر کدام یک قفل کوتاه) انجام می‌شود؛
+    بدون آن صفحه‌های آزاد برای درج‌های بعدی می‌مانند. VACUUM کامل که کل دیتابیس را بازنویسی و
+    در این مدت قفل می‌کند فقط با full اجرا می‌شود (نباید داخل تراکنش صدا زده شود).
+    بعد از آن آمار planner (PRAGMA optimize) به‌روز و WAL کوتاه می‌شود.
+    خروجی: (صفحه‌ها قبل، صفحه‌ها بعد)
+    """
+    step_pages = step_pages or settings.RETENTION_VACUUM_STEP_PAGES
+    with connection.cursor() as cursor:
+        before = _pragma(cursor, 'PRAGMA page_count')
+        if full:
+            cursor.execute('VACUUM')
+        elif _pragma(cursor, 'PRAGMA auto_vacuum') == 2:
+            while _pragma(cursor, 'PRAGMA freelist_count'):
+                cursor.execute(f'PRAGMA incremental_vacuum({int(step_pages)})')
+                cursor.fetchall()
+        cursor.execute('PRAGMA optimize')
+        if _pragma(cursor, 'PRAGMA journal_mode') == 'wal':
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        after = _pragma(cursor, 'PRAGMA page_count')
+    return before, after
+
+
+def enable_incremental_vacuum():
+    """
+    auto_vacuum فقط با یک VACUUM کامل روی دیتابیس موجود فعال می‌شود (یک‌بار)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_read_only = ContextVar('api_read_only', default=False)
+
+REPLICA_ALIAS = 'replica'
+
+
+@contextmanager
+def read_only():
+    """
+    کوئری‌های خواندنی داخل این بلاک (در صورت تعریف شدن) به اتصال replica می‌روند
+    """
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    خواندن‌های داخل read_only() به replica (همان فایل SQLite با mode=ro) و بقیه به default
+    """
+    def db_for_read(self, model, **hints):
+        if _read_only.get() and self._has_replica():
+            return REPLICA_ALIAS
+        return 'default'
+
+    def _has_replica(self):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            return False
+        # در تست‌ها replica آینه default است (TEST MIRROR)؛ اتصال جداگانه تراکنش باز تست را
+        # نمی‌بیند، پس همان default استفاده می‌شود
+        return connections[REPLICA_ALIAS].settings_dict['NAME'] != connections['default'].settings_dict['NAME']
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # هر دو alias یک دیتابیس هستند
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReadReplicaMixin:
+    """
+    actionهای فقط‌خواندنی ویوست (replica_actions) را داخل read_only() اجرا می‌کند
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if action not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with read_only():
+            return super().dispatch(request, *args, **kwargs)
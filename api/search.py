@@ -0,0 +1,95 @@
+import re
+
+from django.db import connection, connections, transaction
+
+# ایندکس متنی فروشنده‌ها (rowid همان id پروفایل) که مثل summary و versioning با triggerها
+# در همه مسیرهای نوشتن (save، update، bulk، upsert، cascade) همگام می‌ماند.
+# prefix: ایندکس جداگانه پیشوندهای ۲ تا ۴ حرفی تا جستجوی «در حال تایپ» اسکن کامل نخواهد
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS api_sellersearch USING fts5("
+    "username, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4');"
+)
+DROP_TABLE = "DROP TABLE IF EXISTS api_sellersearch;"
+POPULATE = [
+    "DELETE FROM api_sellersearch;",
+    "INSERT INTO api_sellersearch (rowid, username, address) "
+    "SELECT p.id, u.username, p.address FROM api_sellerprofile p JOIN api_user u ON u.id = p.user_id;",
+    # ترتیب rank: bm25 با وزن بیشتر برای username (تنظیم دائمی خود جدول)
+    "INSERT INTO api_sellersearch (api_sellersearch, rank) VALUES ('rank', 'bm25(2.0, 1.0)');",
+]
+
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS api_sellersearch_insert AFTER INSERT ON api_sellerprofile BEGIN "
+    "INSERT INTO api_sellersearch (rowid, username, address) "
+    "SELECT NEW.id, username, NEW.address FROM api_user WHERE id = NEW.user_id; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellersearch_delete AFTER DELETE ON api_sellerprofile BEGIN "
+    "DELETE FROM api_sellersearch WHERE rowid = OLD.id; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellersearch_update AFTER UPDATE OF address, user_id ON api_sellerprofile "
+    "WHEN OLD.address IS NOT NEW.address OR OLD.user_id IS NOT NEW.user_id BEGIN "
+    "UPDATE api_sellersearch SET address = NEW.address, "
+    "username = (SELECT username FROM api_user WHERE id = NEW.user_id) WHERE rowid = NEW.id; END;",
+    "CREATE TRIGGER IF NOT EXISTS api_user_search_update AFTER UPDATE OF username ON api_user "
+    "WHEN OLD.username IS NOT NEW.username BEGIN "
+    "UPDATE api_sellersearch SET username = NEW.username "
+    "WHERE rowid IN (SELECT id FROM api_sellerprofile WHERE user_id = NEW.id); END;",
+]
+DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS api_sellersearch_insert;",
+    "DROP TRIGGER IF EXISTS api_sellersearch_delete;",
+    "DROP TRIGGER IF EXISTS api_sellersearch_update;",
+    "DROP TRIGGER IF EXISTS api_user_search_update;",
+]
+
+# همان جداکننده‌های توکنایزر unicode61: هر چیزی جز حرف و عدد (از جمله _)
+_TOKEN = re.compile(r'[^\W_]+')
+MAX_TERMS = 8
+
+
+def match_expression(query):
+    """
+    عبارت MATCH برای متن کاربر: هر کلمه به صورت رشته نقل‌قول شده (بدون نحو FTS5) و پیشوندی،
+    و همه کلمه‌ها با هم (AND). اگر کلمه‌ای نباشد ''
+    """
+    terms = _TOKEN.findall(query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def ensure_triggers(using=None, **kwargs):
+    """
+    مثل summary.ensure_triggers؛ بعد از هر migrate triggerهای ایندکس جستجو را دوباره می‌سازد
+    """
+    conn = connections[using] if using else connection
+    if conn.vendor != 'sqlite':
+        return
+    tables = conn.introspection.table_names()
+    if not all(name in tables for name in ('api_sellersearch', 'api_sellerprofile', 'api_user')):
+        return
+    with conn.cursor() as cursor:
+        for sql in CREATE_TRIGGERS:
+            cursor.execute(sql)
+
+
+def rebuild_seller_search():
+    """
+    ایندکس را از روی api_sellerprofile و api_user از نو می‌سازد
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in POPULATE:
+            cursor.execute(sql)
+    ensure_triggers()
+
+
+def search_seller_ids(query, limit, offset=0, using=None):
+    """
+    id پروفایل فروشنده‌های منطبق به ترتیب rank. هزینه به تعداد ردیف‌های منطبق بستگی دارد،
+    نه به اندازه جدول
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    with connections[using or 'default'].cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM api_sellersearch WHERE api_sellersearch MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+            [expression, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,14 +1,29 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import User, BuyerProfile, SellerProfile
+from .metrics import timed_calls
 
 
-class UserSerializer(serializers.ModelSerializer):
+if settings.PERF_METRICS_ENABLED:
+    class TimedModelSerializer(serializers.ModelSerializer):
+        """
+        زمان to_representation در بخش serialize هدر Server-Timing حساب می‌شود
+        """
+        @timed_calls('serialize')
+        def to_representation(self, instance):
+            return super().to_representation(instance)
+else:
+    # بدون متریک هیچ لایه‌ای روی to_representation نیست
+    TimedModelSerializer = serializers.ModelSerializer
+
+
+class UserSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'user_type']
 
 
-class BuyerProfileSerializer(serializers.ModelSerializer):
+class BuyerProfileSerializer(TimedModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -16,7 +31,7 @@ class BuyerProfileSerializer(serializers.ModelSerializer):
         fields = ['user', 'terms_accepted']
 
 
-class SellerProfileSerializer(serializers.ModelSerializer):
+class SellerProfileSerializer(TimedModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+
+from .models import SellerDayCount, SellerProfile
+
+# شمارنده‌ها داخل خود SQLite به‌روز می‌شوند تا همه مسیرهای نوشتن (save، update، bulk، cascade) را پوشش دهند
+_INCREMENT = """
+    INSERT INTO api_sellerdaycount (selected_day, terms_accepted, count)
+    VALUES (COALESCE({row}.selected_day, ''), {row}.terms_accepted, 1)
+    ON CONFLICT (selected_day, terms_accepted) DO UPDATE SET count = count + 1;
+"""
+_DECREMENT = """
+    UPDATE api_sellerdaycount SET count = count - 1
+    WHERE selected_day = COALESCE({row}.selected_day, '') AND terms_accepted = {row}.terms_accepted;
+"""
+
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_insert AFTER INSERT ON api_sellerprofile BEGIN"
+    + _INCREMENT.format(row='NEW') + "END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_delete AFTER DELETE ON api_sellerprofile BEGIN"
+    + _DECREMENT.format(row='OLD') + "END;",
+    "CREATE TRIGGER IF NOT EXISTS api_sellerdaycount_update "
+    "AFTER UPDATE OF selected_day, terms_accepted ON api_sellerprofile "
+    "WHEN OLD.selected_day IS NOT NEW.selected_day OR OLD.terms_accepted IS NOT NEW.terms_accepted BEGIN"
+    + _DECREMENT.format(row='OLD') + _INCREMENT.format(row='NEW') + "END;",
+]
+DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS api_sellerdaycount_insert;",
+    "DROP TRIGGER IF EXISTS api_sellerdaycount_delete;",
+    "DROP TRIGGER IF EXISTS api_sellerdaycount_update;",
+]
+POPULATE = """
+    INSERT INTO api_sellerdaycount (selected_day, terms_accepted, count)
+    SELECT COALESCE(selected_day, ''), terms_accepted, COUNT(*) FROM api_sellerprofile
+    GROUP BY COALESCE(selected_day, ''), terms_accepted;
+"""
+
+
+def ensure_triggers(using=None, **kwargs):
+    """
+    SQLite هنگام بازسازی جدول در مایگریشن‌ها (AlterField و ...) triggerها را حذف می‌کند؛
+    این تابع بعد از هر migrate دوباره آن‌ها را می‌سازد
+    """
+    from django.db import connections
+    conn = connections[using] if using else connection
+    if conn.vendor != 'sqlite':
+        return
+    tables = conn.introspection.table_names()
+    if 'api_sellerdaycount' not in tables or 'api_sellerprofile' not in tables:
+        return
+    with conn.cursor() as cursor:
+        for sql in CREATE_TRIGGERS:
+            cursor.execute(sql)
+
+
+def rebuild_seller_day_counts():
+    """
+    شمارنده‌ها را از روی api_sellerprofile از نو می‌سازد
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM api_sellerdaycount')
+        cursor.execute(POPULATE)
+    ensure_triggers()
+
+
+def seller_day_counts():
+    """
+    خلاصه روزها از جدول شمارنده (حداکثر ۱۶ ردیف، مستقل از تعداد فروشنده‌ها)
+    """
+    days = {day: {'day': day, 'sellers': 0, 'terms_accepted': 0} for day, _ in SellerProfile.DAY_CHOICES}
+    unselected = {'sellers': 0, 'terms_accepted': 0}
+    for day, accepted, count in SellerDayCount.objects.values_list('selected_day', 'terms_accepted', 'count'):
+        bucket = days.get(day, unselected)
+        bucket['sellers'] += count
+        if accepted:
+            bucket['terms_accepted'] += count
+    return {'days': list(days.values()), 'unselected': unselected}
@@ -1,3 +1,1011 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import changes, jobs, metrics, search, transfer
+from .cache import SweepingFileBasedCache
+from .benchmarks import plans
+from .fastpath import compile_serializer
+from .models import User, BuyerProfile, Job, ProfileChange, SellerProfile
+from .oauth import OAuthError
+from .oauth_stub import StubTokenServer
+from .querybudget import QueryBudgetExceeded, query_budget
+from .renderers import FastJSONRenderer
+from .throttling import OAuthIPThrottle, claim_code, release_code
+from .tokens import TokenStore
+from .urls import api_urlpatterns
+from .views import BuyerViewSet, SellerViewSet
+
+# کش sessions (throttle، idempotency، کدهای کالبک) در تست‌ها در حافظه است، نه کش فایلی سرور
+TEST_CACHES = {**settings.CACHES, 'sessions': {**settings.CACHES['sessions'],
+                                              'BACKEND': 'api.cache.SweepingLocMemCache', 'LOCATION': 'test-sessions'}}
+
+
+def create_profiles(count, prefix=''):
+    """
+    count فروشنده و count خریدار؛ (فروشنده‌ها، خریدارها) به ترتیب id
+    """
+    sellers, buyers = [], []
+    for i in range(count):
+        user = User.objects.create(username=f'{prefix}seller{i}', user_type='seller')
+        sellers.append(SellerProfile.objects.create(user=user, address=f'address {i}'))
+        user = User.objects.create(username=f'{prefix}buyer{i}', user_type='buyer')
+        buyers.append(BuyerProfile.objects.create(user=user))
+    return sellers, buyers
+
+
+def in_processes(count, target):
+    """
+    target() همزمان در count پروسه fork شده (کش فایلی بین پروسه‌ها مشترک است)؛ فهرست نتیجه‌ها
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    barrier = context.Barrier(count)
+
+    def run():
+        barrier.wait()
+        results.put(target())
+
+    processes = [context.Process(target=run) for _ in range(count)]
+    for process in processes:
+        process.start()
+    values = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    return values
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTestCase(TestCase):
+    def setUp(self):
+        # کش پاسخ‌ها، sessionها و کلیدهای idempotency/throttle بین تست‌ها مشترک نماند
+        for alias in ('default', 'sessions'):
+            caches[alias].clear()
+
+    def get(self, path, data=None, **extra):
+        return self.client.get(path, data, HTTP_ACCEPT='application/json', **extra)
+
+    def post(self, path, data, **extra):
+        return self.client.post(path, data, content_type='application/json', **extra)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(ApiTestCase):
+    """
+    هر action بودجه‌دار ویوست‌ها در حد query_budgets خودش می‌ماند (کش پاسخ خالی)
+    """
+    def setUp(self):
+        super().setUp()
+        sellers, buyers = create_profiles(30)
+        self.seller, self.buyer = sellers[5].pk, buyers[5].pk
+
+    def assert_budget(self, viewset_class, action, request):
+        caches['default'].clear()
+        with query_budget(viewset_class.query_budgets[action], label=f'{viewset_class.__name__}.{action}'):
+            response = request()
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return response
+
+    def test_seller_actions(self):
+        requests = {
+            'list': lambda: self.get('/api/sellers/'),
+            'retrieve': lambda: self.get(f'/api/sellers/{self.seller}/'),
+            'accept_terms': lambda: self.post(f'/api/sellers/{self.seller}/accept_terms/', {'terms_accepted': True}),
+            'select_day': lambda: self.post(f'/api/sellers/{self.seller}/select_day/', {'selected_day': 'monday'}),
+            'day_counts': lambda: self.get('/api/sellers/day-counts/'),
+            'search': lambda: self.get('/api/sellers/search/', {'q': 'seller1'}),
+            'changes': lambda: self.get('/api/sellers/changes/', {'since': 0}),
+        }
+        self.assertEqual(set(requests), set(SellerViewSet.query_budgets))
+        for action, request in requests.items():
+            with self.subTest(action=action):
+                self.assert_budget(SellerViewSet, action, request)
+
+    def test_buyer_actions(self):
+        requests = {
+            'list': lambda: self.get('/api/buyers/'),
+            'retrieve': lambda: self.get(f'/api/buyers/{self.buyer}/'),
+            'accept_terms': lambda: self.post(f'/api/buyers/{self.buyer}/accept_terms/', {'terms_accepted': True}),
+            'changes': lambda: self.get('/api/buyers/changes/', {'since': 0}),
+        }
+        self.assertEqual(set(requests), set(BuyerViewSet.query_budgets))
+        for action, request in requests.items():
+            with self.subTest(action=action):
+                self.assert_budget(BuyerViewSet, action, request)
+
+    def test_list_pages_do_not_grow_with_page_size(self):
+        # بدون N+1: کاربرها با همان کوئری join می‌شوند
+        for page_size in (1, 30):
+            caches['default'].clear()
+            with query_budget(2):
+                response = self.get('/api/sellers/', {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_exceeding_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(0):
+                list(User.objects.all())
+        with _budget(SellerViewSet, 'retrieve', 0), self.assertRaises(QueryBudgetExceeded):
+            self.get(f'/api/sellers/{self.seller}/')
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_budget_only_logged_when_not_enforced(self):
+        with _budget(SellerViewSet, 'select_day', 0), self.assertLogs('api.querybudget', 'WARNING'):
+            response = self.post(f'/api/sellers/{self.seller}/select_day/', {'selected_day': 'friday'})
+        self.assertEqual(response.status_code, 200)
+
+
+def _budget(viewset_class, action, budget):
+    return mock.patch.object(viewset_class, 'query_budgets', {**viewset_class.query_budgets, action: budget})
+
+
+class TokenStoreTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.store = TokenStore(refresh_ahead=60, ttl=1000, backoff=30, max_backoff=100, clock=lambda: self.now)
+        self.store.put(1, {'access_token': 'a0', 'refresh_token': 'r0', 'expires_in': 100})
+
+    def wait_refresh(self):
+        future = self.store._inflight.get(1)
+        if future is not None:
+            try:
+                future.result(timeout=5)
+            except OAuthError:
+                pass
+
+    def test_refresh_ahead_single_flight(self):
+        with StubTokenServer(delay=0.1) as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url):
+            self.assertEqual(self.store.get(1), 'a0')
+            self.assertEqual(stub.requests, [])
+            # داخل پنجره refresh_ahead: توکن فعلی بدون انتظار برمی‌گردد و فقط یک refresh انجام می‌شود
+            self.now = 50
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(self.store.get(1))) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, ['a0'] * 10)
+            self.wait_refresh()
+            self.assertEqual([request['grant_type'] for request in stub.requests], ['refresh_token'])
+            self.assertTrue(self.store.get(1).startswith('access-r0'))
+        self.now = 5000
+        self.assertIsNone(self.store.get(1))
+
+    def test_expired_token_waits_for_refresh(self):
+        with StubTokenServer() as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url):
+            self.now = 150
+            self.assertIsNone(self.store.get(1))
+            self.wait_refresh()
+            self.now = 300
+            self.assertTrue(self.store.get(1, wait=True).startswith('access-'))
+
+    def test_failed_refresh_backs_off(self):
+        failure = OAuthError('connection refused')
+        with mock.patch('api.tokens.refresh_access_token', side_effect=failure) as refresh, \
+                self.assertLogs('api.tokens', 'WARNING'):
+            self.now = 50
+            for _ in range(5):
+                self.assertEqual(self.store.get(1), 'a0')
+                self.wait_refresh()
+            self.assertEqual(refresh.call_count, 1)
+            # بعد از backoff دوباره، و فاصله بعدی دو برابر است
+            self.now = 80
+            self.store.get(1)
+            self.wait_refresh()
+            self.assertEqual(refresh.call_count, 2)
+            self.now = 130
+            self.store.get(1)
+            self.assertEqual(refresh.call_count, 2)
+            self.now = 140
+            self.store.get(1)
+            self.wait_refresh()
+            self.assertEqual(refresh.call_count, 3)
+
+    def test_rejected_refresh_token_discards_entry(self):
+        rejected = OAuthError('invalid_grant', status_code=400)
+        with mock.patch('api.tokens.refresh_access_token', side_effect=rejected), self.assertLogs('api.tokens', 'WARNING'):
+            self.now = 50
+            self.store.get(1)
+            self.wait_refresh()
+        self.assertIsNone(self.store.get(1))
+
+
+class BulkTests(ApiTestCase):
+    def test_create_and_set_fields(self):
+        items = [{'username': f'bulk{i}', 'address': f'a{i}'} for i in range(50)]
+        items += [{'username': 'bulk1'}, {'username': ''}, {'username': 'long', 'address': 'x' * 300}]
+        with query_budget(10):
+            response = self.post('/api/sellers/bulk_create/', items)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        body = response.json()
+        self.assertEqual(body['counts'], {'created': 50, 'invalid': 3})
+        self.assertEqual(body['results'][50]['error'], 'duplicate username in batch')
+        ids = [result['id'] for result in body['results'][:50]]
+        self.assertEqual(SellerProfile.objects.get(pk=ids[3]).address, 'a3')
+
+        response = self.post('/api/sellers/bulk_create/', [{'username': 'bulk0'}, {'username': 'bulk-new'}])
+        self.assertEqual(response.json()['counts'], {'exists': 1, 'created': 1})
+
+        items = [{'id': pk, 'selected_day': 'friday' if i % 2 else 'monday'} for i, pk in enumerate(ids)]
+        items += [{'id': 10 ** 9, 'selected_day': 'monday'}, {'id': ids[0], 'selected_day': 'caturday'}]
+        with query_budget(10):
+            response = self.post('/api/sellers/bulk_select_day/', {'items': items})
+        self.assertEqual(response.json()['counts'], {'updated': 50, 'not_found': 1, 'invalid': 1})
+        self.assertEqual(SellerProfile.objects.filter(selected_day='friday').count(), 25)
+
+        response = self.post('/api/sellers/bulk_accept_terms/', [{'id': ids[0], 'terms_accepted': 'maybe'}])
+        self.assertEqual(response.json()['results'][0]['status'], 'invalid')
+        self.assertEqual(response.json()['results'][0]['error'], 'terms_accepted must be a boolean')
+
+    def test_bulk_terms_accept_the_same_values_as_accept_terms(self):
+        sellers, buyers = create_profiles(4)
+        values = ['true', 1, 'false', 0]
+        response = self.post('/api/buyers/bulk_accept_terms/',
+                             [{'id': buyer.pk, 'terms_accepted': value} for buyer, value in zip(buyers, values)])
+        self.assertEqual(response.json()['counts'], {'updated': 4})
+        self.assertEqual([buyer.terms_accepted for buyer in BuyerProfile.objects.order_by('id')],
+                         [True, True, False, False])
+        response = self.post('/api/sellers/bulk_accept_terms/',
+                             {'items': [{'id': sellers[0].pk, 'terms_accepted': 'True'}]})
+        self.assertEqual(response.json()['counts'], {'updated': 1})
+        self.assertTrue(SellerProfile.objects.get(pk=sellers[0].pk).terms_accepted)
+        # accept_terms تکی هم همین‌ها را می‌پذیرد
+        response = self.post(f'/api/sellers/{sellers[1].pk}/accept_terms/', {'terms_accepted': 'true'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicate_ids_are_rejected(self):
+        sellers, _ = create_profiles(1)
+        pk = sellers[0].pk
+        response = self.post('/api/sellers/bulk_select_day/', [
+            {'id': pk, 'selected_day': 'monday'}, {'id': pk, 'selected_day': 'friday'},
+        ])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['updated', 'invalid'])
+        self.assertEqual(response.json()['results'][1]['error'], 'duplicate id in batch')
+        self.assertEqual(SellerProfile.objects.get(pk=pk).selected_day, 'monday')
+
+    def test_malformed_bodies(self):
+        for body in ('abc', 42, {'items': 'abc'}, {'other': []}, [], [None]):
+            with self.subTest(body=body):
+                response = self.post('/api/sellers/bulk_create/', body)
+                if body == [None]:
+                    self.assertEqual(response.json()['counts'], {'invalid': 1})
+                else:
+                    self.assertEqual(response.status_code, 400, response.content)
+        items = [{'id': 1, 'terms_accepted': True}] * (settings.BULK_MAX_ITEMS + 1)
+        self.assertEqual(self.post('/api/buyers/bulk_accept_terms/', items).status_code, 400)
+
+    def test_concurrent_username_is_a_conflict(self):
+        User.objects.create(username='taken', user_type='seller')
+        # درج همزمان بین بررسی usernameها و bulk_create: بررسی چیزی پیدا نمی‌کند
+        with mock.patch('api.bulk._chunks', return_value=iter([])):
+            response = self.post('/api/sellers/bulk_create/', [{'username': 'fresh'}, {'username': 'taken'}])
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertFalse(User.objects.filter(username='fresh').exists())
+
+
+class FastPathTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        create_profiles(3)
+        for i, address in enumerate(['تهران، خیابان آزادی', 'line\nbreak "quoted" \\ slash', '😀', '']):
+            user = User.objects.create(username=f'tricky{i}', user_type='seller')
+            SellerProfile.objects.create(user=user, address=address, selected_day='friday' if i % 2 else None,
+                                         terms_accepted=bool(i % 2))
+
+    def test_compiled_matches_serializer(self):
+        for viewset_class in (SellerViewSet, BuyerViewSet):
+            serializer_class = viewset_class.serializer_class
+            compiled = compile_serializer(serializer_class)
+            queryset = viewset_class.queryset.order_by('id')
+            rows = {row['id']: row for row in compiled.values(queryset)}
+            for obj in queryset:
+                with self.subTest(serializer=serializer_class.__name__, id=obj.pk):
+                    expected = serializer_class(obj).data
+                    data = compiled.build(rows[obj.pk])
+                    self.assertEqual(list(data), list(expected))
+                    self.assertEqual(data, expected)
+                    self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_same_responses_with_and_without_fast_path(self):
+        pk = SellerProfile.objects.filter(selected_day='friday').values_list('id', flat=True).first()
+        paths = ['/api/sellers/', '/api/sellers/?selected_day=friday', '/api/buyers/', f'/api/sellers/{pk}/',
+                 f'/api/sellers/{pk}/?selected_day=friday', f'/api/sellers/{pk}/?selected_day=monday',
+                 f'/api/sellers/{pk}/?selected_day=caturday', '/api/sellers/abc/']
+        for path in paths:
+            responses = []
+            for fast in (True, False):
+                caches['default'].clear()
+                with self.settings(API_FAST_SERIALIZATION=fast):
+                    response = self.get(path)
+                responses.append((response.status_code, response.json()))
+            with self.subTest(path=path):
+                self.assertEqual(responses[0], responses[1])
+        # retrieve هم مثل get_object فیلترها را اعمال می‌کند
+        self.assertEqual(self.get(f'/api/sellers/{pk}/?selected_day=monday').status_code, 404)
+
+    def test_export_across_chunks(self):
+        lines = []
+        for fast in (True, False):
+            with self.settings(API_FAST_SERIALIZATION=fast), mock.patch.object(SellerViewSet, 'export_chunk_size', 2):
+                response = self.get('/api/sellers/', {'export': 'ndjson'})
+                lines.append(b''.join(response.streaming_content).decode().splitlines())
+        self.assertEqual(lines[0], lines[1])
+        usernames = [json.loads(line)['user']['username'] for line in lines[0]]
+        self.assertEqual(usernames, list(SellerProfile.objects.order_by('id').values_list('user__username', flat=True)))
+        self.assertEqual(len(usernames), 7)
+
+
+@override_settings(OAUTH2_THROTTLE_RATES={})
+class OAuthCallbackTests(ApiTestCase):
+    def state(self, client=None):
+        response = (client or self.client).get('/api/oauth/redirect/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return parse_qs(urlsplit(response.json()['auth_url']).query)['state'][0]
+
+    def callback(self, code, client=None):
+        client = client or self.client
+        return client.get('/api/oauth/callback/', {'code': code, 'state': self.state(client)})
+
+    def test_login(self):
+        with StubTokenServer() as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url):
+            state = self.state()
+            response = self.client.get('/api/oauth/callback/', {'code': 'abc', 'state': state})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertIn('/accept_terms/', response.json()['redirect'])
+            self.assertEqual([request['code'] for request in stub.requests], ['abc'])
+            # state یک بار مصرف است
+            response = self.client.get('/api/oauth/callback/', {'code': 'abc', 'state': state})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(self.client.get('/api/oauth/callback/', {'code': 'x', 'state': 'forged'}).status_code, 400)
+
+    def test_provider_errors(self):
+        with StubTokenServer(rejected_codes={'bad'}) as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url), \
+                self.assertLogs('api.views', 'ERROR'):
+            self.assertEqual(self.callback('bad').status_code, 502)
+        with StubTokenServer(delay=1) as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url, OAUTH2_READ_TIMEOUT=0.2), \
+                self.assertLogs('api.views', 'ERROR'):
+            self.assertEqual(self.callback('slow').status_code, 502)
+
+    def test_code_replay(self):
+        with StubTokenServer(rejected_codes={'bad'}) as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url), \
+                self.assertLogs('api.views', 'ERROR'):
+            self.assertEqual(self.callback('dup').status_code, 200)
+            self.assertEqual(self.callback('dup', Client()).status_code, 409)
+            # کدی که سرور رد کرده هم دیگر فرستاده نمی‌شود
+            self.assertEqual(self.callback('bad').status_code, 502)
+            self.assertEqual(self.callback('bad').status_code, 409)
+            self.assertEqual(len(stub.requests), 2)
+
+    def test_retry_after_transport_error(self):
+        # همان کالبک (همان code و state) بعد از timeout دوباره قابل اجراست
+        state = self.state()
+        with StubTokenServer(delay=1) as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url, OAUTH2_READ_TIMEOUT=0.2), \
+                self.assertLogs('api.views', 'ERROR'):
+            response = self.client.get('/api/oauth/callback/', {'code': 'retry', 'state': state})
+            self.assertEqual(response.status_code, 502)
+        with StubTokenServer() as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url):
+            response = self.client.get('/api/oauth/callback/', {'code': 'retry', 'state': state})
+            self.assertEqual(response.status_code, 200, response.content)
+            response = self.client.get('/api/oauth/callback/', {'code': 'retry', 'state': state})
+            self.assertEqual(response.status_code, 400)
+
+    async def test_async_retry_after_transport_error(self):
+        client = AsyncClient()
+        with self.settings(ROOT_URLCONF=AsyncURLConf()):
+            response = await client.get('/api/oauth/redirect/')
+            state = parse_qs(urlsplit(response.json()['auth_url']).query)['state'][0]
+            with StubTokenServer(delay=1) as stub, \
+                    self.settings(OAUTH2_TOKEN_URL=stub.token_url, OAUTH2_READ_TIMEOUT=0.2), \
+                    self.assertLogs('api.views', 'ERROR'):
+                response = await client.get('/api/oauth/callback/', {'code': 'async-retry', 'state': state})
+                self.assertEqual(response.status_code, 502)
+            with StubTokenServer() as stub, self.settings(OAUTH2_TOKEN_URL=stub.token_url):
+                response = await client.get('/api/oauth/callback/', {'code': 'async-retry', 'state': state})
+                self.assertEqual(response.status_code, 200, response.content)
+                response = await client.get('/api/oauth/callback/', {'code': 'async-retry', 'state': state})
+                self.assertEqual(response.status_code, 400)
+
+
+class FileSessionCacheMixin:
+    """
+    کش sessions روی backend فایلی پیش‌فرض (SESSION_STORE=file) در یک پوشه موقت، نه locmem
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.file_caches = override_settings(CACHES={**TEST_CACHES, 'sessions': {
+            'BACKEND': 'api.cache.SweepingFileBasedCache',
+            'LOCATION': cls.cache_dir.name,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }})
+        cls.file_caches.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.file_caches.disable()
+        cls.cache_dir.cleanup()
+        super().tearDownClass()
+
+
+class FileCacheOAuthCallbackTests(FileSessionCacheMixin, OAuthCallbackTests):
+    pass
+
+
+class SharedCacheTests(FileSessionCacheMixin, ApiTestCase):
+    def test_claim_code_across_processes(self):
+        codes = [f'code{i}' for i in range(200)]
+        claimed = in_processes(8, lambda: [code for code in codes if claim_code(code)])
+        # هر code دقیقاً یک بار
+        self.assertEqual(Counter(code for batch in claimed for code in batch), Counter(codes))
+        release_code('code0')
+        self.assertTrue(claim_code('code0'))
+        self.assertFalse(claim_code('code0'))
+
+    @override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': '50/hour'})
+    def test_throttle_tokens_across_processes(self):
+        request = RequestFactory().get('/')
+        allowed = in_processes(8, lambda: sum(OAuthIPThrottle().allow_request(request, None) for _ in range(20)))
+        self.assertEqual(sum(allowed), 50)
+
+    @override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': '5/min'})
+    def test_throttle_does_not_cull(self):
+        request = RequestFactory().get('/')
+        with mock.patch.object(SweepingFileBasedCache, '_cull') as cull:
+            self.assertEqual([OAuthIPThrottle().allow_request(request, None) for _ in range(6)], [True] * 5 + [False])
+        cull.assert_not_called()
+
+    def test_expired_entries(self):
+        cache = caches['sessions']
+        self.assertTrue(cache.add('key', 'old', -1))
+        # کلید منقضی مثل نبودن کلید است
+        self.assertTrue(cache.add('key', 'new'))
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertEqual(cache.update('key', lambda value: value + '!'), 'new!')
+        self.assertEqual(cache.update('missing', lambda value: value + 1, default=0), 1)
+        self.assertFalse(cache.delete_if('key', lambda value: value == 'new'))
+        self.assertTrue(cache.delete_if('key', lambda value: value == 'new!'))
+        self.assertIsNone(cache.get('key'))
+        cache.set('stale', 1, -1)
+        self.assertEqual(cache.sweep_expired(), 1)
+
+
+class AsyncMiddlewareTests(ApiTestCase):
+    async def test_session_saved_only_when_modified(self):
+        client = AsyncClient()
+        with self.settings(ROOT_URLCONF=AsyncURLConf()), \
+                mock.patch('api.middleware.sync_to_async', wraps=sync_to_async) as hop:
+            response = await client.get('/api/', headers={'Accept': 'application/json'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Frame-Options'], 'DENY')
+            self.assertEqual(hop.call_count, 0)
+            # redirect state را در session می‌نویسد
+            response = await client.get('/api/oauth/redirect/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(hop.call_count, 1)
+            self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
+class AsyncURLConf:
+    """
+    مسیرهای API_ASYNC_VIEWS=True زیر /api/
+    """
+    def __init__(self):
+        self.urlpatterns = [path('api/', include(api_urlpatterns(async_views=True)))]
+
+
+class ThrottleTests(ApiTestCase):
+    @override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': '3/min', 'oauth_session': None})
+    def test_ip_bucket(self):
+        codes = [self.client.get('/api/oauth/redirect/').status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertEqual(self.client.get('/api/oauth/redirect/')['Retry-After'], '20')
+        self.assertEqual(self.client.get('/api/oauth/redirect/', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    @override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': '2/min', 'oauth_session': None})
+    def test_forwarded_for_cannot_be_spoofed(self):
+        # پراکسی آی‌پی واقعی را به انتهای X-Forwarded-For اضافه می‌کند
+        codes = [Client().get('/api/oauth/redirect/', HTTP_X_FORWARDED_FOR=f'10.9.9.{i}, 203.0.113.7').status_code
+                 for i in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        response = Client().get('/api/oauth/redirect/', HTTP_X_FORWARDED_FOR='10.9.9.9, 203.0.113.8')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': None, 'oauth_session': '2/min'})
+    def test_session_bucket(self):
+        # درخواست اول هنوز session ندارد
+        codes = [self.client.get('/api/oauth/redirect/').status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertEqual(Client().get('/api/oauth/redirect/').status_code, 200)
+
+    def test_refill(self):
+        now = [1000.0]
+
+        class Throttle(OAuthIPThrottle):
+            def timer(self):
+                return now[0]
+
+        request = RequestFactory().get('/')
+        with override_settings(OAUTH2_THROTTLE_RATES={'oauth_ip': '2/s'}):
+            self.assertEqual([Throttle().allow_request(request, None) for _ in range(3)], [True, True, False])
+            throttle = Throttle()
+            self.assertFalse(throttle.allow_request(request, None))
+            self.assertAlmostEqual(throttle.wait(), 0.5)
+            now[0] += 0.5
+            self.assertEqual([Throttle().allow_request(request, None) for _ in range(2)], [True, False])
+
+
+class IdempotencyTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        sellers, _ = create_profiles(1)
+        self.path = f'/api/sellers/{sellers[0].pk}/select_day/'
+
+    def test_replay(self):
+        first = self.post(self.path, {'selected_day': 'monday'}, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            replay = self.post(self.path, {'selected_day': 'monday'}, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual((replay.status_code, replay.content), (200, first.content))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Job.objects.count(), 1)
+        # همان کلید با بدنه دیگر
+        self.assertEqual(self.post(self.path, {'selected_day': 'friday'}, HTTP_IDEMPOTENCY_KEY='k1').status_code, 422)
+        # پاسخ‌های 4xx هم ذخیره می‌شوند؛ بدون کلید چیزی ذخیره نمی‌شود
+        self.assertEqual(self.post(self.path, {}, HTTP_IDEMPOTENCY_KEY='k2').status_code, 400)
+        self.assertEqual(self.post(self.path, {}, HTTP_IDEMPOTENCY_KEY='k2')['Idempotent-Replayed'], 'true')
+        self.assertFalse(self.post(self.path, {'selected_day': 'monday'}).has_header('Idempotent-Replayed'))
+        self.assertEqual(self.post(self.path, {}, HTTP_IDEMPOTENCY_KEY='x' * 300).status_code, 400)
+
+    def test_in_flight_key_conflicts_immediately(self):
+        body = {'selected_day': 'monday'}
+        cache_key = 'idempotency:' + hashlib.sha256(f'POST {self.path}\nk1'.encode()).hexdigest()
+        # رزرو درخواستی که هنوز در حال اجراست
+        caches['sessions'].add(cache_key, ('pending', hashlib.sha256(json.dumps(body).encode()).hexdigest()), 60)
+        start = time.monotonic()
+        with self.assertNumQueries(0):
+            response = self.post(self.path, body, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertEqual(self.post(self.path, {'selected_day': 'friday'}, HTTP_IDEMPOTENCY_KEY='k1').status_code, 422)
+        caches['sessions'].delete(cache_key)
+        self.assertEqual(self.post(self.path, body, HTTP_IDEMPOTENCY_KEY='k1').status_code, 200)
+
+    def test_release_keeps_a_reservation_taken_over(self):
+        body = {'selected_day': 'monday'}
+        cache_key = 'idempotency:' + hashlib.sha256(f'POST {self.path}\nk1'.encode()).hexdigest()
+        other = ('pending', hashlib.sha256(json.dumps(body).encode()).hexdigest(), 'other-request')
+
+        def taken_over(viewset, request, pk=None):
+            # رزرو این درخواست منقضی شده و درخواست دیگری همان کلید را گرفته است
+            caches['sessions'].set(cache_key, other, 60)
+            return Response({'error': 'unavailable'}, status=503)
+
+        with mock.patch.object(SellerViewSet, 'select_day', taken_over):
+            self.assertEqual(self.post(self.path, body, HTTP_IDEMPOTENCY_KEY='k1').status_code, 503)
+        self.assertEqual(caches['sessions'].get(cache_key), other)
+        self.assertEqual(self.post(self.path, body, HTTP_IDEMPOTENCY_KEY='k1').status_code, 409)
+        # پاسخ ذخیره نشده رزرو خود درخواست را آزاد می‌کند
+        caches['sessions'].delete(cache_key)
+        with mock.patch.object(SellerViewSet, 'select_day', lambda viewset, request, pk=None: Response(status=503)):
+            self.assertEqual(self.post(self.path, body, HTTP_IDEMPOTENCY_KEY='k1').status_code, 503)
+        self.assertIsNone(caches['sessions'].get(cache_key))
+
+
+class FileCacheIdempotencyTests(FileSessionCacheMixin, IdempotencyTests):
+    pass
+
+
+class ChangeFeedTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='s1', user_type='seller')
+        self.seller = SellerProfile.objects.create(user=self.user, address='x')
+
+    def feed(self, path='/api/sellers/changes/', **params):
+        response = self.get(path, {'since': 0, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_feed(self):
+        SellerProfile.objects.filter(pk=self.seller.pk).update(selected_day='monday')
+        # نوشتن بدون تغییر ثبت نمی‌شود
+        SellerProfile.objects.filter(pk=self.seller.pk).update(selected_day='monday')
+        SellerProfile.objects.filter(pk=self.seller.pk).update(payment_status=False)
+        body = self.feed()
+        self.assertEqual([change['op'] for change in body['results']], ['insert', 'update', 'update'])
+        self.assertEqual(body['results'][-1]['data']['selected_day'], 'monday')
+        self.assertEqual(body['last_seq'], body['results'][-1]['seq'])
+        self.assertIsNone(body['next'])
+
+        BuyerProfile.objects.create(user=User.objects.create(username='b1', user_type='buyer'))
+        self.assertEqual([change['op'] for change in self.feed('/api/buyers/changes/')['results']], ['insert'])
+        self.seller.delete()
+        changes = self.feed(since=body['last_seq'])['results']
+        self.assertEqual([(change['op'], change['data']) for change in changes], [('delete', None)])
+        self.assertEqual(self.get('/api/sellers/changes/', {'since': -1}).status_code, 400)
+
+    def test_since_limit_and_next(self):
+        for day in ('monday', 'tuesday', 'friday'):
+            SellerProfile.objects.filter(pk=self.seller.pk).update(selected_day=day)
+        seqs = [change['seq'] for change in self.feed()['results']]
+        self.assertEqual(len(seqs), 4)
+        body = self.feed(since=seqs[0], limit=2)
+        self.assertEqual([change['seq'] for change in body['results']], seqs[1:3])
+        self.assertEqual(parse_qs(urlsplit(body['next']).query)['since'], [str(seqs[2])])
+        body = self.get(body['next']).json()
+        self.assertEqual([change['seq'] for change in body['results']], seqs[3:])
+        self.assertEqual(body['results'][0]['data']['selected_day'], 'friday')
+        self.assertEqual(self.feed(since=seqs[-1])['results'], [])
+        self.assertEqual(self.feed(since=seqs[-1])['last_seq'], seqs[-1])
+
+    def test_expired_since_is_gone(self):
+        SellerProfile.objects.filter(pk=self.seller.pk).update(address='y')
+        last = self.feed()['last_seq']
+        ProfileChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+        SellerProfile.objects.filter(pk=self.seller.pk).update(address='z')
+        self.assertEqual(changes.purge_changes(), 2)
+        response = self.get('/api/sellers/changes/', {'since': 1})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['error'], changes.EXPIRED_MESSAGE)
+        # مصرف‌کننده‌ای که به‌روز است ادامه می‌دهد
+        self.assertEqual([change['data']['address'] for change in self.feed(since=last)['results']], ['z'])
+
+    def test_every_write_path_is_logged(self):
+        _, buyers = create_profiles(1)
+        buyer = buyers[0].pk
+        start = {kind: self.feed(f'/api/{kind}/changes/')['last_seq'] for kind in ('sellers', 'buyers')}
+        pk = self.seller.pk
+        self.post(f'/api/sellers/{pk}/select_day/', {'selected_day': 'monday'})
+        self.post(f'/api/sellers/{pk}/accept_terms/', {'terms_accepted': True})
+        self.post('/api/sellers/bulk_select_day/', [{'id': pk, 'selected_day': 'friday'}])
+        self.post('/api/buyers/bulk_accept_terms/', [{'id': buyer, 'terms_accepted': True}])
+        # تغییر username در پاسخ پروفایل است
+        self.user.username = 'renamed'
+        self.user.save()
+        # فقط بالا رفتن version یا نوشتن همان مقدار ثبت نمی‌شود
+        SellerProfile.objects.filter(pk=pk).update(version=F('version') + 1, selected_day='friday')
+
+        sellers = self.feed(since=start['sellers'])['results']
+        self.assertEqual([change['op'] for change in sellers], ['update'] * 4)
+        self.assertEqual({change['id'] for change in sellers}, {pk})
+        self.assertEqual(sellers[-1]['data']['user']['username'], 'renamed')
+        self.assertEqual(sellers[-1]['data']['selected_day'], 'friday')
+        buyers = self.feed('/api/buyers/changes/', since=start['buyers'])['results']
+        self.assertEqual([(change['op'], change['id']) for change in buyers], [('update', buyer)])
+        self.assertTrue(buyers[0]['data']['terms_accepted'])
+
+
+@override_settings(CHANGES_POLL_INTERVAL=0.01)
+class ChangeBroadcasterTests(TestCase):
+    async def test_poller_survives_errors(self):
+        entry = {'seq': 7, 'op': 'update', 'id': 1, 'changed_at': None, 'data': None}
+        results = iter([RuntimeError('database is locked'), [entry]])
+
+        def load(*args):
+            result = next(results, [])
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        broadcaster = changes.ChangeBroadcaster(SellerViewSet)
+        with mock.patch('api.changes.load_changes', load), self.assertLogs('api.changes', 'ERROR'):
+            subscription = await broadcaster.subscribe()
+            await asyncio.wait_for(subscription.ready.wait(), 2)
+        self.assertEqual(subscription.take(), [entry])
+        self.assertFalse(broadcaster.task.done())
+        broadcaster.unsubscribe(subscription)
+        await asyncio.wait_for(broadcaster.task, 2)
+
+    async def test_expired_log_closes_streams(self):
+        def load(*args):
+            raise changes.ChangeLogExpired()
+
+        broadcaster = changes.ChangeBroadcaster(SellerViewSet)
+        with mock.patch('api.changes.load_changes', load), self.assertLogs('api.changes', 'ERROR'):
+            subscription = await broadcaster.subscribe()
+            await asyncio.wait_for(broadcaster.task, 2)
+        self.assertTrue(subscription.closed)
+        self.assertEqual(broadcaster.subscriptions, set())
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def import_profiles(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_profiles', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_export_roundtrip(self):
+        path = self.write('in.csv', 'username,user_type,terms_accepted,payment_status,address,selected_day\n'
+                                    's1,seller,true,,addr 1,monday\n'
+                                    'b1,buyer,false,false,,\n'
+                                    ',seller,,,,\n'
+                                    's2,seller,yes,,x,badday\n'
+                                    's3,seller,,,,\n')
+        out, err = self.import_profiles(path, '--chunk-size', '2')
+        self.assertIn('created 3', out)
+        self.assertIn('record 3', err)
+        self.assertIn('record 4', err)
+        self.assertFalse(os.path.exists(path + '.progress'))
+        seller = SellerProfile.objects.get(user__username='s1')
+        self.assertEqual((seller.terms_accepted, seller.address, seller.selected_day), (True, 'addr 1', 'monday'))
+        buyer = BuyerProfile.objects.get(user__username='b1')
+        self.assertEqual((buyer.terms_accepted, buyer.payment_status), (False, False))
+
+        # خروجی NDJSON و ورود دوباره آن چیزی را عوض نمی‌کند
+        versions = list(SellerProfile.objects.values_list('version', flat=True))
+        exported = io.StringIO()
+        call_command('export_profiles', stdout=exported, stderr=io.StringIO())
+        lines = exported.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['username'], 's1')
+        out, _ = self.import_profiles(self.write('out.ndjson', exported.getvalue()))
+        self.assertIn('unchanged 3', out)
+        self.assertEqual(list(SellerProfile.objects.values_list('version', flat=True)), versions)
+
+        # به‌روزرسانی جزئی فقط ستون داده شده را عوض می‌کند
+        out, _ = self.import_profiles(self.write('partial.ndjson', '{"username": "s1", "user_type": "seller", '
+                                                                   '"selected_day": "friday"}\n{bad json\n'))
+        self.assertIn('updated 1', out)
+        self.assertIn('invalid 1', out)
+        seller.refresh_from_db()
+        self.assertEqual((seller.terms_accepted, seller.address, seller.selected_day), (True, 'addr 1', 'friday'))
+
+        path = os.path.join(self.dir, 'buyers.csv')
+        call_command('export_profiles', path, '--user-type', 'buyer', stderr=io.StringIO())
+        with open(path) as f:
+            self.assertEqual(f.read().splitlines(), [','.join(transfer.FIELDS), 'b1,buyer,False,False,,'])
+
+    def test_resume_after_failure(self):
+        path = self.write('in.ndjson', ''.join(json.dumps({'username': f'u{i}', 'user_type': 'buyer'}) + '\n'
+                                               for i in range(10)))
+        calls = []
+
+        def failing(chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return transfer.import_chunk(chunk)
+
+        with mock.patch('api.management.commands.import_profiles.import_chunk', failing):
+            with self.assertRaises(RuntimeError):
+                self.import_profiles(path, '--chunk-size', '4')
+        with open(path + '.progress') as f:
+            self.assertEqual(json.load(f)['records'], 4)
+        out, _ = self.import_profiles(path, '--resume', '--chunk-size', '4')
+        self.assertIn('resuming after record 4', out)
+        self.assertEqual(User.objects.count(), 10)
+
+
+class SearchTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, address in [('alice_shop', 'Tehran Valiasr'), ('bob', 'Shiraz'), ('alicia', 'Tabriz alice street')]:
+            SellerProfile.objects.create(user=User.objects.create(username=name, user_type='seller'), address=address)
+        BuyerProfile.objects.create(user=User.objects.create(username='alice_buyer', user_type='buyer'))
+
+    def search(self, q, **params):
+        response = self.get('/api/sellers/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['user']['username'] for row in response.json()['results']], response.json()
+
+    def test_prefix_and_rank(self):
+        self.assertEqual(set(self.search('ali')[0]), {'alice_shop', 'alicia'})
+        self.assertEqual(self.search('alice')[0], ['alice_shop', 'alicia'])
+        self.assertEqual(self.search('teh vali')[0], ['alice_shop'])
+        self.assertEqual(self.get('/api/sellers/search/', {'q': '"*('}).status_code, 400)
+
+    def test_index_follows_writes(self):
+        SellerProfile.objects.filter(user__username='bob').update(address='Valiasr')
+        self.assertEqual(set(self.search('valiasr')[0]), {'alice_shop', 'bob'})
+        User.objects.filter(username='bob').update(username='robert')
+        self.assertEqual(self.search('robe')[0], ['robert'])
+        User.objects.filter(username='robert').delete()
+        self.assertEqual(self.search('valiasr')[0], ['alice_shop'])
+        search.rebuild_seller_search()
+        self.assertEqual(len(search.search_seller_ids('ali', 10)), 2)
+
+    def test_paging(self):
+        first, body = self.search('ali', limit=1)
+        self.assertIn('offset=1', body['next'])
+        second, body = self.search('ali', limit=1, offset=1)
+        self.assertIsNone(body['next'])
+        self.assertEqual(set(first + second), {'alice_shop', 'alicia'})
+
+
+side_effect_calls = []
+
+
+def record_side_effect(profile_type, profiles):
+    side_effect_calls.append((profile_type, sorted(profile.pk for profile in profiles)))
+
+
+@jobs.task('tests.flaky', max_attempts=3)
+def flaky_task(payload):
+    if payload.get('fail', 0) > len(side_effect_calls):
+        side_effect_calls.append(('failed', payload))
+        raise RuntimeError('boom')
+    side_effect_calls.append(('flaky', payload))
+
+
+@override_settings(ONBOARDING_SIDE_EFFECTS=[f'{__name__}.record_side_effect'])
+class JobTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        side_effect_calls.clear()
+        sellers, buyers = create_profiles(5)
+        self.sellers, self.buyer = [seller.pk for seller in sellers], buyers[0].pk
+
+    def test_writes_enqueue_coalesced_jobs(self):
+        for day in ('monday', 'tuesday'):
+            self.post(f'/api/sellers/{self.sellers[0]}/select_day/', {'selected_day': day})
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(side_effect_calls, [])
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(side_effect_calls, [('seller', [self.sellers[0]])])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+        # خریدار فقط با پذیرفتن شرایط
+        self.post(f'/api/buyers/{self.buyer}/accept_terms/', {'terms_accepted': False})
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 0)
+        self.post(f'/api/buyers/{self.buyer}/accept_terms/', {'terms_accepted': True})
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_bulk_jobs_run_in_one_batch(self):
+        self.post('/api/sellers/bulk_select_day/', [{'id': pk, 'selected_day': 'monday'} for pk in self.sellers])
+        self.assertEqual(Job.objects.count(), 5)
+        with query_budget(10):
+            jobs.run_pending()
+        self.assertEqual(side_effect_calls, [('seller', self.sellers)])
+
+    def test_retry_with_backoff_then_fail(self):
+        jobs.enqueue('tests.flaky', {'fail': 10})
+        with self.assertLogs('api.jobs', 'WARNING'):
+            jobs.run_pending()
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+        with self.assertLogs('api.jobs', 'WARNING') as logs:
+            for _ in range(2):
+                Job.objects.update(run_at=timezone.now())
+                jobs.run_pending()
+        self.assertIn('failed permanently', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+
+    def test_stale_lease_and_command(self):
+        jobs.enqueue('tests.flaky', {})
+        self.assertEqual(len(jobs.claim(10)), 1)
+        self.assertEqual(jobs.claim(10), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        jobs.requeue_stale()
+        Job.objects.update(run_at=timezone.now())
+        out = io.StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('1 jobs processed', out.getvalue())
+        Job.objects.update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(jobs.purge_finished(), 1)
+
+
+@override_settings(PERF_METRICS_ENABLED=True)
+class MetricsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        create_profiles(2)
+
+    def test_server_timing_and_histograms(self):
+        response = self.get('/api/sellers/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="2 queries", http;dur=')
+        body = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('api_request_duration_seconds_bucket{method="GET",view="sellers-list",status="200",le="+Inf"} 1',
+                      body)
+
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.1.2.3').status_code, 403)
+        # پشت پراکسی محلی (NUM_PROXIES=1) کلاینت بیرونی از X-Forwarded-For شناخته می‌شود
+        response = self.client.get('/api/metrics/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+        # مقدار جعلی اول هدر اثری ندارد
+        response = self.client.get('/api/metrics/', REMOTE_ADDR='127.0.0.1',
+                                   HTTP_X_FORWARDED_FOR='127.0.0.1, 203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='127.0.0.1').status_code, 200)
+        with self.settings(PERF_METRICS_ALLOWED_IPS=['10.1.2.3']):
+            self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.1.2.3').status_code, 200)
+            response = self.client.get('/api/metrics/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='10.1.2.3')
+            self.assertEqual(response.status_code, 200)
+        staff = get_user_model().objects.create(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+    def test_disabled(self):
+        with self.settings(PERF_METRICS_ENABLED=False):
+            response = Client().get('/api/sellers/', HTTP_ACCEPT='application/json')
+            self.assertNotIn('Server-Timing', response)
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+
+            def render():
+                pass
+            # بدون متریک تابع بدون wrapper برمی‌گردد
+            self.assertIs(metrics.timed_calls('serialize')(render), render)
+
+
+class RetentionTests(TransactionTestCase):
+    def archive_stale(self, *args, **options):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('archive_stale', *args, stdout=out, **options)
+        vacuums = [query['sql'] for query in queries if query['sql'].startswith('VACUUM')]
+        return out.getvalue(), vacuums
+
+    def test_archive_and_restore(self):
+        keep = User.objects.create(username='keep', user_type='seller')
+        SellerProfile.objects.create(user=keep, terms_accepted=True, selected_day='monday', address='a')
+        seller = User.objects.create(username='s', user_type='seller')
+        SellerProfile.objects.create(user=seller, terms_accepted=True, address='x')
+        buyer = User.objects.create(username='b', user_type='buyer')
+        BuyerProfile.objects.create(user=buyer, terms_accepted=False)
+        fresh = User.objects.create(username='fresh', user_type='buyer')
+        User.objects.exclude(pk=fresh.pk).update(created_at=timezone.now() - timedelta(days=200))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.ndjson.gz')
+            out, vacuums = self.archive_stale(output=path, chunk_size=1)
+            self.assertIn('2 users archived', out)
+            # بدون auto_vacuum=INCREMENTAL پیش‌فرض دیتابیس را بازنویسی نمی‌کند
+            self.assertEqual(vacuums, [])
+            self.assertEqual(set(User.objects.values_list('username', flat=True)), {'keep', 'fresh'})
+            call_command('import_profiles', path, stdout=io.StringIO())
+        self.assertEqual(SellerProfile.objects.get(user__username='s').address, 'x')
+
+        out, vacuums = self.archive_stale(vacuum='full')
+        self.assertEqual(vacuums, ['VACUUM'])
+        out, _ = self.archive_stale(dry_run=True)
+        self.assertIn('0 users would be archived', out)
+
+
+class PlanTests(ApiTestCase):
+    def test_no_scans_or_temp_sorts(self):
+        # همان گارد bench plans روی جدول‌های کوچک‌تر؛ ANALYZE بعد از seed انتخاب planner را ثابت می‌کند
+        result = plans.run({'rows': 2000}, lambda line: None)
+        self.assertEqual(result['violations'], [])
+        self.assertIn('sellers.export', result['scenarios'])
@@ -0,0 +1,107 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    throttle سطل توکن: نرخ 'N/period' یعنی ظرفیت N و پر شدن N توکن در هر period.
+    برخلاف SimpleRateThrottle که لیست زمان همه درخواست‌ها را نگه می‌دارد، برای هر کلید
+    فقط (توکن‌ها، زمان) ذخیره می‌شود و هر بررسی O(1) است.
+
+    سطل با cache.update (کش‌های api/cache.py) خوانده، کم و نوشته می‌شود که بین ورکرها اتمیک است،
+    پس دو ورکر یک توکن را دوبار خرج نمی‌کنند؛ update برخلاف set کش فایلی پوشه را cull نمی‌کند.
+    نرخ‌ها از OAUTH2_THROTTLE_RATES خوانده می‌شوند (None یعنی بدون محدودیت).
+    """
+    def __init__(self):
+        self.cache = caches[settings.OAUTH2_THROTTLE_CACHE_ALIAS]
+        super().__init__()
+
+    def get_rate(self):
+        return settings.OAUTH2_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        self._wait = 0
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        refill = self.num_requests / self.duration
+        self.now = self.timer()
+
+        def take(bucket):
+            tokens, stamp = bucket
+            tokens = min(self.num_requests, tokens + max(0, self.now - stamp) * refill)
+            if tokens >= 1:
+                self._wait = 0
+                return tokens - 1, self.now
+            self._wait = (1 - tokens) / refill
+            return tokens, self.now
+
+        # بعد از duration سطل دوباره پر است، پس کلید می‌تواند منقضی شود
+        self.cache.update(self.key, take, default=(self.num_requests, self.now), timeout=self.duration)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class OAuthIPThrottle(TokenBucketThrottle):
+    scope = 'oauth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class OAuthSessionThrottle(TokenBucketThrottle):
+    """
+    درخواست بدون session (اولین redirect) فقط با throttle آی‌پی محدود می‌شود
+    """
+    scope = 'oauth_session'
+
+    def get_cache_key(self, request, view):
+        session_key = request.session.session_key
+        if not session_key:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': session_key}
+
+
+OAUTH_THROTTLES = [OAuthIPThrottle, OAuthSessionThrottle]
+
+
+def throttle_wait(request, throttle_classes=OAUTH_THROTTLES):
+    """
+    برای viewهای غیر DRF (کالبک async): None یعنی مجاز، وگرنه ثانیه‌های انتظار
+    """
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait())
+    return max(waits) if waits else None
+
+
+def _code_key(code):
+    # خود code ذخیره نمی‌شود
+    return 'oauth-code:' + hashlib.sha256(code.encode()).hexdigest()
+
+
+def claim_code(code):
+    """
+    فقط اولین کالبک با یک code اجازه تبادل توکن می‌گیرد؛ تکرار همان code (دوبار کلیک،
+    retry مرورگر یا replay) بدون تماس با سرور OAuth رد می‌شود. add کش‌های api/cache.py بین
+    ورکرها اتمیک است (add کش فایلی خود جنگو نیست)
+    """
+    cache = caches[settings.OAUTH2_THROTTLE_CACHE_ALIAS]
+    return cache.add(_code_key(code), True, settings.OAUTH2_STATE_TTL)
+
+
+def release_code(code):
+    """
+    وقتی تبادل به دلیل خطای شبکه/سرور انجام نشده، code دوباره قابل استفاده است
+    """
+    caches[settings.OAUTH2_THROTTLE_CACHE_ALIAS].delete(_code_key(code))
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from .oauth import OAuthError, refresh_access_token
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TokenEntry:
+    access_token: str
+    refresh_token: str | None
+    expires_at: float
+    last_used: float = field(default_factory=time.monotonic)
+    # refresh ناموفق (خطای شبکه/سرور): تا retry_at دوباره تلاش نمی‌شود
+    failures: int = 0
+    retry_at: float = 0.0
+
+
+class TokenStore:
+    """
+    کش توکن‌های OAuth دیوار به ازای هر کاربر. کالبک‌ها توکن را با put می‌نویسند و تماس‌های
+    بعدی با API دیوار آن را با get می‌خوانند.
+
+    - توکن قبل از انقضا (refresh_ahead ثانیه مانده) در پس‌زمینه با refresh_token تازه می‌شود
+    - درخواست‌های همزمان برای یک کاربر فقط یک refresh انجام می‌دهند (single-flight)
+    - بعد از refresh ناموفق تا backoff ثانیه (دو برابر در هر شکست، حداکثر max_backoff) دوباره
+      تلاش نمی‌شود
+    - ورودی‌هایی که ttl ثانیه استفاده نشده‌اند حذف می‌شوند
+    """
+    def __init__(self, refresh_ahead=60, ttl=24 * 3600, backoff=30, max_backoff=600, max_workers=4,
+                 clock=time.monotonic):
+        self.refresh_ahead = refresh_ahead
+        self.ttl = ttl
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._entries = {}
+        self._inflight = {}
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='token-refresh')
+
+    def put(self, user_id, token_data):
+        now = self.clock()
+        entry = TokenEntry(
+            access_token=token_data['access_token'],
+            refresh_token=token_data.get('refresh_token'),
+            expires_at=now + float(token_data.get('expires_in') or 0),
+            last_used=now,
+        )
+        with self._lock:
+            previous = self._entries.get(user_id)
+            if previous and not entry.refresh_token:
+                entry.refresh_token = previous.refresh_token
+            self._entries[user_id] = entry
+            self._evict(now)
+        return entry
+
+    def get(self, user_id, wait=False):
+        """
+        access token معتبر کاربر را برمی‌گرداند، یا None.
+        اگر توکن نزدیک انقضا باشد refresh در پس‌زمینه شروع می‌شود و توکن فعلی برگردانده
+        می‌شود؛ فقط وقتی توکن منقضی شده و wait=True باشد منتظر refresh می‌ماند.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if now - entry.last_used > self.ttl:
+                del self._entries[user_id]
+                return None
+            entry.last_used = now
+            remaining = entry.expires_at - now
+            future = None
+            if remaining <= self.refresh_ahead and entry.refresh_token and now >= entry.retry_at:
+                future = self._start_refresh(user_id, entry.refresh_token)
+        if remaining > 0:
+            return entry.access_token
+        if future is not None and wait:
+            try:
+                return future.result(timeout=settings.OAUTH2_READ_TIMEOUT + settings.OAUTH2_CONNECT_TIMEOUT).access_token
+            except Exception:
+                return None
+        return None
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _start_refresh(self, user_id, refresh_token):
+        # باید با _lock گرفته شده صدا زده شود
+        future = self._inflight.get(user_id)
+        if future is None:
+            future = self._executor.submit(self._do_refresh, user_id, refresh_token)
+            self._inflight[user_id] = future
+        return future
+
+    def _do_refresh(self, user_id, refresh_token):
+        try:
+            token_data = refresh_access_token(refresh_token)
+            return self.put(user_id, token_data)
+        except OAuthError as exc:
+            logger.warning(f"refresh توکن کاربر {user_id} ناموفق بود: {exc}")
+            if exc.status_code == 400:
+                # refresh_token باطل شده؛ کاربر باید دوباره وارد شود
+                self.discard(user_id)
+            else:
+                self._back_off(user_id)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+
+    def _back_off(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry.retry_at = self.clock() + min(self.max_backoff, self.backoff * 2 ** entry.failures)
+                entry.failures += 1
+
+    def _evict(self, now):
+        # باید با _lock گرفته شده صدا زده شود؛ پیمایش کامل حداکثر هر ttl/10 ثانیه یک بار
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.ttl / 10
+        stale = [uid for uid, e in self._entries.items() if now - e.last_used > self.ttl]
+        for uid in stale:
+            del self._entries[uid]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_token_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TokenStore(
+                    refresh_ahead=settings.OAUTH2_TOKEN_REFRESH_AHEAD,
+                    ttl=settings.OAUTH2_TOKEN_STORE_TTL,
+                    backoff=settings.OAUTH2_TOKEN_REFRESH_BACKOFF,
+                    max_backoff=settings.OAUTH2_TOKEN_REFRESH_MAX_BACKOFF,
+                )
+    return _store
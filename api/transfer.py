@@ -0,0 +1,223 @@
+"""
+ورود و خروج انبوه کاربرها و پروفایل‌ها (دستورهای import_profiles و export_profiles).
+
+هر رکورد یک کاربر و پروفایل اوست با ستون‌های FIELDS، به صورت CSV (با سطر عنوان) یا NDJSON.
+خواندن و نوشتن استریم و تکه تکه است، پس حافظه به اندازه فایل یا جدول بستگی ندارد.
+"""
+import csv
+import gzip
+import json
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .bulk import CHUNK_SIZE, _chunks
+from .models import BuyerProfile, SellerProfile, User
+
+FIELDS = ['username', 'user_type', 'terms_accepted', 'payment_status', 'address', 'selected_day']
+
+PROFILE_MODELS = {
+    'buyer': BuyerProfile,
+    'seller': SellerProfile,
+}
+PROFILE_FIELDS = {
+    'buyer': ['terms_accepted', 'payment_status'],
+    'seller': ['terms_accepted', 'payment_status', 'address', 'selected_day'],
+}
+
+# کاربر با هر دو پروفایل احتمالی‌اش با LEFT JOIN در یک کوئری خوانده می‌شود
+_USER_COLUMNS = ['id', 'username', 'user_type'] + [
+    f'{model._meta.model_name}__{field}' for user_type, model in PROFILE_MODELS.items()
+    for field in ['id'] + PROFILE_FIELDS[user_type]
+]
+
+_boolean = serializers.BooleanField()
+_day_choices = {choice for choice, _ in SellerProfile.DAY_CHOICES}
+_address_max_length = SellerProfile._meta.get_field('address').max_length
+
+
+def _row(values):
+    """
+    ردیف values_list با _USER_COLUMNS به (id، username، user_type، مقادیر پروفایل یا None)
+    """
+    user_id, username, user_type = values[:3]
+    offset = 3
+    profile = None
+    for profile_type in PROFILE_MODELS:
+        fields = PROFILE_FIELDS[profile_type]
+        if profile_type == user_type and values[offset] is not None:
+            profile = dict(zip(fields, values[offset + 1:offset + 1 + len(fields)]))
+        offset += 1 + len(fields)
+    return user_id, username, user_type, profile
+
+
+def to_record(values):
+    """
+    ردیف values_list با _USER_COLUMNS به رکورد خروجی (ستون‌های پروفایل فقط اگر پروفایل باشد)
+    """
+    _, username, user_type, profile = _row(values)
+    record = {'username': username, 'user_type': user_type}
+    if profile is not None:
+        record.update(profile)
+    return record
+
+
+def clean_record(record):
+    """
+    (username, user_type, مقادیر پروفایل) یا ValueError. ستون خالی یا نبودن کلید یعنی
+    «داده نشده»: در ساخت پروفایل پیش‌فرض مدل و در به‌روزرسانی مقدار فعلی می‌ماند.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('record must be a JSON object')
+    username = record.get('username')
+    if not isinstance(username, str) or not username or len(username) > 100:
+        raise ValueError('username is required (at most 100 characters)')
+    user_type = record.get('user_type')
+    if user_type not in PROFILE_MODELS:
+        raise ValueError(f'invalid user_type {user_type!r}')
+
+    values = {}
+    for field in PROFILE_FIELDS[user_type]:
+        value = record.get(field)
+        if value is None or (value == '' and field != 'address'):
+            continue
+        if field in ('terms_accepted', 'payment_status'):
+            try:
+                value = _boolean.to_internal_value(value)
+            except serializers.ValidationError:
+                raise ValueError(f'{field} must be a boolean')
+        elif field == 'selected_day' and value not in _day_choices:
+            raise ValueError(f'invalid selected_day {value!r}')
+        elif field == 'address' and (not isinstance(value, str) or len(value) > _address_max_length):
+            raise ValueError(f'address must be a string of at most {_address_max_length} characters')
+        values[field] = value
+    return username, user_type, values
+
+
+def import_chunk(records):
+    """
+    records: لیست (شماره رکورد، دیکشنری). کاربرها بر اساس username upsert می‌شوند
+    (user_type کاربر موجود عوض نمی‌شود) و پروفایل هر کدام در همان تراکنش با upsert روی
+    user_id ساخته یا به‌روز می‌شود. پروفایل‌هایی که مقدارشان تغییری نکرده نوشته نمی‌شوند،
+    پس نسخه (ETag) آن‌ها عوض نمی‌شود و تکرار یک import بعد از خطا بی‌هزینه است.
+
+    خروجی: (شمارنده‌ها، لیست (شماره رکورد، خطا))
+    """
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+    errors = []
+    rows = {}
+    for number, record in records:
+        try:
+            username, user_type, values = clean_record(record)
+        except ValueError as exc:
+            errors.append((number, str(exc)))
+            continue
+        # تکرار یک username در همان تکه: آخرین رکورد برنده است
+        rows[username] = (number, user_type, values)
+
+    with transaction.atomic():
+        existing = {}
+        for chunk in _chunks(list(rows)):
+            for values in User.objects.filter(username__in=chunk).values_list(*_USER_COLUMNS):
+                user_id, username, user_type, profile = _row(values)
+                existing[username] = (user_id, user_type, profile)
+
+        new_users = [User(username=username, user_type=user_type)
+                     for username, (_, user_type, _) in rows.items() if username not in existing]
+        # SQLite با RETURNING شناسه‌ها را برمی‌گرداند
+        for user in User.objects.bulk_create(new_users, batch_size=CHUNK_SIZE):
+            existing[user.username] = (user.pk, user.user_type, None)
+        counts['created'] = len(new_users)
+
+        created = {user.username for user in new_users}
+        writes = {}
+        for username, (number, user_type, values) in rows.items():
+            user_id, current_type, profile = existing[username]
+            if current_type != user_type:
+                errors.append((number, f'user {username!r} exists with user_type {current_type!r}'))
+                continue
+            if profile is not None and all(profile[field] == value for field, value in values.items()):
+                counts['unchanged'] += 1
+                continue
+            if username not in created:
+                counts['updated'] += 1
+            # رکوردها بر اساس مجموعه ستون‌های داده شده گروه می‌شوند تا ستون‌های نیامده بازنویسی نشوند
+            writes.setdefault((user_type, tuple(sorted(values))), []).append(
+                PROFILE_MODELS[user_type](user_id=user_id, **values)
+            )
+
+        for (user_type, fields), profiles in writes.items():
+            model = PROFILE_MODELS[user_type]
+            if fields:
+                model.objects.bulk_create(profiles, batch_size=CHUNK_SIZE, update_conflicts=True,
+                                          unique_fields=['user'], update_fields=list(fields))
+            else:
+                model.objects.bulk_create(profiles, batch_size=CHUNK_SIZE, ignore_conflicts=True)
+
+    counts['invalid'] = len(errors)
+    return counts, errors
+
+
+def export_records(chunk_size=5000, user_type=None):
+    """
+    همه کاربرها (و پروفایلشان) به ترتیب id، هر تکه با یک کوئری keyset (id > آخرین id)؛
+    برخلاف iterator() هیچ cursor یا تراکنش خواندنی طولانی باز نمی‌ماند
+    """
+    queryset = User.objects.order_by('id')
+    if user_type:
+        queryset = queryset.filter(user_type=user_type)
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).values_list(*_USER_COLUMNS)[:chunk_size])
+        if not chunk:
+            return
+        for values in chunk:
+            yield to_record(values)
+        last_id = chunk[-1][0]
+
+
+def read_records(stream, fmt):
+    """
+    رکوردهای ورودی به ترتیب؛ برای خط NDJSON خراب None برمی‌گردد تا همان رکورد
+    به عنوان invalid گزارش شود و شماره رکوردها (برای ادامه import) جابه‌جا نشود
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def write_records(stream, fmt, records):
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+        return
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def open_file(path, mode):
+    """
+    فایل متنی رکوردها؛ با پسوند .gz فشرده خوانده یا نوشته می‌شود
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    path = path.removesuffix('.gz')
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise ValueError(f'cannot detect format of {path!r}, use --format')
@@ -1,15 +1,59 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserTypeViewSet, BuyerViewSet, SellerViewSet, ApiRoot, OAuthCallbackView, OAuthRedirectView
+from .asyncread import split_by_method
+from .changes import ChangeStreamView
+from .metrics import metrics_view
+from .views import (
+    UserTypeViewSet, BuyerViewSet, SellerViewSet, ApiRoot, AsyncApiRoot,
+    OAuthCallbackView, AsyncOAuthCallbackView, OAuthRedirectView, AsyncOAuthRedirectView,
+)
 
 router = DefaultRouter()
 router.register(r'user-type', UserTypeViewSet, basename='user-type')
 router.register(r'buyers', BuyerViewSet, basename='buyers')
 router.register(r'sellers', SellerViewSet, basename='sellers')
 
-urlpatterns = [
-    path('', include(router.urls)),
-    path('', ApiRoot.as_view(), name='api-root'),
-    path('oauth/redirect/', OAuthRedirectView.as_view(), name='oauth-redirect'),
-    path('oauth/callback/', OAuthCallbackView.as_view(), name='oauth-callback'),
-]
\ No newline at end of file
+
+def _async_profile_routes(prefix, viewset_class):
+    # قبل از router قرار می‌گیرند؛ pk فقط عدد است تا مسیرهایی مثل sellers/day-counts/ به router برسند.
+    # بدون name، تا reverse همان مسیرهای router را برگرداند
+    list_view = viewset_class.as_view({'get': 'list', 'post': 'create'})
+    detail_view = viewset_class.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+    })
+    return [
+        path(f'{prefix}/', split_by_method(viewset_class, list_view)),
+        path(f'{prefix}/<int:pk>/', split_by_method(viewset_class, detail_view)),
+    ]
+
+
+def api_urlpatterns(async_views=False):
+    """
+    با async_views (API_ASYNC_VIEWS، برای ASGI) ریشه API، OAuth و خواندن‌های buyers/sellers
+    async هستند و استریم تغییرات اضافه می‌شود؛ نوشتن‌ها همان ویوست‌های sync می‌مانند
+    """
+    # زیر ASGI نسخه async کالبک استفاده می‌شود
+    callback_view = AsyncOAuthCallbackView if async_views or settings.OAUTH2_ASYNC_CALLBACK else OAuthCallbackView
+    if not async_views:
+        return [
+            path('', include(router.urls)),
+            path('', ApiRoot.as_view(), name='api-root'),
+            path('oauth/redirect/', OAuthRedirectView.as_view(), name='oauth-redirect'),
+            path('oauth/callback/', callback_view.as_view(), name='oauth-callback'),
+            path('metrics/', metrics_view, name='metrics'),
+        ]
+    return _async_profile_routes('buyers', BuyerViewSet) + _async_profile_routes('sellers', SellerViewSet) + [
+        # استریم SSE فقط زیر ASGI؛ در WSGI هر اتصال یک ورکر را تا بسته شدن نگه می‌داشت
+        path('buyers/changes/stream/', ChangeStreamView.as_view(viewset_class=BuyerViewSet), name='buyers-changes-stream'),
+        path('sellers/changes/stream/', ChangeStreamView.as_view(viewset_class=SellerViewSet), name='sellers-changes-stream'),
+        # ترتیب مثل حالت sync است (ریشه DefaultRouter اول)
+        path('', include(router.urls)),
+        path('', AsyncApiRoot.as_view(), name='api-root'),
+        path('oauth/redirect/', AsyncOAuthRedirectView.as_view(), name='oauth-redirect'),
+        path('oauth/callback/', callback_view.as_view(), name='oauth-callback'),
+        path('metrics/', metrics_view, name='metrics'),
+    ]
+
+
+urlpatterns = api_urlpatterns(settings.API_ASYNC_VIEWS)
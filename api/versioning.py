@@ -0,0 +1,65 @@
+from django.db import connection, connections
+
+from .models import TableVersion
+
+PROFILE_TABLES = ['api_buyerprofile', 'api_sellerprofile']
+
+_BUMP_TABLE = "UPDATE api_tableversion SET version = version + 1 WHERE name = '{table}';"
+
+
+def _profile_triggers(table):
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} BEGIN "
+        + _BUMP_TABLE.format(table=table) + " END;",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} BEGIN "
+        + _BUMP_TABLE.format(table=table) + " END;",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table} BEGIN "
+        + _BUMP_TABLE.format(table=table) + " END;",
+        # اگر خود نوشتن version را تغییر نداده باشد (یعنی همه مسیرهای برنامه) یک واحد زیادش می‌کند
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_row AFTER UPDATE ON {table} "
+        f"WHEN NEW.version = OLD.version BEGIN "
+        f"UPDATE {table} SET version = OLD.version + 1 WHERE id = NEW.id; END;",
+    ]
+
+
+CREATE_TRIGGERS = [sql for table in PROFILE_TABLES for sql in _profile_triggers(table)] + [
+    # username و user_type در پاسخ پروفایل‌ها هستند، پس تغییرشان نسخه پروفایل را هم عوض می‌کند
+    "CREATE TRIGGER IF NOT EXISTS api_user_version_update AFTER UPDATE OF username, user_type ON api_user BEGIN "
+    + " ".join(f"UPDATE {table} SET version = version + 1 WHERE user_id = NEW.id;" for table in PROFILE_TABLES)
+    + " END;",
+]
+DROP_TRIGGERS = [
+    f"DROP TRIGGER IF EXISTS {table}_version_{kind};"
+    for table in PROFILE_TABLES for kind in ('insert', 'delete', 'update', 'row')
+] + ["DROP TRIGGER IF EXISTS api_user_version_update;"]
+POPULATE = [
+    f"INSERT OR IGNORE INTO api_tableversion (name, version) VALUES ('{table}', 1);" for table in PROFILE_TABLES
+]
+
+
+def ensure_triggers(using=None, **kwargs):
+    """
+    مثل summary.ensure_triggers؛ بعد از هر migrate triggerهای نسخه را (اگر با بازسازی جدول حذف شده باشند)
+    دوباره می‌سازد
+    """
+    conn = connections[using] if using else connection
+    if conn.vendor != 'sqlite':
+        return
+    tables = conn.introspection.table_names()
+    if not all(name in tables for name in PROFILE_TABLES + ['api_tableversion', 'api_user']):
+        return
+    with conn.cursor() as cursor:
+        for sql in POPULATE + CREATE_TRIGGERS:
+            cursor.execute(sql)
+
+
+def table_version(table, using=None):
+    with connections[using or 'default'].cursor() as cursor:
+        cursor.execute('SELECT version FROM api_tableversion WHERE name = %s', [table])
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+async def atable_version(table, using=None):
+    version = await TableVersion.objects.using(using).filter(name=table).values_list('version', flat=True).afirst()
+    return version or 0
@@ -1,134 +1,348 @@
 # Create your views here.
 
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.urls import reverse
 from .models import User, BuyerProfile, SellerProfile
 from .serializers import UserSerializer, BuyerProfileSerializer, SellerProfileSerializer
+from .querybudget import QueryBudgetMixin
+from .pagination import ProfileCursorPagination, NDJSONExportMixin, SearchPagination
+from .filters import ProfileFilterBackend
+from .summary import seller_day_counts
+from .search import match_expression, search_seller_ids
+from .versioning import table_version
+from .routers import ReadReplicaMixin
+from .conditional import ConditionalCacheMixin
+from .fastpath import FastReadMixin
+from .idempotency import IdempotencyMixin
+from .changes import ChangeFeedMixin
 import logging
-import requests
+import secrets
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import JsonResponse
+from django.views import View
 from rest_framework.views import APIView
+from .oauth import OAuthError, exchange_code, aexchange_code
+from .tokens import get_token_store
+from .bulk import BulkError, bulk_set_field, bulk_create_profiles
+from .throttling import OAUTH_THROTTLES, claim_code, release_code, throttle_wait
+from rest_framework.exceptions import Throttled
+from .onboarding import enqueue_completed
 
 logger = logging.getLogger(__name__)
 
+def _api_root(request):
+    return {
+        'welcome': 'به API خرید و فروش خوش آمدید',
+        'oauth': request.build_absolute_uri(reverse('oauth-redirect')),
+    }
+
+
 class ApiRoot(APIView):
     """
     نقطه شروع API
     """
     def get(self, request, format=None):
-        return Response({
-            'welcome': 'به API خرید و فروش خوش آمدید',
-            'oauth': reverse('oauth-redirect', request=request, format=format),
-        })
+        return Response(_api_root(request))
+
+
+class AsyncApiRoot(View):
+    """
+    نسخه async نقطه شروع API برای ASGI
+    """
+    async def get(self, request):
+        return JsonResponse(_api_root(request), json_dumps_params={'ensure_ascii': False})
 
 class OAuthRedirectView(APIView):
     """
     ریدایرکت به OAuth دیوار
     """
+    throttle_classes = OAUTH_THROTTLES
+
     def get(self, request, format=None):
-        # استفاده از تنظیمات از فایل settings
-        oauth_url = settings.OAUTH2_AUTH_URL
-        client_id = settings.OAUTH2_CLIENT_ID
-        redirect_uri = request.build_absolute_uri(reverse('oauth-callback'))
-        
         # ایجاد یک state تصادفی با طول کافی (حداقل ۸ کاراکتر)
-        import secrets
         state = secrets.token_hex(16)  # ۳۲ کاراکتر هگزادسیمال
         
         # ذخیره state در session برای بررسی در کالبک
         request.session['oauth_state'] = state
-        
-        # طبق مستندات دیوار، اسکوپ را خالی می‌گذاریم یا از اسکوپ‌های مجاز استفاده می‌کنیم
-        # برای دریافت refresh_token می‌توانیم از offline_access استفاده کنیم
-        scope = "offline_access"
-        
-        # ساخت URL با پارامترهای لازم
-        auth_url = f"{oauth_url}?response_type=code&client_id={client_id}&redirect_uri={redirect_uri}&state={state}&scope={scope}"
-        return Response({"auth_url": auth_url})
+        request.session.set_expiry(settings.OAUTH2_STATE_TTL)
+        return Response({"auth_url": _auth_url(request, state)})
+
+
+class AsyncOAuthRedirectView(View):
+    """
+    نسخه async ریدایرکت برای ASGI
+    """
+    async def get(self, request):
+        wait = throttle_wait(request)
+        if wait is not None:
+            return _throttled_response(wait)
+
+        state = secrets.token_hex(16)
+        await request.session.aset('oauth_state', state)
+        request.session.set_expiry(settings.OAUTH2_STATE_TTL)
+        return JsonResponse({"auth_url": _auth_url(request, state)})
+
+
+def _auth_url(request, state):
+    # استفاده از تنظیمات از فایل settings
+    oauth_url = settings.OAUTH2_AUTH_URL
+    client_id = settings.OAUTH2_CLIENT_ID
+    redirect_uri = request.build_absolute_uri(reverse('oauth-callback'))
+
+    # طبق مستندات دیوار، اسکوپ را خالی می‌گذاریم یا از اسکوپ‌های مجاز استفاده می‌کنیم
+    # برای دریافت refresh_token می‌توانیم از offline_access استفاده کنیم
+    scope = "offline_access"
+
+    # ساخت URL با پارامترهای لازم
+    return f"{oauth_url}?response_type=code&client_id={client_id}&redirect_uri={redirect_uri}&state={state}&scope={scope}"
+
+
+def _throttled_response(wait):
+    # همان پاسخ 429 که DRF برای viewهای sync می‌دهد
+    throttled = Throttled(wait)
+    response = JsonResponse({"detail": str(throttled.detail)}, status=throttled.status_code)
+    response['Retry-After'] = str(throttled.wait)
+    return response
+
+def _check_callback_params(params, stored_state):
+    """
+    بررسی پارامترهای کالبک؛ در صورت خطا (payload, status) برمی‌گرداند
+    """
+    # بررسی خطا
+    error = params.get('error')
+    error_description = params.get('error_description')
+    if error:
+        logger.error(f"خطای OAuth: {error} - {error_description}")
+        return {"error": error, "error_description": error_description}, status.HTTP_400_BAD_REQUEST
+
+    # بررسی کد و state
+    if not params.get('code'):
+        return {"error": "کد دریافت نشد"}, status.HTTP_400_BAD_REQUEST
+
+    # بررسی state برای جلوگیری از حملات CSRF
+    state = params.get('state')
+    if not state or state != stored_state:
+        return {"error": "state نامعتبر است"}, status.HTTP_400_BAD_REQUEST
+    return None
+
+
+def _claim_failure(code):
+    # دو کالبک با یک code فقط یک تبادل توکن انجام می‌دهند
+    if claim_code(code):
+        return None
+    return {"error": "این کد قبلاً استفاده شده است"}, status.HTTP_409_CONFLICT
+
+
+def _release_on_retryable(code, exc):
+    # code رد شده توسط سرور OAuth دیگر معتبر نیست؛ فقط خطای شبکه/سرور قابل تکرار است
+    if exc.status_code is None or exc.status_code >= 500:
+        release_code(code)
+
+
+def _token_error(exc):
+    logger.error(f"خطای دریافت توکن: {exc} ({exc.status_code})")
+    return {"error": "دریافت توکن ناموفق بود"}, status.HTTP_502_BAD_GATEWAY
+
+
+def _login_redirect(user_type, profile):
+    # ریدایرکت به مسیر مناسب بر اساس نوع کاربر
+    if user_type == "buyer":
+        return {"redirect": reverse('buyers-accept-terms', kwargs={'pk': profile.pk})}
+    return {"redirect": reverse('sellers-accept-terms', kwargs={'pk': profile.pk})}
+
 
 class OAuthCallbackView(APIView):
     """
     کالبک OAuth دیوار
     """
+    throttle_classes = OAUTH_THROTTLES
+
     def get(self, request, format=None):
-        code = request.query_params.get('code')
-        state = request.query_params.get('state')
-        
-        # بررسی خطا
-        error = request.query_params.get('error')
-        error_description = request.query_params.get('error_description')
-        if error:
-            logger.error(f"خطای OAuth: {error} - {error_description}")
-            return Response({"error": error, "error_description": error_description}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # بررسی کد و state
-        if not code:
-            return Response({"error": "کد دریافت نشد"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # بررسی state برای جلوگیری از حملات CSRF
-        stored_state = request.session.get('oauth_state')
-        if not state or state != stored_state:
-            return Response({"error": "state نامعتبر است"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # حذف state از session پس از استفاده
-        if 'oauth_state' in request.session:
-            del request.session['oauth_state']
-        
-        # استفاده از تنظیمات از فایل settings
-        token_url = settings.OAUTH2_TOKEN_URL
-        client_id = settings.OAUTH2_CLIENT_ID
-        client_secret = settings.OAUTH2_CLIENT_SECRET
+        failure = _check_callback_params(request.query_params, request.session.get('oauth_state'))
+        if failure:
+            return Response(failure[0], status=failure[1])
+
+        oauth_code = request.query_params['code']
+        failure = _claim_failure(oauth_code)
+        if failure:
+            return Response(failure[0], status=failure[1])
+
         redirect_uri = request.build_absolute_uri(reverse('oauth-callback'))
-        
-        payload = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "redirect_uri": redirect_uri
-        }
-        
-        # در محیط واقعی، این درخواست را ارسال کنید
-        response = requests.post(token_url, data=payload)
-        token_data = response.json()
-        
+        try:
+            token_data = exchange_code(oauth_code, redirect_uri)
+        except OAuthError as exc:
+            _release_on_retryable(oauth_code, exc)
+            payload, code = _token_error(exc)
+            return Response(payload, status=code)
+
+        # state فقط بعد از تبادل موفق حذف می‌شود تا تکرار کالبک بعد از خطای شبکه (که code را
+        # آزاد کرده) هنوز معتبر باشد
+        request.session.pop('oauth_state', None)
+
         # برای نمونه، فرض می‌کنیم توکن دریافت شده و اطلاعات کاربر استخراج شده است
         # در محیط واقعی، باید از توکن برای دریافت اطلاعات کاربر استفاده کنید
         user_type = "buyer"  # یا "seller" بر اساس اطلاعات دریافتی
         user_id = "sample_user_id"  # باید با آیدی واقعی کاربر جایگزین شود
-        
+
         # ذخیره اطلاعات کاربر
-        user_profile, created = UserProfile.objects.get_or_create(
-            user_id=user_id,
-            defaults={"user_type": user_type}
-        )
-        
-        # ریدایرکت به مسیر مناسب بر اساس نوع کاربر
-        if user_type == "buyer":
-            return Response({"redirect": reverse('buyer-terms')})
-        else:
-            return Response({"redirect": reverse('seller-terms')})
+        user, created = User.objects.get_or_create(username=user_id, defaults={"user_type": user_type})
+        get_token_store().put(user.pk, token_data)
+        profile_model = BuyerProfile if user_type == "buyer" else SellerProfile
+        profile, _ = profile_model.objects.get_or_create(user=user)
+        return Response(_login_redirect(user_type, profile))
 
 
-class BuyerViewSet(viewsets.ModelViewSet):
-    queryset = BuyerProfile.objects.all()
+class AsyncOAuthCallbackView(View):
+    """
+    نسخه async کالبک برای اجرا زیر ASGI؛ تبادل توکن روی event loop انجام می‌شود
+    و thread ورکر منتظر سرور OAuth نمی‌ماند
+    """
+    async def get(self, request):
+        wait = throttle_wait(request)
+        if wait is not None:
+            return _throttled_response(wait)
+
+        failure = _check_callback_params(request.GET, await request.session.aget('oauth_state'))
+        if failure:
+            return JsonResponse(failure[0], status=failure[1], json_dumps_params={'ensure_ascii': False})
+
+        oauth_code = request.GET['code']
+        failure = _claim_failure(oauth_code)
+        if failure:
+            return JsonResponse(failure[0], status=failure[1], json_dumps_params={'ensure_ascii': False})
+
+        redirect_uri = request.build_absolute_uri(reverse('oauth-callback'))
+        try:
+            token_data = await aexchange_code(oauth_code, redirect_uri)
+        except OAuthError as exc:
+            _release_on_retryable(oauth_code, exc)
+            payload, code = _token_error(exc)
+            return JsonResponse(payload, status=code, json_dumps_params={'ensure_ascii': False})
+
+        await request.session.apop('oauth_state', None)
+
+        user_type = "buyer"
+        user_id = "sample_user_id"
+
+        user, created = await User.objects.aget_or_create(username=user_id, defaults={"user_type": user_type})
+        get_token_store().put(user.pk, token_data)
+        profile_model = BuyerProfile if user_type == "buyer" else SellerProfile
+        profile, _ = await profile_model.objects.aget_or_create(user=user)
+        return JsonResponse(_login_redirect(user_type, profile))
+
+
+def _update_columns(viewset, pk, **values):
+    """
+    فقط ستون‌های داده شده را با یک UPDATE شرطی می‌نویسد (بدون SELECT قبلی).
+    اگر هیچ ردیفی تغییر نکند None برمی‌گرداند، وگرنه پروفایل به‌روز شده را برای پاسخ می‌خواند.
+    چون فقط همان ستون نوشته می‌شود، accept_terms و select_day همزمان تغییرات هم را پاک نمی‌کنند.
+    """
+    model = viewset.queryset.model
+    try:
+        updated = model.objects.filter(pk=pk).update(**values)
+    except (TypeError, ValueError, ValidationError):
+        return None
+    if not updated:
+        return None
+    return viewset.get_queryset().filter(pk=pk).first()
+
+
+def _clean_terms(value):
+    # "true"/"false"/1/0 و ... مثل BooleanField سریالایزرها پذیرفته می‌شود
+    return serializers.BooleanField().to_internal_value(value)
+
+
+def _bulk_items(request):
+    # بدنه می‌تواند خود لیست باشد یا {"items": [...]}؛ هر چیز دیگر (مثلاً یک رشته) None است
+    # و _check_items آن را با 400 رد می‌کند
+    if isinstance(request.data, list):
+        return request.data
+    if isinstance(request.data, dict):
+        return request.data.get('items')
+    return None
+
+
+def _validate_terms(value):
+    # همان ورودی‌هایی که accept_terms می‌پذیرد
+    try:
+        return _clean_terms(value)
+    except serializers.ValidationError:
+        raise ValueError('terms_accepted must be a boolean') from None
+
+
+def _validate_day(value):
+    if value not in [choice[0] for choice in SellerProfile.DAY_CHOICES]:
+        raise ValueError('Invalid day')
+    return value
+
+
+def _bulk_response(run, completed=None):
+    """
+    completed: (profile_type, شرط روی نتیجه هر آیتم) برای پروفایل‌هایی که با این درخواست
+    onboarding آن‌ها تکمیل شده و کارهای جانبی‌شان در صف گذاشته می‌شود
+    """
+    try:
+        with transaction.atomic():
+            results = run()
+            if completed:
+                profile_type, is_completed = completed
+                enqueue_completed(profile_type, [
+                    result['id'] for result in results if result['status'] == 'updated' and is_completed(result)
+                ])
+    except BulkError as exc:
+        return Response({'error': str(exc)}, status=exc.status_code)
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return Response({'counts': counts, 'results': results}, status=status.HTTP_200_OK)
+
+
+class UserTypeViewSet(IdempotencyMixin, viewsets.ModelViewSet):
+    queryset = User.objects.only('id', 'username', 'user_type')
+    serializer_class = UserSerializer
+
+
+class BuyerViewSet(IdempotencyMixin, QueryBudgetMixin, ReadReplicaMixin, ConditionalCacheMixin, FastReadMixin, NDJSONExportMixin, ChangeFeedMixin, viewsets.ModelViewSet):
+    # کاربر با همان کوئری join می‌شود و فقط ستون‌هایی که سریالایزر لازم دارد خوانده می‌شوند
+    queryset = BuyerProfile.objects.select_related('user').only(
+        'id', 'terms_accepted',
+        'user__id', 'user__username', 'user__user_type',
+    )
     serializer_class = BuyerProfileSerializer
+    pagination_class = ProfileCursorPagination
+    change_type = 'buyer'
+    replica_actions = ReadReplicaMixin.replica_actions + ('changes',)
+    # list و retrieve یک کوئری برای نسخه (ETag) و یک کوئری برای داده در صورت miss کش
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+        # BEGIN، UPDATE، خواندن پاسخ و درج job کارهای جانبی در همان تراکنش
+        'accept_terms': 4,
+        # تغییرات، پروفایل‌ها و در صورت شکاف بعد از since کوچک‌ترین شماره باقی‌مانده
+        'changes': 3,
+    }
 
     @action(detail=True, methods=['post'])
     def accept_terms(self, request, pk=None):
-        try:
-            buyer_profile = self.get_object()
-        except BuyerProfile.DoesNotExist:
-            return Response({'error': 'Buyer profile not found'}, status=status.HTTP_404_NOT_FOUND)
-
         terms_accepted = request.data.get('terms_accepted')
         if terms_accepted is None:
             return Response({'error': 'terms_accepted is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            terms_accepted = _clean_terms(terms_accepted)
+        except serializers.ValidationError:
+            return Response({'error': 'terms_accepted must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
 
-        buyer_profile.terms_accepted = terms_accepted
-        buyer_profile.save()
+        # job کارهای جانبی با همان تراکنش به‌روزرسانی commit می‌شود
+        with transaction.atomic(savepoint=False):
+            buyer_profile = _update_columns(self, pk, terms_accepted=terms_accepted)
+            if buyer_profile is not None and terms_accepted:
+                enqueue_completed('buyer', [buyer_profile.pk])
+        if buyer_profile is None:
+            return Response({'error': 'Buyer profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
         serializer = BuyerProfileSerializer(buyer_profile)
         return Response({
@@ -136,24 +350,52 @@ class BuyerViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        items = _bulk_items(request)
+        return _bulk_response(lambda: bulk_create_profiles(BuyerProfile, 'buyer', items))
 
-class SellerViewSet(viewsets.ModelViewSet):
-    queryset = SellerProfile.objects.all()
+    @action(detail=False, methods=['post'])
+    def bulk_accept_terms(self, request):
+        items = _bulk_items(request)
+        return _bulk_response(lambda: bulk_set_field(BuyerProfile, 'terms_accepted', items, _validate_terms),
+                              completed=('buyer', lambda result: result['terms_accepted']))
+
+
+class SellerViewSet(IdempotencyMixin, QueryBudgetMixin, ReadReplicaMixin, ConditionalCacheMixin, FastReadMixin, NDJSONExportMixin, ChangeFeedMixin, viewsets.ModelViewSet):
+    queryset = SellerProfile.objects.select_related('user').only(
+        'id', 'terms_accepted', 'address', 'selected_day',
+        'user__id', 'user__username', 'user__user_type',
+    )
     serializer_class = SellerProfileSerializer
+    pagination_class = ProfileCursorPagination
+    filter_backends = [ProfileFilterBackend]
+    filter_fields = ['selected_day', 'terms_accepted', 'payment_status']
+    change_type = 'seller'
+    replica_actions = ReadReplicaMixin.replica_actions + ('search', 'changes')
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+        'accept_terms': 2,
+        'select_day': 4,
+        'day_counts': 1,
+        'search': 3,
+        'changes': 3,
+    }
 
     @action(detail=True, methods=['post'])
     def accept_terms(self, request, pk=None):
-        try:
-            seller_profile = self.get_object()
-        except SellerProfile.DoesNotExist:
-            return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
-
         terms_accepted = request.data.get('terms_accepted')
         if terms_accepted is None:
             return Response({'error': 'terms_accepted is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            terms_accepted = _clean_terms(terms_accepted)
+        except serializers.ValidationError:
+            return Response({'error': 'terms_accepted must be a boolean'}, status=status.HTTP_400_BAD_REQUEST)
 
-        seller_profile.terms_accepted = terms_accepted
-        seller_profile.save()
+        seller_profile = _update_columns(self, pk, terms_accepted=terms_accepted)
+        if seller_profile is None:
+            return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
         serializer = SellerProfileSerializer(seller_profile)
         if terms_accepted:
@@ -175,11 +417,6 @@ class SellerViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def select_day(self, request, pk=None):
-        try:
-            seller_profile = self.get_object()
-        except SellerProfile.DoesNotExist:
-            return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
-
         selected_day = request.data.get('selected_day')
         if not selected_day:
             return Response({'error': 'selected_day is required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -187,11 +424,62 @@ class SellerViewSet(viewsets.ModelViewSet):
         if selected_day not in [choice[0] for choice in SellerProfile.DAY_CHOICES]:
             return Response({'error': 'Invalid day'}, status=status.HTTP_400_BAD_REQUEST)
 
-        seller_profile.selected_day = selected_day
-        seller_profile.save()
+        with transaction.atomic(savepoint=False):
+            seller_profile = _update_columns(self, pk, selected_day=selected_day)
+            if seller_profile is not None:
+                enqueue_completed('seller', [seller_profile.pk])
+        if seller_profile is None:
+            return Response({'error': 'Seller profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
         serializer = SellerProfileSerializer(seller_profile)
         return Response({
             'message': 'Day selected. Seller process completed.',
             'data': serializer.data
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        items = _bulk_items(request)
+        return _bulk_response(lambda: bulk_create_profiles(SellerProfile, 'seller', items, profile_fields=('address',)))
+
+    @action(detail=False, methods=['post'])
+    def bulk_accept_terms(self, request):
+        items = _bulk_items(request)
+        return _bulk_response(lambda: bulk_set_field(SellerProfile, 'terms_accepted', items, _validate_terms))
+
+    @action(detail=False, methods=['post'])
+    def bulk_select_day(self, request):
+        items = _bulk_items(request)
+        return _bulk_response(lambda: bulk_set_field(SellerProfile, 'selected_day', items, _validate_day),
+                              completed=('seller', lambda result: True))
+
+    @action(detail=False, methods=['get'], url_path='day-counts')
+    def day_counts(self, request):
+        return Response(seller_day_counts())
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '')
+        if not match_expression(query):
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        # مثل list: ETag و کش پاسخ با نسخه جدول (هر نوشتن روی پروفایل یا username آن را عوض می‌کند)
+        table = SellerProfile._meta.db_table
+        tag = f'{table}-{table_version(table, using=self.queryset.db)}'
+        return self._conditional(request, tag, lambda: self._search(request, query))
+
+    def _search(self, request, query):
+        queryset = self.get_queryset()
+        paginator = SearchPagination()
+        ids = paginator.paginate_ids(
+            lambda limit, offset: search_seller_ids(query, limit, offset, using=queryset.db), request,
+        )
+        if not ids:
+            return paginator.get_paginated_response([])
+        compiled = self._compiled_serializer()
+        if compiled is None:
+            profiles = queryset.in_bulk(ids)
+            data = self.get_serializer([profiles[pk] for pk in ids if pk in profiles], many=True).data
+        else:
+            rows = {row['id']: row for row in compiled.values(queryset.filter(id__in=ids))}
+            data = [compiled.build(rows[pk]) for pk in ids if pk in rows]
+        return paginator.get_paginated_response(data)
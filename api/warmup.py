@@ -0,0 +1,25 @@
+from django.urls import get_resolver
+from django.urls.resolvers import URLResolver
+from rest_framework.settings import api_settings
+
+
+def _compile_patterns(resolver):
+    for pattern in resolver.url_patterns:
+        # regex هر الگو در اولین دسترسی کامپایل و کش می‌شود
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            _compile_patterns(pattern)
+
+
+def warm_up():
+    """
+    کارهایی که جنگو و DRF به اولین درخواست موکول می‌کنند، هنگام بارگذاری اپلیکیشن انجام
+    می‌شود: import کل urlconf (و viewها)، کامپایل regex همه مسیرها، جدول reverse و
+    کلاس‌های پیش‌فرض DRF. با gunicorn --preload فقط یک بار در پروسه اصلی اجرا می‌شود.
+    """
+    resolver = get_resolver()
+    _compile_patterns(resolver)
+    resolver.reverse_dict
+    for name in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+                 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, name)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expertise.settings')
 
 application = get_asgi_application()
+
+# مسیرها و viewها قبل از اولین درخواست آماده می‌شوند (api/warmup.py)
+from api.warmup import warm_up  # noqa: E402
+
+warm_up()
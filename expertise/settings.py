@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,15 +46,20 @@ INSTALLED_APPS = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
+    # باید اول باشد تا زمان همه middlewareها را هم بشمارد
+    'api.metrics.PerformanceMiddleware',
+    # نسخه‌های api.middleware زیر ASGI بدون پرش sync_to_async اجرا می‌شوند
+    'api.middleware.SecurityMiddleware',
+    'api.middleware.SessionMiddleware',
+    'api.middleware.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware'
 ]
 
@@ -80,11 +88,39 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # تعداد پراکسی‌های مورد اعتماد جلوی سرور (روی PythonAnywhere یکی). آی‌پی throttle از انتهای
+    # X-Forwarded-For خوانده می‌شود، پس مقدارهای جعلی که کلاینت اول هدر می‌گذارد اثری ندارند؛
+    # بدون پراکسی 0 بگذارید تا فقط REMOTE_ADDR حساب شود
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
 }
 
+# PERF_METRICS_ENABLED=True: هدر Server-Timing و هیستوگرام‌های Prometheus در /api/metrics/ (api/metrics.py)
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS_ENABLED') == 'True'
+# آی‌پی‌هایی که /api/metrics/ را می‌بینند (با کاما جدا)؛ کاربر staff هم دسترسی دارد.
+# آی‌پی کلاینت مثل throttleها با NUM_PROXIES بالا از X-Forwarded-For خوانده می‌شود
+PERF_METRICS_ALLOWED_IPS = os.environ.get('PERF_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# API_ASYNC_VIEWS=True (استقرار ASGI): OAuth و list/retrieve پروفایل‌ها با viewهای async و ORM async
+# (api/asyncread.py)؛ نوشتن‌ها همان ویوست‌های sync هستند
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS') == 'True'
+
+# list/retrieve پروفایل‌ها با values() و ساخت مستقیم دیکشنری (api/fastpath.py) به جای ModelSerializer
+API_FAST_SERIALIZATION = os.environ.get('API_FAST_SERIALIZATION', 'True') == 'True'
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLITE_PRODUCTION=True: WAL، busy timeout، mmap و کش صفحه روی هر اتصال، اتصال‌های پایدار
+# و یک اتصال فقط‌خواندنی (replica) برای list/retrieve ویوست‌ها
+SQLITE_PRODUCTION = os.environ.get('SQLITE_PRODUCTION') == 'True'
+SQLITE_BUSY_TIMEOUT = 20  # ثانیه
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 64 * 1024
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -92,6 +128,36 @@ DATABASES = {
     }
 }
 
+if SQLITE_PRODUCTION:
+    _sqlite_pragmas = [
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+        f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            # قفل نوشتن از ابتدای تراکنش گرفته می‌شود تا ارتقای قفل به "database is locked" نخورد
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL'] + _sqlite_pragmas),
+        },
+    })
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'init_command': ';'.join(_sqlite_pragmas + ['PRAGMA query_only=1']),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['api.routers.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,10 +200,143 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import os
-
 OAUTH2_AUTH_URL = 'https://oauth.divar.ir/oauth2/auth'
-OAUTH2_TOKEN_URL = 'https://oauth.divar.ir/oauth2/token'
+OAUTH2_TOKEN_URL = os.environ.get('OAUTH2_TOKEN_URL', 'https://oauth.divar.ir/oauth2/token')
 OAUTH2_CLIENT_ID = 'desert-cherry-coyote'  # نام اپلیکیشن شما
 OAUTH2_CLIENT_SECRET = os.environ.get('OAUTH2_CLIENT_SECRET', 'your-default-client-secret')  # در محیط تولید از متغیرهای محیطی استفاده کنید
 OAUTH2_REDIRECT_URI = 'https://parsanami.pythonanywhere.com/api/oauth/callback/'  # آدرس کالبک
+
+# کلاینت HTTP تبادل توکن (pool اتصال keep-alive، timeout و retry خطاهای اتصال)
+OAUTH2_CONNECT_TIMEOUT = 3.05
+OAUTH2_READ_TIMEOUT = 10
+OAUTH2_MAX_RETRIES = 2
+OAUTH2_POOL_MAXSIZE = 10
+# کش توکن: چند ثانیه قبل از انقضا refresh شود و بعد از چه مدت بی‌استفاده بودن حذف شود
+OAUTH2_TOKEN_REFRESH_AHEAD = 60
+OAUTH2_TOKEN_STORE_TTL = 24 * 3600
+# بعد از refresh ناموفق (خطای شبکه/سرور) چند ثانیه صبر شود؛ با هر شکست دو برابر می‌شود
+OAUTH2_TOKEN_REFRESH_BACKOFF = 30
+OAUTH2_TOKEN_REFRESH_MAX_BACKOFF = 600
+# در استقرار ASGI کالبک async استفاده شود (API_ASYNC_VIEWS هم آن را فعال می‌کند)
+OAUTH2_ASYNC_CALLBACK = os.environ.get('OAUTH2_ASYNC_CALLBACK') == 'True'
+
+# Sessions / OAuth state
+# state OAuth در session نگه داشته می‌شود؛ session به جای جدول django_session در کش ذخیره می‌شود.
+# SESSION_STORE=file (پیش‌فرض) بین ورکرها مشترک است (روی /dev/shm یعنی حافظه مشترک)، db رفتار قبلی است.
+# locmem فقط برای استقرار تک پروسه‌ای: با چند ورکر redirect و callback به پروسه‌های متفاوت می‌رسند
+# و state پیدا نمی‌شود. کش sessions (throttle، codeهای کالبک و idempotency) هم همین انتخاب را دارد
+SESSION_STORE = os.environ.get('SESSION_STORE', 'file')
+SESSION_FILE_DIR = os.environ.get(
+    'SESSION_FILE_DIR',
+    '/dev/shm/expertise-sessions' if os.path.isdir('/dev/shm') else str(BASE_DIR / '.sessions'),
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'api.cache.SweepingLocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'api.cache.SweepingLocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    } if SESSION_STORE == 'locmem' else {
+        'BACKEND': 'api.cache.SweepingFileBasedCache',
+        'LOCATION': SESSION_FILE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+if SESSION_STORE != 'db':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+    SESSION_CACHE_ALIAS = 'sessions'
+
+# کش پاسخ‌های JSON لیست/جزئیات پروفایل‌ها (کلیدها نسخه‌دار هستند و با هر نوشتن عوض می‌شوند)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# هر چند ثانیه کلیدهای منقضی کش‌ها در پس‌زمینه پاک شوند (0 یعنی غیرفعال)
+CACHE_SWEEP_INTERVAL = 300
+# عمر state OAuth (و session ساخته شده برای آن) به ثانیه
+OAUTH2_STATE_TTL = 600
+
+# Idempotency-Key روی نوشتن‌های ویوست‌ها (api/idempotency.py): پاسخ‌ها در کش مشترک بین ورکرها
+# (محدود به MAX_ENTRIES آن) نگه داشته می‌شوند. alias باید یکی از کش‌های api/cache.py باشد (add و delete_if اتمیک)
+IDEMPOTENCY_CACHE_ALIAS = 'sessions'
+IDEMPOTENCY_TTL = 24 * 3600
+# رزرو کلید توسط درخواست در حال اجرا؛ باید از طولانی‌ترین درخواست نوشتن بیشتر باشد
+IDEMPOTENCY_LOCK_TTL = 60
+
+# سطل توکن برای redirect/callback به ازای هر آی‌پی و هر session ('N/period'، None یعنی بدون محدودیت).
+# کش sessions بین ورکرها مشترک است (مگر با SESSION_STORE=locmem)؛ codeهای استفاده شده کالبک هم همین‌جا هستند
+# alias باید یکی از کش‌های api/cache.py باشد: add و update آن‌ها بین ورکرها اتمیک است
+OAUTH2_THROTTLE_RATES = {
+    'oauth_ip': '30/min',
+    'oauth_session': '10/min',
+}
+OAUTH2_THROTTLE_CACHE_ALIAS = 'sessions'
+
+# صف کارهای پس‌زمینه (api/jobs.py) که با `manage.py run_jobs` اجرا می‌شود
+JOB_BATCH_SIZE = 100  # حداکثر jobهای همنام در یک اجرای handler دسته‌ای
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10  # ثانیه؛ بعد از هر شکست دو برابر می‌شود
+JOB_RETRY_MAX_DELAY = 3600
+JOB_LEASE = 300  # job در حال اجرای ورکری که تا این مدت تمام نکرده دوباره برداشته می‌شود
+JOB_POLL_INTERVAL = 1
+JOB_RETENTION = 7 * 24 * 3600  # jobهای done بعد از این مدت پاک می‌شوند
+
+# نگه‌داری داده (api/retention.py) با `manage.py archive_stale`: کاربرهایی که onboarding را
+# بیشتر از این مدت پیش رها کرده‌اند در RETENTION_ARCHIVE_DIR (NDJSON فشرده) آرشیو و حذف می‌شوند
+RETENTION_ABANDONED_DAYS = int(os.environ.get('RETENTION_ABANDONED_DAYS', 90))
+RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+RETENTION_CHUNK_SIZE = 500  # ردیف‌های هر تراکنش حذف (قفل نوشتن کوتاه)
+RETENTION_VACUUM_STEP_PAGES = 1000  # صفحه‌های هر گام incremental_vacuum
+
+# خوراک تغییرات پروفایل‌ها (api/changes.py): /api/<sellers|buyers>/changes/?since= و استریم SSE روی ASGI
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 1000
+CHANGES_RETENTION = 30 * 24 * 3600  # archive_stale تغییرات قدیمی‌تر را پاک می‌کند
+CHANGES_POLL_INTERVAL = 1  # فاصله بررسی لاگ توسط poller مشترک استریم‌ها (ثانیه)
+CHANGES_STREAM_HEARTBEAT = 15  # کامنت keepalive تا پراکسی‌ها اتصال بی‌کار را نبندند
+CHANGES_STREAM_RETRY_MS = 3000  # فاصله اتصال دوباره EventSource
+CHANGES_STREAM_BUFFER = 10000  # تغییرات ارسال نشده هر کلاینت کند؛ بیشتر از آن استریم بسته می‌شود
+
+# کارهای جانبی تکمیل onboarding (api/onboarding.py)؛ هر کدام (profile_type, profiles) می‌گیرد
+ONBOARDING_SIDE_EFFECTS = [
+    'api.onboarding.log_completed',
+]
+
+# حداکثر تعداد آیتم در هر درخواست bulk_*
+BULK_MAX_ITEMS = 10000
+
+# اگر True باشد عبور از query_budgets ویوست‌ها خطا می‌دهد، در غیر این صورت فقط لاگ می‌شود.
+# بررسی بعد از اجرای view است (نوشتن commit شده)، پس فقط تست‌ها آن را با override_settings روشن می‌کنند
+QUERY_BUDGET_ENFORCE = os.environ.get('QUERY_BUDGET_ENFORCE') == 'True'
+
+# API_ONLY=True (استقرار تولید با scale-to-zero): فقط چیزهایی که مسیرهای api/ لازم دارند.
+# admin، auth، messages، staticfiles، قالب‌ها و API قابل مرور DRF بار نمی‌شوند و شروع سرد ورکر
+# (تا اولین پاسخ) کوتاه‌تر است؛ `manage.py bench startup` دو حالت را مقایسه می‌کند
+API_ONLY = os.environ.get('API_ONLY') == 'True'
+
+if API_ONLY:
+    INSTALLED_APPS = [
+        'api',
+        'corsheaders',
+    ]
+    if SESSION_STORE == 'db':
+        INSTALLED_APPS.append('django.contrib.sessions')
+    MIDDLEWARE = [
+        'api.metrics.PerformanceMiddleware',
+        'api.middleware.SecurityMiddleware',
+        # state OAuth در session است
+        'api.middleware.SessionMiddleware',
+        'api.middleware.CommonMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+    ]
+    TEMPLATES = []
+    REST_FRAMEWORK = {
+        **REST_FRAMEWORK,
+        'DEFAULT_RENDERER_CLASSES': ['api.renderers.FastJSONRenderer'],
+        # بدون django.contrib.auth؛ هیچ viewی به request.user نیاز ندارد (AllowAny)
+        'DEFAULT_AUTHENTICATION_CLASSES': [],
+        'UNAUTHENTICATED_USER': None,
+    }
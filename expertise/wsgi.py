@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'expertise.settings')
 
 application = get_wsgi_application()
+
+# مسیرها و viewها قبل از اولین درخواست آماده می‌شوند (api/warmup.py)
+from api.warmup import warm_up  # noqa: E402
+
+warm_up()